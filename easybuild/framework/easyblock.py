@@ -60,20 +60,25 @@ from easybuild.tools.build_details import get_build_stats
 from easybuild.tools.build_log import EasyBuildError, print_error, print_msg
 from easybuild.tools.config import build_option, build_path, get_log_filename, get_repository, get_repositorypath
 from easybuild.tools.config import install_path, log_path, read_only_installdir, source_paths
+from easybuild.tools.counters import get_counters, isfile
 from easybuild.tools.environment import restore_env
+from easybuild.tools.events import STEP_END, STEP_START, emit_event
 from easybuild.tools.filetools import DEFAULT_CHECKSUM
 from easybuild.tools.filetools import adjust_permissions, apply_patch, convert_name, download_file, encode_class_name
 from easybuild.tools.filetools import extract_file, mkdir, read_file, rmtree2
 from easybuild.tools.filetools import write_file, compute_checksum, verify_checksum
 from easybuild.tools.run import run_cmd
 from easybuild.tools.jenkins import write_to_xml
-from easybuild.tools.module_generator import ModuleGenerator
+from easybuild.tools.module_generator import ModuleGenerator, module_generator
 from easybuild.tools.module_naming_scheme.utilities import det_full_ec_version
 from easybuild.tools.modules import ROOT_ENV_VAR_NAME_PREFIX, VERSION_ENV_VAR_NAME_PREFIX, DEVEL_ENV_VAR_NAME_PREFIX
 from easybuild.tools.modules import get_software_root, modules_tool
+from easybuild.tools.profiling import start_profile_phase, stop_profile_phase
 from easybuild.tools.repository.repository import init_repository
+from easybuild.tools.sampler import resources_file_path, start_resource_sampler
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME
 from easybuild.tools.systemtools import det_parallelism, use_group
+from easybuild.tools.timing import EXTENSION, STEP, SUBSTEP, Timings, trace_file_path
 from easybuild.tools.utilities import remove_unwanted_chars
 from easybuild.tools.version import this_is_easybuild, VERBOSE_VERSION, VERSION
 
@@ -132,7 +137,7 @@ class EasyBlock(object):
         # modules interface with default MODULEPATH
         self.modules_tool = modules_tool()
         # module generator
-        self.module_generator = ModuleGenerator(self, fake=True)
+        self.module_generator = module_generator(self, fake=True)
 
         # modules footer
         self.modules_footer = None
@@ -170,6 +175,13 @@ class EasyBlock(object):
         # sanity check fail error messages to report (if any)
         self.sanity_check_fail_msgs = []
 
+        # wall/CPU time spent in (sub)steps and for extensions
+        self.timings = Timings()
+        # hot path counters at start of installation
+        self.counters_start = get_counters()
+        # sampler of resource usage during installation (see build_and_install_one)
+        self.resource_sampler = None
+
         # robot path
         self.robot_path = build_option('robot_path')
 
@@ -512,7 +524,7 @@ class EasyBlock(object):
                         fullpaths = [fullpath]
 
                     for fp in fullpaths:
-                        if os.path.isfile(fp):
+                        if isfile(fp):
                             self.log.info("Found file %s at %s" % (filename, fp))
                             foundfile = os.path.abspath(fp)
                             break  # no need to try further
@@ -745,6 +757,7 @@ class EasyBlock(object):
         # load fake module
         fake_mod_data = self.load_fake_module(purge=True)
 
+        # devel module is always generated in Tcl syntax, it's not a module file that is installed in a module path
         mod_gen = ModuleGenerator(self)
         header = "#%Module\n"
 
@@ -846,10 +859,11 @@ class EasyBlock(object):
 
         # EBROOT + EBVERSION + EBDEVEL
         environment_name = convert_name(self.name, upper=True)
-        txt += self.module_generator.set_environment(ROOT_ENV_VAR_NAME_PREFIX + environment_name, "$root")
+        txt += self.module_generator.set_environment(ROOT_ENV_VAR_NAME_PREFIX + environment_name, '', relpath=True)
         txt += self.module_generator.set_environment(VERSION_ENV_VAR_NAME_PREFIX + environment_name, self.version)
-        devel_path = os.path.join("$root", log_path(), ActiveMNS().det_devel_module_filename(self.cfg))
-        txt += self.module_generator.set_environment(DEVEL_ENV_VAR_NAME_PREFIX + environment_name, devel_path)
+        devel_path = os.path.join(log_path(), ActiveMNS().det_devel_module_filename(self.cfg))
+        txt += self.module_generator.set_environment(DEVEL_ENV_VAR_NAME_PREFIX + environment_name, devel_path,
+                                                     relpath=True)
 
         txt += "\n"
         for (key, value) in self.cfg['modextravars'].items():
@@ -890,7 +904,7 @@ class EasyBlock(object):
         """
         Insert a footer section in the modulefile, primarily meant for contextual information
         """
-        txt = '\n# Built with EasyBuild version %s\n' % VERBOSE_VERSION
+        txt = '\n' + self.module_generator.comment("Built with EasyBuild version %s" % VERBOSE_VERSION)
 
         # add extra stuff for extensions (if any)
         if self.cfg['exts_list']:
@@ -1431,11 +1445,13 @@ class EasyBlock(object):
                 self.log.debug("Installing extension %s with class %s (from %s)" % (ext['name'], class_name, mod_path))
 
             # real work
+            timing = self.timings.start(ext['name'], EXTENSION)
             inst.prerun()
             txt = inst.run()
             if txt:
                 self.module_extra_extensions += txt
             inst.postrun()
+            self.timings.stop(timing, version=ext.get('version'))
 
             # append so we can make us of it later (in sanity_check_step)
             self.ext_instances.append(inst)
@@ -1654,10 +1670,13 @@ class EasyBlock(object):
 
          # only update after generating final module file
         if not fake:
-            self.modules_tool.update()
+            self.modules_tool.request_update()
 
         self.module_generator.create_symlinks()
 
+        # make sure the newly installed module file is taken into account when checking for available modules
+        self.modules_tool.invalidate_available_cache()
+
         if not fake:
             self.make_devel_module()
 
@@ -1690,7 +1709,7 @@ class EasyBlock(object):
 
         for name in TEMPLATE_NAMES_EASYBLOCK_RUN_STEP:
             self.cfg.template_values[name[0]] = str(getattr(self, name[0], None))
-        self.cfg.generate_template_values()
+        # no need to regenerate other template values, that's done on demand when easyconfig parameters are changed
 
     def run_step(self, step, methods, skippable=False):
         """
@@ -1700,12 +1719,29 @@ class EasyBlock(object):
             self.log.info("Skipping %s step" % step)
         else:
             self.log.info("Starting %s step" % step)
+            step_timing = self.timings.start(step, STEP)
+            profile_phase = 'build-%s-%s' % (self.full_mod_name, step)
+            start_profile_phase(profile_phase)
             # update the config templates
             self.update_config_template_run_step()
+            emit_event(STEP_START, module=self.full_mod_name, step=step)
 
-            for m in methods:
-                self.log.info("Running method %s part of step %s" % ('_'.join(m.func_code.co_names), step))
-                m(self)
+            success = False
+            try:
+                for m in methods:
+                    method_name = '_'.join(m.func_code.co_names)
+                    self.log.info("Running method %s part of step %s" % (method_name, step))
+                    substep_timing = self.timings.start(method_name, SUBSTEP)
+                    try:
+                        m(self)
+                    finally:
+                        self.timings.stop(substep_timing, step=step)
+                success = True
+            finally:
+                stop_profile_phase(profile_phase, step=True)
+                wall, cpu = self.timings.stop(step_timing)
+                self.log.info("Time spent in %s step: %.2fs wall, %.2fs CPU" % (step, wall, cpu))
+                emit_event(STEP_END, module=self.full_mod_name, step=step, success=success, wall=wall, cpu=cpu)
 
         if self.cfg['stop'] == step:
             self.log.info("Stopping after %s step." % step)
@@ -1873,6 +1909,12 @@ def build_and_install_one(ecdict, orig_environ):
         _log.debug("Skip set to %s" % skip)
         app.cfg['skip'] = skip
 
+    # sample resource usage in the background during the installation, if desired
+    sample_interval = build_option('sample_resources')
+    if sample_interval is not None:
+        app.resource_sampler = start_resource_sampler(sample_interval, builddir=app.builddir,
+                                                      installdir=app.installdir)
+
     # build easyconfig
     errormsg = '(no error)'
     # timing info
@@ -1886,6 +1928,10 @@ def build_and_install_one(ecdict, orig_environ):
         _log.warning(errormsg)
         result = False
 
+    if app.resource_sampler is not None:
+        app.resource_sampler.stop()
+        _log.info("Peak resource usage: %s" % app.resource_sampler.peaks())
+
     ended = "ended"
 
     # make sure we're back in original directory before we finish up
@@ -1937,6 +1983,10 @@ def build_and_install_one(ecdict, orig_environ):
         except (IOError, OSError), err:
             print_error("Failed to move log file %s to new log file %s: %s" % (app.logfile, application_log, err))
 
+        app.timings.write_chrome_trace(trace_file_path(application_log))
+        if app.resource_sampler is not None:
+            app.resource_sampler.write_time_series(resources_file_path(application_log))
+
         try:
             newspec = os.path.join(new_log_dir, "%s-%s.eb" % (app.name, det_full_ec_version(app.cfg)))
             # only copy if the files are not the same file already (yes, it happens)
@@ -1961,6 +2011,9 @@ def build_and_install_one(ecdict, orig_environ):
         # cleanup logs
         app.close_log()
         application_log = app.logfile
+        app.timings.write_chrome_trace(trace_file_path(application_log))
+        if app.resource_sampler is not None:
+            app.resource_sampler.write_time_series(resources_file_path(application_log))
 
     print_msg("%s: Installation %s %s" % (summary, ended, succ), log=_log, silent=silent)
 
@@ -46,6 +46,7 @@ from vsc.utils.patterns import Singleton
 import easybuild.tools.environment as env
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option, get_module_naming_scheme
+from easybuild.tools.counters import isfile
 from easybuild.tools.filetools import decode_class_name, encode_class_name, read_file
 from easybuild.tools.module_naming_scheme import DEVEL_MODULE_SUFFIX
 from easybuild.tools.module_naming_scheme.utilities import avail_module_naming_schemes, det_full_ec_version
@@ -54,7 +55,7 @@ from easybuild.tools.modules import get_software_root_env_var_name, get_software
 from easybuild.tools.systemtools import check_os_dependency
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME, DUMMY_TOOLCHAIN_VERSION
 from easybuild.tools.toolchain.utilities import get_toolchain
-from easybuild.tools.utilities import remove_unwanted_chars
+from easybuild.tools.utilities import LRUCache, avail_modules_in_package, package_paths_stamp, remove_unwanted_chars
 from easybuild.framework.easyconfig import MANDATORY
 from easybuild.framework.easyconfig.default import DEFAULT_CONFIG
 from easybuild.framework.easyconfig.format.convert import Dependency
@@ -62,11 +63,15 @@ from easybuild.framework.easyconfig.format.one import retrieve_blocks_in_spec
 from easybuild.framework.easyconfig.licenses import EASYCONFIG_LICENSES_DICT, License
 from easybuild.framework.easyconfig.parser import DEPRECATED_PARAMETERS, REPLACED_PARAMETERS
 from easybuild.framework.easyconfig.parser import EasyConfigParser, fetch_parameters_from_easyconfig
-from easybuild.framework.easyconfig.templates import template_constant_dict
+from easybuild.framework.easyconfig.templates import TEMPLATE_SOURCE_PARAMS, template_values_for
 
 
 _log = fancylogger.getLogger('easyconfig.easyconfig', fname=False)
 
+# Python packages that provide (generic) easyblocks
+EASYBLOCKS_PKG = 'easybuild.easyblocks'
+GENERIC_EASYBLOCKS_PKG = 'easybuild.easyblocks.generic'
+
 # add license here to make it really MANDATORY (remove comment in default)
 MANDATORY_PARAMS = ['name', 'version', 'homepage', 'description', 'toolchain']
 
@@ -76,6 +81,18 @@ ITERATE_OPTIONS = ['preconfigopts', 'configopts', 'prebuildopts', 'buildopts', '
 _easyconfig_files_cache = {}
 _easyconfigs_cache = {}
 
+# available (generic) easyblock modules, indexed by stamp of easyblocks package directories
+_avail_easyblock_modules_cache = {}
+# resolved easyblock classes (or None), indexed by arguments of get_easyblock_class and easyblocks packages stamp
+_easyblock_class_cache = {}
+
+# regex to escape '%' characters in string values that are not part of a template (see resolve_template)
+TEMPLATE_ESCAPE_REGEX = re.compile(r'(%)(?!%*\(\w+\)s)')
+# maximum number of escaped string values to retain in cache
+ESCAPED_TEMPLATE_STRINGS_CACHE_SIZE = 10000
+# cache for (most recently used) escaped string values that are ready to be templated, indexed by original value
+_escaped_template_strings_cache = LRUCache(ESCAPED_TEMPLATE_STRINGS_CACHE_SIZE)
+
 
 def handle_deprecated_or_replaced_easyconfig_parameters(ec_method):
     """Decorator to handle deprecated/replaced easyconfig parameters."""
@@ -108,8 +125,10 @@ class EasyConfig(object):
         @param hidden: indicate whether corresponding module file should be installed hidden ('.'-prefixed)
         @param rawtxt: raw contents of easyconfig file
         """
-        self.template_values = None
+        self.template_values = {}
         self.enable_templating = True  # a boolean to control templating
+        # (copies of) values of easyconfig parameters from which current template values were derived
+        self._template_sources = {}
 
         self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
 
@@ -271,8 +290,10 @@ class EasyConfig(object):
             else:
                 self.log.debug("Ignoring unknown config option %s (value: %s)" % (key, local_vars[key]))
 
-        # update templating dictionary
-        self.generate_template_values()
+        # (re)generating template values is done lazily, when they are needed to resolve templated values;
+        # template values derived from previously parsed values (or set from outside) are no longer relevant
+        self.template_values = {}
+        self._template_sources = {}
 
         # indicate that this is a parsed easyconfig
         self._config['parsed'] = [True, "This is a parsed easyconfig", "HIDDEN"]
@@ -606,31 +627,42 @@ class EasyConfig(object):
 
     def generate_template_values(self):
         """Try to generate all template values."""
-        # TODO proper recursive code https://github.com/hpcugent/easybuild-framework/issues/474
-        self._generate_template_values(skip_lower=True)
-        self._generate_template_values(skip_lower=False)
-
-    def _generate_template_values(self, ignore=None, skip_lower=True):
-        """Actual code to generate the template values"""
-        if self.template_values is None:
-            self.template_values = {}
+        self._generate_template_values(force=True)
 
+    def _generate_template_values(self, force=False):
+        """
+        (Re)generate template values that are derived from easyconfig parameters with a changed value,
+        or all template values if force is True.
+        """
         # step 0. self.template_values can/should be updated from outside easyconfig
         # (eg the run_setp code in EasyBlock)
 
         # step 1-3 work with easyconfig.templates constants
-        # use a copy to make sure the original is not touched/modified
-        template_values = template_constant_dict(copy.deepcopy(self._config),
-                                                 ignore=ignore, skip_lower=skip_lower)
-
-        # update the template_values dict
-        self.template_values.update(template_values)
+        # only template values derived from a changed easyconfig parameter value are updated
+        for param in TEMPLATE_SOURCE_PARAMS:
+            value = self._config[param][0]
+            if force or param not in self._template_sources or self._template_sources[param] != value:
+                # drop template values derived from previous value
+                if param in self._template_sources:
+                    prev_value = self._template_sources[param]
+                    for key in template_values_for(param, prev_value):
+                        self.template_values.pop(key, None)
+
+                # use a copy to make sure the original is not touched/modified
+                self._template_sources[param] = copy.deepcopy(value)
+                self.template_values.update(template_values_for(param, self._template_sources[param]))
 
         # cleanup None values
         for k, v in self.template_values.items():
             if v is None:
                 del self.template_values[k]
 
+    def _resolve_template(self, value):
+        """Resolve templates in specified value, (re)generating template values only when they're needed."""
+        if needs_templating(value):
+            self._generate_template_values()
+        return resolve_template(value, self.template_values)
+
     @handle_deprecated_or_replaced_easyconfig_parameters
     def __contains__(self, key):
         """Check whether easyconfig parameter is defined"""
@@ -646,9 +678,7 @@ class EasyConfig(object):
             self.log.error("Use of unknown easyconfig parameter '%s' when getting parameter value" % key)
 
         if self.enable_templating:
-            if self.template_values is None or len(self.template_values) == 0:
-                self.generate_template_values()
-            value = resolve_template(value, self.template_values)
+            value = self._resolve_template(value)
 
         return value
 
@@ -679,9 +709,7 @@ class EasyConfig(object):
         for key, tup in self._config.items():
             value = tup[0]
             if self.enable_templating:
-                if not self.template_values:
-                    self.generate_template_values()
-                value = resolve_template(value, self.template_values)
+                value = self._resolve_template(value)
             res[key] = value
         return res
 
@@ -692,10 +720,41 @@ def det_installversion(version, toolchain_name, toolchain_version, prefix, suffi
     _log.nosupport('Use det_full_ec_version from easybuild.tools.module_generator instead of %s' % old_fn, '2.0')
 
 
+def avail_easyblock_modules():
+    """
+    Determine which generic and software-specific easyblock modules are available, without importing them.
+    Returns a stamp for the easyblocks package directories, and a tuple with the sets of names of
+    available generic and software-specific easyblock modules (None if easyblocks package is not available).
+    """
+    stamp = (package_paths_stamp(GENERIC_EASYBLOCKS_PKG), package_paths_stamp(EASYBLOCKS_PKG))
+    if stamp not in _avail_easyblock_modules_cache:
+        avail_mods = (avail_modules_in_package(GENERIC_EASYBLOCKS_PKG), avail_modules_in_package(EASYBLOCKS_PKG))
+        _avail_easyblock_modules_cache[stamp] = avail_mods
+
+    return stamp, _avail_easyblock_modules_cache[stamp]
+
+
 def get_easyblock_class(easyblock, name=None, default_fallback=True, error_on_failed_import=True):
     """
     Get class for a particular easyblock (or use default)
+
+    Resolved classes (and negative results) are cached, and the list of available easyblock modules is used
+    to avoid trying to import easyblock modules that are not there.
     """
+    stamp, (generic_mods, mods) = avail_easyblock_modules()
+    cache_key = (easyblock, name, default_fallback, error_on_failed_import, stamp)
+    if cache_key in _easyblock_class_cache:
+        cls = _easyblock_class_cache[cache_key]
+        _log.debug("Obtained class for easyblock '%s' (software name '%s') from cache: %s" % (easyblock, name, cls))
+        return cls
+
+    def is_avail(modulepath, avail_mods):
+        """Check whether easyblock module is available; returns None if unknown."""
+        if avail_mods is None:
+            return None
+        else:
+            return modulepath.split('.')[-1] in avail_mods
+
     cls = None
     try:
         if easyblock:
@@ -710,13 +769,19 @@ def get_easyblock_class(easyblock, name=None, default_fallback=True, error_on_fa
                 cls = get_class_for(modulepath, class_name)
             else:
                 # if we only get the class name, most likely we're dealing with a generic easyblock
-                try:
-                    modulepath = get_module_path(easyblock, generic=True)
-                    cls = get_class_for(modulepath, class_name)
-                except ImportError, err:
-                    # we might be dealing with a non-generic easyblock, e.g. with --easyblock is used
+                generic_modulepath = get_module_path(easyblock, generic=True)
+                if is_avail(generic_modulepath, generic_mods) is False and is_avail(get_module_path(easyblock), mods):
+                    # no need to try importing generic easyblock module that is known to not be there
                     modulepath = get_module_path(easyblock)
                     cls = get_class_for(modulepath, class_name)
+                else:
+                    try:
+                        modulepath = generic_modulepath
+                        cls = get_class_for(modulepath, class_name)
+                    except ImportError, err:
+                        # we might be dealing with a non-generic easyblock, e.g. with --easyblock is used
+                        modulepath = get_module_path(easyblock)
+                        cls = get_class_for(modulepath, class_name)
                 _log.info("Derived full easyblock module path for %s: %s" % (class_name, modulepath))
         else:
             # if no easyblock specified, try to find if one exists
@@ -727,11 +792,16 @@ def get_easyblock_class(easyblock, name=None, default_fallback=True, error_on_fa
             # modulepath will be the namespace + encoded modulename (from the classname)
             modulepath = get_module_path(class_name)
             modulepath_imported = False
-            try:
-                __import__(modulepath, globals(), locals(), [''])
-                modulepath_imported = True
-            except ImportError, err:
-                _log.debug("Failed to import module '%s': %s" % (modulepath, err))
+            # don't try to import an easyblock module that is known to not be there
+            easyblock_missing = is_avail(modulepath, mods) is False
+            if easyblock_missing:
+                _log.debug("Module '%s' is not available in %s package" % (modulepath, EASYBLOCKS_PKG))
+            else:
+                try:
+                    __import__(modulepath, globals(), locals(), [''])
+                    modulepath_imported = True
+                except ImportError, err:
+                    _log.debug("Failed to import module '%s': %s" % (modulepath, err))
 
             # check if determining module path based on software name would have resulted in a different module path
             if modulepath_imported:
@@ -744,28 +814,32 @@ def get_easyblock_class(easyblock, name=None, default_fallback=True, error_on_fa
                     _log.nosupport("Determining module path based on software name", '2.0')
 
             # try and find easyblock
-            try:
-                _log.debug("getting class for %s.%s" % (modulepath, class_name))
-                cls = get_class_for(modulepath, class_name)
-                _log.info("Successfully obtained %s class instance from %s" % (class_name, modulepath))
-            except ImportError, err:
-                # when an ImportError occurs, make sure that it's caused by not finding the easyblock module,
-                # and not because of a broken import statement in the easyblock module
-                error_re = re.compile(r"No module named %s" % modulepath.replace("easybuild.easyblocks.", ''))
-                _log.debug("error regexp: %s" % error_re.pattern)
-                if error_re.match(str(err)):
-                    if default_fallback:
-                        # no easyblock could be found, so fall back to ConfigureMake (NO LONGER SUPPORTED)
-                        legacy_fallback_easyblock = 'ConfigureMake'
-                        def_mod_path = get_module_path(legacy_fallback_easyblock, generic=True)
-                        depr_msg = "Fallback to default easyblock %s (from %s)" % (legacy_fallback_easyblock, def_mod_path)
-                        depr_msg += "; use \"easyblock = '%s'\" in easyconfig file?" % legacy_fallback_easyblock
-                        _log.nosupport(depr_msg, '2.0')
-                else:
-                    if error_on_failed_import:
-                        _log.error("Failed to import easyblock for %s because of module issue: %s" % (class_name, err))
+            if not easyblock_missing:
+                try:
+                    _log.debug("getting class for %s.%s" % (modulepath, class_name))
+                    cls = get_class_for(modulepath, class_name)
+                    _log.info("Successfully obtained %s class instance from %s" % (class_name, modulepath))
+                except ImportError, err:
+                    # when an ImportError occurs, make sure that it's caused by not finding the easyblock module,
+                    # and not because of a broken import statement in the easyblock module
+                    error_re = re.compile(r"No module named %s" % modulepath.replace("easybuild.easyblocks.", ''))
+                    _log.debug("error regexp: %s" % error_re.pattern)
+                    if error_re.match(str(err)):
+                        easyblock_missing = True
                     else:
-                        _log.debug("Failed to import easyblock for %s, but ignoring it: %s" % (class_name, err))
+                        if error_on_failed_import:
+                            tup = (class_name, err)
+                            _log.error("Failed to import easyblock for %s because of module issue: %s" % tup)
+                        else:
+                            _log.debug("Failed to import easyblock for %s, but ignoring it: %s" % (class_name, err))
+
+            if easyblock_missing and default_fallback:
+                # no easyblock could be found, so fall back to ConfigureMake (NO LONGER SUPPORTED)
+                legacy_fallback_easyblock = 'ConfigureMake'
+                def_mod_path = get_module_path(legacy_fallback_easyblock, generic=True)
+                depr_msg = "Fallback to default easyblock %s (from %s)" % (legacy_fallback_easyblock, def_mod_path)
+                depr_msg += "; use \"easyblock = '%s'\" in easyconfig file?" % legacy_fallback_easyblock
+                _log.nosupport(depr_msg, '2.0')
 
         if cls is not None:
             tup = (cls.__name__, easyblock, name)
@@ -774,6 +848,8 @@ def get_easyblock_class(easyblock, name=None, default_fallback=True, error_on_fa
             tup = (easyblock, name, default_fallback)
             _log.debug("No class found for easyblock '%s' (software name '%s', default fallback: %s" % tup)
 
+        _easyblock_class_cache[cache_key] = cls
+
         return cls
 
     except EasyBuildError, err:
@@ -803,6 +879,22 @@ def get_module_path(name, generic=False, decode=True):
     return '.'.join(modpath + [module_name])
 
 
+def needs_templating(value):
+    """
+    Check whether specified value (string, tuple/list, dict or some mix thereof) may need to be templated,
+    i.e. whether it contains any string value that includes a '%' character.
+    """
+    if isinstance(value, basestring):
+        res = '%' in value
+    elif isinstance(value, (list, tuple)):
+        res = any(needs_templating(val) for val in value)
+    elif isinstance(value, dict):
+        res = any(needs_templating(val) for val in value.values())
+    else:
+        res = False
+    return res
+
+
 def resolve_template(value, tmpl_dict):
     """Given a value, try to susbstitute the templated strings with actual values.
         - value: some python object (supported are string, tuple/list, dict or some mix thereof)
@@ -831,7 +923,16 @@ def resolve_template(value, tmpl_dict):
         # '%%' -> '%%%%'
         # '%(name)s' -> '%(name)s'
         # '%%(name)s' -> '%%(name)s'
-        value = re.sub(r'(%)(?!%*\(\w+\)s)', r'\1\1', value)
+        if '%' not in value:
+            # nothing to template
+            return value
+
+        # escaped string values are cached, since the same string values are templated over and over again
+        escaped_value = _escaped_template_strings_cache.get(value)
+        if escaped_value is None:
+            escaped_value = TEMPLATE_ESCAPE_REGEX.sub(r'\1\1', value)
+            _escaped_template_strings_cache[value] = escaped_value
+        value = escaped_value
 
         try:
             value = value % tmpl_dict
@@ -978,7 +1079,7 @@ def robot_find_easyconfig(name, version):
         easyconfigs_paths = create_paths(path, name, version)
         for easyconfig_path in easyconfigs_paths:
             _log.debug("Checking easyconfig path %s" % easyconfig_path)
-            if os.path.isfile(easyconfig_path):
+            if isfile(easyconfig_path):
                 _log.debug("Found easyconfig file for name %s, version %s at %s" % (name, version, easyconfig_path))
                 _easyconfig_files_cache[key] = os.path.abspath(easyconfig_path)
                 return _easyconfig_files_cache[key]
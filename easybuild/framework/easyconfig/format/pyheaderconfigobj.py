@@ -28,7 +28,11 @@ The main easyconfig format class
 
 @author: Stijn De Weirdt (Ghent University)
 """
+import imp
+import marshal
+import os
 import re
+import tempfile
 
 from vsc.utils import fancylogger
 
@@ -36,12 +40,26 @@ from easybuild.framework.easyconfig.constants import EASYCONFIG_CONSTANTS
 from easybuild.framework.easyconfig.format.format import get_format_version, EasyConfigFormat
 from easybuild.framework.easyconfig.licenses import EASYCONFIG_LICENSES_DICT
 from easybuild.framework.easyconfig.templates import TEMPLATE_CONSTANTS
+from easybuild.tools.config import build_option
 from easybuild.tools.configobj import ConfigObj
+from easybuild.tools.filetools import mkdir, sha1_class
 from easybuild.tools.systemtools import get_shared_lib_ext
+from easybuild.tools.utilities import LRUCache
 
 
 _log = fancylogger.getLogger('easyconfig.format.pyheaderconfigobj', fname=False)
 
+# subdirectory of cache directory used to store marshalled pyheader code objects
+PYHEADER_CACHE_SUBDIR = 'pyheader'
+
+# maximum number of compiled pyheader code objects to retain in memory
+PYHEADER_CODE_CACHE_SIZE = 1000
+
+# (most recently used) compiled pyheader code objects, indexed by SHA1 checksum of pyheader text
+_pyheader_code_cache = LRUCache(PYHEADER_CODE_CACHE_SIZE)
+# global environment to exec pyheaders in, indexed by tuple of allowed builtins (None means all builtins)
+_pyheader_globals_cache = {}
+
 
 def build_easyconfig_constants_dict():
     """Make a dictionary with all constants that can be used"""
@@ -82,6 +100,100 @@ def build_easyconfig_variables_dict():
     return vars_dict
 
 
+# regex to check for use of no longer supported magic easyconfig variables
+MAGIC_VARS_REGEX = re.compile('|'.join([re.escape(var) for var in sorted(build_easyconfig_variables_dict())]), re.M)
+
+
+def pyheader_globals(allowed_builtins=None):
+    """
+    Return (copy of) global environment to exec pyheaders in, i.e. all easyconfig variables and constants,
+    and the specified list of allowed builtins (all builtins are available if None is specified).
+    The environment is only constructed once, and reused in subsequent calls.
+    """
+    key = allowed_builtins
+    if allowed_builtins is not None:
+        key = tuple(allowed_builtins)
+
+    if key not in _pyheader_globals_cache:
+        global_vars = {}
+
+        # all variables
+        global_vars.update(build_easyconfig_variables_dict())
+        # all constants
+        global_vars.update(build_easyconfig_constants_dict())
+
+        # allowed builtins
+        if allowed_builtins is not None:
+            current_builtins = globals()['__builtins__']
+            builtins = {}
+            for name in allowed_builtins:
+                if hasattr(current_builtins, name):
+                    builtins[name] = getattr(current_builtins, name)
+                elif isinstance(current_builtins, dict) and name in current_builtins:
+                    builtins[name] = current_builtins[name]
+                else:
+                    _log.warning('No builtin %s found.' % name)
+            global_vars['__builtins__'] = builtins
+            _log.debug("Available builtins: %s" % global_vars['__builtins__'])
+
+        _pyheader_globals_cache[key] = global_vars
+
+    # return a (shallow) copy, since exec'ing the pyheader may modify the global environment
+    return _pyheader_globals_cache[key].copy()
+
+
+def pyheader_cache_path(checksum):
+    """
+    Return path to file for marshalled code object corresponding to pyheader with specified checksum,
+    or None if no cache directory is configured.
+    """
+    cachedir = build_option('cachedir')
+    if cachedir is None:
+        return None
+    else:
+        # marshal format depends on Python version, so use the 'magic' bytes for .pyc files as part of the path
+        return os.path.join(cachedir, PYHEADER_CACHE_SUBDIR, imp.get_magic().encode('hex'), '%s.marshal' % checksum)
+
+
+def compile_pyheader(pyheader):
+    """
+    Compile specified pyheader text into a code object.
+    Compiled code objects are cached in memory (per process, only the most recently used ones),
+    and in the cache directory (if configured).
+    """
+    checksum = sha1_class(pyheader).hexdigest()
+
+    code = _pyheader_code_cache.get(checksum)
+    if code is None:
+        cache_fp = pyheader_cache_path(checksum)
+        if cache_fp is not None and os.path.exists(cache_fp):
+            try:
+                code = marshal.loads(open(cache_fp, 'rb').read())
+                _log.debug("Loaded compiled pyheader from %s" % cache_fp)
+            except (IOError, OSError, EOFError, ValueError, TypeError), err:
+                _log.warning("Failed to load compiled pyheader from %s, ignoring it: %s" % (cache_fp, err))
+
+        if code is None:
+            code = compile(pyheader, '<string>', 'exec')
+
+            if cache_fp is not None:
+                # write to a temporary file first and rename, to avoid that concurrent eb sessions pick up a partial file
+                try:
+                    cache_dir = os.path.dirname(cache_fp)
+                    mkdir(cache_dir, parents=True)
+                    fd, tmp_fp = tempfile.mkstemp(dir=cache_dir)
+                    os.write(fd, marshal.dumps(code))
+                    os.close(fd)
+                    os.rename(tmp_fp, cache_fp)
+                    _log.debug("Stored compiled pyheader in %s" % cache_fp)
+                except (IOError, OSError), err:
+                    _log.warning("Failed to store compiled pyheader in %s: %s" % (cache_fp, err))
+
+        _pyheader_code_cache[checksum] = code
+
+    return code
+
+
 class EasyConfigFormatConfigObj(EasyConfigFormat):
     """
     Extended EasyConfig format, with support for a header and sections that are actually parsed (as opposed to exec'ed).
@@ -178,12 +290,13 @@ class EasyConfigFormatConfigObj(EasyConfigFormat):
         self.log.debug("pyheader text being exec'ed: %s" % pyheader)
 
         # check for use of deprecated magic easyconfigs variables
-        for magic_var in build_easyconfig_variables_dict():
-            if re.search(magic_var, pyheader, re.M):
-                _log.nosupport("Magic 'global' easyconfigs variable %s should no longer be used" % magic_var, '2.0')
+        res = MAGIC_VARS_REGEX.search(pyheader)
+        if res:
+            magic_var = res.group(0)
+            _log.nosupport("Magic 'global' easyconfigs variable %s should no longer be used" % magic_var, '2.0')
 
         try:
-            exec(pyheader, global_vars, local_vars)
+            exec(compile_pyheader(pyheader), global_vars, local_vars)
         except SyntaxError, err:
             self.log.error("SyntaxError in easyconfig pyheader %s: %s" % (pyheader, err))
 
@@ -200,26 +313,7 @@ class EasyConfigFormatConfigObj(EasyConfigFormat):
     def pyheader_env(self):
         """Create the global/local environment to use with eval/execfile"""
         local_vars = {}
-        global_vars = {}
-
-        # all variables
-        global_vars.update(build_easyconfig_variables_dict())
-        # all constants
-        global_vars.update(build_easyconfig_constants_dict())
-
-        # allowed builtins
-        if self.PYHEADER_ALLOWED_BUILTINS is not None:
-            current_builtins = globals()['__builtins__']
-            builtins = {}
-            for name in self.PYHEADER_ALLOWED_BUILTINS:
-                if hasattr(current_builtins, name):
-                    builtins[name] = getattr(current_builtins, name)
-                elif isinstance(current_builtins, dict) and name in current_builtins:
-                    builtins[name] = current_builtins[name]
-                else:
-                    self.log.warning('No builtin %s found.' % name)
-            global_vars['__builtins__'] = builtins
-            self.log.debug("Available builtins: %s" % global_vars['__builtins__'])
+        global_vars = pyheader_globals(allowed_builtins=self.PYHEADER_ALLOWED_BUILTINS)
 
         return global_vars, local_vars
 
@@ -121,9 +121,65 @@ for ext in extensions:
         ('SOURCELOWER_%s' % suffix, '%(namelower)s-%(version)s.' + ext, "Source .%s bundle with lowercase name" % ext),
     ]
 
+# easyconfig parameters from which template values are derived (see template_values_for)
+TEMPLATE_SOURCE_PARAMS = ['name', 'toolchain', 'version', 'versionprefix', 'versionsuffix']
+
 # TODO derived config templates
 # versionmajor, versionminor, versionmajorminor (eg '.'.join(version.split('.')[:2])) )
 
+
+def template_values_for(param, value):
+    """
+    Determine template values that are derived from the value for the specified easyconfig parameter,
+    including lowercase variants; template values that are None are not included.
+    This yields the same template values as template_constant_dict, but only for a single easyconfig parameter,
+    which allows to only update the affected template values when an easyconfig parameter value is changed.
+
+    @param param: name of easyconfig parameter (see TEMPLATE_SOURCE_PARAMS)
+    @param value: (non-templated) value for easyconfig parameter
+    """
+    template_values = {}
+
+    if param == 'toolchain':
+        if value is not None:
+            template_values['toolchain_name'] = value.get('name', None)
+            template_values['toolchain_version'] = value.get('version', None)
+
+    elif param in TEMPLATE_NAMES_CONFIG:
+        template_values[param] = value
+
+        if param == 'version' and value is not None:
+            # parse major and minor version numbers
+            version = LooseVersion(value).version
+            try:
+                major = str(version[0])
+                template_values['version_major'] = major
+                minor = str(version[1])
+                template_values['version_minor'] = minor
+                template_values['version_major_minor'] = ".".join([major, minor])
+            except IndexError:
+                # if there is no minor version, skip it
+                pass
+
+        elif param == 'name' and value is not None:
+            template_values['nameletter'] = value[0]
+
+    else:
+        _log.error("No template values are derived from easyconfig parameter %s" % param)
+
+    # make lower variants
+    for name in TEMPLATE_NAMES_LOWER:
+        t_v = template_values.get(name, None)
+        if t_v is not None:
+            try:
+                template_values[TEMPLATE_NAMES_LOWER_TEMPLATE % {'name': name}] = t_v.lower()
+            except:
+                _log.debug("template_values_for: can't get .lower() for name %s value %s (type %s)" %
+                           (name, t_v, type(t_v)))
+
+    return dict([(k, v) for (k, v) in template_values.items() if v is not None])
+
+
 def template_constant_dict(config, ignore=None, skip_lower=True):
     """Create a dict for templating the values in the easyconfigs.
         - config is a dict with the structure of EasyConfig._config
@@ -40,6 +40,7 @@ alongside the EasyConfig class to represent parsed easyconfig files.
 import os
 import sys
 from vsc.utils import fancylogger
+from vsc.utils.missing import nub
 
 # optional Python packages, these might be missing
 # failing imports are just ignored
@@ -74,7 +75,6 @@ from easybuild.framework.easyconfig.easyconfig import process_easyconfig
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option
 from easybuild.tools.filetools import find_easyconfigs, which, write_file
-from easybuild.tools.github import fetch_easyconfigs_from_pr
 from easybuild.tools.modules import modules_tool
 from easybuild.tools.ordereddict import OrderedDict
 from easybuild.tools.utilities import quote_str
@@ -105,17 +105,28 @@ def find_resolved_modules(unprocessed, avail_modules, retain_all_deps=False):
     ordered_ecs = []
     new_avail_modules = avail_modules[:]
     new_unprocessed = []
-    modtool = modules_tool()
+
+    hidden_mods_exist = {}
+    if not retain_all_deps:
+        # hidden modules need special care, since they may not be included in list of available modules;
+        # check whether they exist all at once rather than one by one
+        hidden_mod_names = []
+        for ec in unprocessed:
+            for dep in ec['dependencies']:
+                if dep['hidden']:
+                    full_mod_name = ActiveMNS().det_full_module_name(dep)
+                    if full_mod_name not in new_avail_modules:
+                        hidden_mod_names.append(full_mod_name)
+        hidden_mod_names = nub(hidden_mod_names)
+        if hidden_mod_names:
+            hidden_mods_exist = dict(zip(hidden_mod_names, modules_tool().exist(hidden_mod_names)))
 
     for ec in unprocessed:
         new_ec = ec.copy()
         deps = []
         for dep in new_ec['dependencies']:
             full_mod_name = ActiveMNS().det_full_module_name(dep)
-            dep_resolved = full_mod_name in new_avail_modules
-            if not retain_all_deps:
-                # hidden modules need special care, since they may not be included in list of available modules
-                dep_resolved |= dep['hidden'] and modtool.exist([full_mod_name])[0]
+            dep_resolved = full_mod_name in new_avail_modules or hidden_mods_exist.get(full_mod_name, False)
             if not dep_resolved:
                 deps.append(dep)
         new_ec['dependencies'] = deps
@@ -253,6 +264,8 @@ def det_easyconfig_paths(orig_paths):
     ec_files = orig_paths[:]
 
     if from_pr is not None:
+        # only import GitHub support when needed, to keep startup fast
+        from easybuild.tools.github import fetch_easyconfigs_from_pr
         pr_files = fetch_easyconfigs_from_pr(from_pr)
 
         if ec_files:
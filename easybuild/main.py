@@ -38,31 +38,40 @@ Main entry point for EasyBuild: build software from .eb input file
 import copy
 import os
 import sys
+import time
 import traceback
 
+# keep track of time spent on importing modules as early as possible, if requested (see --import-times);
+# this doesn't affect logging, since easybuild.tools.importtime doesn't import any other EasyBuild modules
+from easybuild.tools.importtime import enable_import_times, import_times_requested
+if __name__ == "__main__" and import_times_requested(sys.argv[1:]):
+    enable_import_times()
+
 # IMPORTANT this has to be the first easybuild import as it customises the logging
 #  expect missing log output when this not the case!
 from easybuild.tools.build_log import EasyBuildError, init_logging, print_msg, print_error, stop_logging
 
 import easybuild.tools.config as config
 import easybuild.tools.options as eboptions
-from easybuild.framework.easyblock import EasyBlock, build_and_install_one
 from easybuild.framework.easyconfig import EASYCONFIGS_PKG_SUBDIR
 from easybuild.framework.easyconfig.tools import alt_easyconfig_paths, dep_graph, det_easyconfig_paths
 from easybuild.framework.easyconfig.tools import get_paths_for, parse_easyconfigs, skip_available
-from easybuild.framework.easyconfig.tweak import obtain_ec_for, tweak
 from easybuild.tools.config import get_repository, get_repositorypath, set_tmpdir
 from easybuild.tools.filetools import cleanup, write_file
 from easybuild.tools.options import process_software_build_specs
-from easybuild.tools.robot import det_robot_path, dry_run, resolve_dependencies, search_easyconfigs
-from easybuild.tools.parallelbuild import submit_jobs
-from easybuild.tools.repository.repository import init_repository
-from easybuild.tools.testing import create_test_report, overall_test_report, regtest, session_module_list, session_state
-from easybuild.tools.version import this_is_easybuild
+# profiling may need to be enabled before parsing the options, so option parsing can be profiled too
+from easybuild.tools.profiling import disable_memory_profiling, disable_memory_profiling_at_exit
+from easybuild.tools.profiling import disable_profiling, disable_profiling_at_exit, enable_memory_profiling
+from easybuild.tools.profiling import enable_profiling
+from easybuild.tools.profiling import profiling_requested, start_profile_phase, stop_profile_phase
+from easybuild.tools.version import VERSION, this_is_easybuild
 
 
 _log = None
 
+# whether the progress of the session is being reported (via events file and/or metrics)
+_session_reporting = False
+
 
 def log_start(eb_command_line, eb_tmpdir):
     """Log startup info."""
@@ -76,6 +85,8 @@ def log_start(eb_command_line, eb_tmpdir):
 
 def find_easyconfigs_by_specs(build_specs, robot_path, try_to_generate, testing=False):
     """Find easyconfigs by build specifications."""
+    from easybuild.framework.easyconfig.tweak import obtain_ec_for
+
     generated, ec_file = obtain_ec_for(build_specs, robot_path, None)
     if generated:
         if try_to_generate:
@@ -102,41 +113,66 @@ def build_and_install_software(ecs, init_session_state, exit_on_failure=True):
     # e.g. via easyconfig.handle_allowed_system_deps
     orig_environ = copy.deepcopy(os.environ)
 
+    from easybuild.framework.easyblock import build_and_install_one
+    from easybuild.tools.counters import counters_since, get_counters
+    from easybuild.tools.events import BUILD_END, BUILD_START, FAILURE, emit_event
+    from easybuild.tools.modules import modules_tool
+    from easybuild.tools.testing import create_test_report
+
+    # only update the modules tool (cache) once, after all builds are done (also when exiting early)
+    modtool = modules_tool()
+    modtool.defer_updates()
+
     res = []
-    for ec in ecs:
-        ec_res = {}
-        try:
-            (ec_res['success'], app_log, err) = build_and_install_one(ec, orig_environ)
-            ec_res['log_file'] = app_log
+    try:
+        for idx, ec in enumerate(ecs):
+            ec_res = {}
+            profile_phase = 'build-%s' % ec['full_mod_name']
+            start_profile_phase(profile_phase)
+            emit_event(BUILD_START, module=ec['full_mod_name'], spec=ec['spec'], index=idx + 1, total=len(ecs))
+            build_start = time.time()
+            counters_start = get_counters()
+            try:
+                (ec_res['success'], app_log, err) = build_and_install_one(ec, orig_environ)
+                ec_res['log_file'] = app_log
+                if not ec_res['success']:
+                    ec_res['err'] = EasyBuildError(err)
+            except Exception, err:
+                # purposely catch all exceptions
+                ec_res['success'] = False
+                ec_res['err'] = err
+                ec_res['traceback'] = traceback.format_exc()
+            ec_res['hot_path_counters'] = counters_since(counters_start)
+            stop_profile_phase(profile_phase)
+
             if not ec_res['success']:
-                ec_res['err'] = EasyBuildError(err)
-        except Exception, err:
-            # purposely catch all exceptions
-            ec_res['success'] = False
-            ec_res['err'] = err
-            ec_res['traceback'] = traceback.format_exc()
-
-        # keep track of success/total count
-        if ec_res['success']:
-            test_msg = "Successfully built %s" % ec['spec']
-        else:
-            test_msg = "Build of %s failed" % ec['spec']
-            if 'err' in ec_res:
-                test_msg += " (err: %s)" % ec_res['err']
-
-        # dump test report next to log file
-        test_report_txt = create_test_report(test_msg, [(ec, ec_res)], init_session_state)
-        if 'log_file' in ec_res:
-            test_report_fp = "%s_test_report.md" % '.'.join(ec_res['log_file'].split('.')[:-1])
-            write_file(test_report_fp, test_report_txt)
-
-        if not ec_res['success'] and exit_on_failure:
-            if 'traceback' in ec_res:
-                _log.error(ec_res['traceback'])
-            else:
-                _log.error(test_msg)
+                emit_event(FAILURE, module=ec['full_mod_name'], spec=ec['spec'], error=str(ec_res['err']))
+            emit_event(BUILD_END, module=ec['full_mod_name'], spec=ec['spec'], index=idx + 1, total=len(ecs),
+                       success=ec_res['success'], duration=time.time() - build_start, log_file=ec_res.get('log_file'))
 
-        res.append((ec, ec_res))
+            # keep track of success/total count
+            if ec_res['success']:
+                test_msg = "Successfully built %s" % ec['spec']
+            else:
+                test_msg = "Build of %s failed" % ec['spec']
+                if 'err' in ec_res:
+                    test_msg += " (err: %s)" % ec_res['err']
+
+            # dump test report next to log file
+            test_report_txt = create_test_report(test_msg, [(ec, ec_res)], init_session_state)
+            if 'log_file' in ec_res:
+                test_report_fp = "%s_test_report.md" % '.'.join(ec_res['log_file'].split('.')[:-1])
+                write_file(test_report_fp, test_report_txt)
+
+            if not ec_res['success'] and exit_on_failure:
+                if 'traceback' in ec_res:
+                    _log.error(ec_res['traceback'])
+                else:
+                    _log.error(test_msg)
+
+            res.append((ec, ec_res))
+    finally:
+        modtool.flush_updates()
 
     return res
 
@@ -146,18 +182,92 @@ def main(testing_data=(None, None, None)):
     Main function: parse command line options, and act accordingly.
     @param testing_data: tuple with command line arguments, log file and boolean indicating whether or not to build
     """
-    # purposely session state very early, to avoid modules loaded by EasyBuild meddling in
-    init_session_state = session_state()
+    # make sure the end of the session is reported, also when exiting early or when a build failed
+    try:
+        run_session(testing_data=testing_data)
+    except SystemExit, err:
+        end_session_reporting(success=err.code in [None, 0], exit_code=err.code)
+        raise
+    except (Exception, KeyboardInterrupt), err:
+        end_session_reporting(success=False, error=str(err))
+        raise
+
+
+def start_session_reporting(options, eb_cmd_line):
+    """Start reporting the progress of the session, via events file and/or metrics (if requested)."""
+    global _session_reporting
+
+    from easybuild.tools.events import SESSION_START, emit_event, enable_events_file
+    from easybuild.tools.metrics import enable_metrics
+
+    if options.events_file:
+        enable_events_file(options.events_file)
+    if options.metrics_file or options.metrics_http:
+        enable_metrics(path=options.metrics_file, http_address=options.metrics_http)
+    emit_event(SESSION_START, version=str(VERSION), command_line=eb_cmd_line)
+    _session_reporting = True
+
+
+def end_session_reporting(**kwargs):
+    """
+    Report end of session with specified details, and stop reporting the progress of the session;
+    nothing needs to be done if the session ended before reporting was started (e.g., for --help or --version).
+    """
+    global _session_reporting
+
+    if _session_reporting:
+        from easybuild.tools.events import SESSION_END, disable_events_file, emit_event
+        from easybuild.tools.metrics import disable_metrics
+
+        emit_event(SESSION_END, **kwargs)
+        disable_events_file()
+        disable_metrics()
+        _session_reporting = False
 
+
+def run_session(testing_data=(None, None, None)):
+    """
+    Run an EasyBuild session, as specified by the command line options (see main).
+    @param testing_data: tuple with command line arguments, log file and boolean indicating whether or not to build
+    """
     # steer behavior when testing main
     testing = testing_data[0] is not None
     args, logfile, do_build = testing_data
 
+    # start profiling as early as possible if requested, so parsing of options is profiled too (see --profile)
+    if profiling_requested(args or sys.argv[1:]):
+        enable_profiling()
+    start_profile_phase('options')
+
     # initialise options
     eb_go = eboptions.parse_options(args=args)
     options = eb_go.options
     orig_paths = eb_go.args
 
+    # only import what is required to run a session once the options are parsed (i.e. not for --help or --version),
+    # to keep startup fast
+    from easybuild.framework.easyblock import EasyBlock
+    from easybuild.tools.events import PARSE_DONE, RESOLUTION_DONE, emit_event
+    from easybuild.tools.repository.repository import init_repository
+    from easybuild.tools.robot import det_robot_path, dry_run, resolve_dependencies, search_easyconfigs
+    from easybuild.tools.testing import overall_test_report, regtest, session_module_list, session_state
+
+    # purposely session state very early, to avoid modules loaded by EasyBuild meddling in
+    init_session_state = session_state()
+
+    if options.profile is not None:
+        # profiling results are dumped at exit, since we may exit early (e.g., for --dry-run)
+        profiler = enable_profiling(sampling_interval=options.profile_sampling)
+        disable_profiling_at_exit(options.profile)
+        if not profiler.active:
+            start_profile_phase('options')
+    else:
+        disable_profiling()
+
+    if options.profile_memory is not None:
+        enable_memory_profiling(options.profile_memory, steps=options.profile_memory_steps)
+        disable_memory_profiling_at_exit()
+
     # set umask (as early as possible)
     if options.umask is not None:
         new_umask = int(options.umask, 8)
@@ -214,12 +324,17 @@ def main(testing_data=(None, None, None)):
     init_session_state.update({'easybuild_configuration': eb_config})
     init_session_state.update({'module_list': modlist})
     _log.debug("Initial session state: %s" % init_session_state)
+    stop_profile_phase('options')
+
+    start_session_reporting(options, eb_cmd_line)
 
     # search for easyconfigs, if a query is specified
     query = options.search or options.search_short
     if query:
         search_easyconfigs(query, short=not options.search)
 
+    start_profile_phase('easyconfigs')
+
     # determine easybuild-easyconfigs package install path
     easyconfigs_pkg_paths = get_paths_for(subdir=EASYCONFIGS_PKG_SUBDIR)
     if not easyconfigs_pkg_paths:
@@ -250,14 +365,21 @@ def main(testing_data=(None, None, None)):
             sys.exit(31)  # exit -> 3x1t -> 31
 
     # read easyconfig files
+    parse_start = time.time()
     easyconfigs, generated_ecs = parse_easyconfigs(paths)
 
     # tweak obtained easyconfig files, if requested
     # don't try and tweak anything if easyconfigs were generated, since building a full dep graph will fail
     # if easyconfig files for the dependencies are not available
     if try_to_generate and build_specs and not generated_ecs:
+        from easybuild.framework.easyconfig.tweak import tweak
         easyconfigs = tweak(easyconfigs, build_specs, targetdir=tweaked_ecs_path)
 
+    stop_profile_phase('easyconfigs')
+    emit_event(PARSE_DONE, easyconfigs=len(easyconfigs), duration=time.time() - parse_start)
+    start_profile_phase('dependencies')
+    resolution_start = time.time()
+
     # dry_run: print all easyconfigs and dependencies, and whether they are already built
     if options.dry_run or options.dry_run_short:
         txt = dry_run(easyconfigs, short=not options.dry_run, build_specs=build_specs)
@@ -287,6 +409,9 @@ def main(testing_data=(None, None, None)):
         print_msg("No easyconfigs left to be built.", log=_log, silent=testing)
         ordered_ecs = []
 
+    stop_profile_phase('dependencies')
+    emit_event(RESOLUTION_DONE, easyconfigs=len(ordered_ecs), duration=time.time() - resolution_start)
+
     # create dependency graph and exit
     if options.dep_graph:
         _log.info("Creating dependency graph %s" % options.dep_graph)
@@ -295,6 +420,8 @@ def main(testing_data=(None, None, None)):
 
     # submit build as job(s), clean up and exit
     if options.job:
+        # only import support for submitting jobs when it's needed, to keep startup fast
+        from easybuild.tools.parallelbuild import submit_jobs
         job_info_txt = submit_jobs(ordered_ecs, eb_go.generate_cmd_line(), testing=testing)
         if not testing:
             print_msg("Submitted parallel build jobs, exiting now: %s" % job_info_txt)
@@ -327,6 +454,11 @@ def main(testing_data=(None, None, None)):
         if 'original_spec' in ec and os.path.isfile(ec['spec']):
             os.remove(ec['spec'])
 
+    disable_profiling(outdir=options.profile, report=not testing)
+    disable_memory_profiling(report=not testing)
+
+    end_session_reporting(success=overall_success, successful_builds=correct_builds_cnt, builds=len(ordered_ecs))
+
     # stop logging and cleanup tmp log file, unless one build failed (individual logs are located in eb_tmpdir path)
     stop_logging(logfile, logtostdout=options.logtostdout)
     if overall_success:
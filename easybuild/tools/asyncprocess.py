@@ -56,6 +56,7 @@ and the methods will return None.
 - downloaded 05/08/2010
 - modified
 -- added STDOUT handle
+-- retry select() calls that are interrupted by a signal (e.g., SIGPROF when profiling EasyBuild)
 
 @author: Josiah Carlson
 @author: Stijn De Weirdt (Ghent University)
@@ -77,6 +78,16 @@ import select  #@UnresolvedImport
 import fcntl  #@UnresolvedImport
 
 
+def _select(rlist, wlist, xlist, timeout):
+    """Wrapper for select.select, which retries when the call is interrupted by a signal (EINTR)."""
+    while True:
+        try:
+            return select.select(rlist, wlist, xlist, timeout)
+        except select.error, err:
+            if err[0] != errno.EINTR:
+                raise
+
+
 class Popen(subprocess.Popen):
     def recv(self, maxsize=None):
         return self._recv('stdout', maxsize)
@@ -102,7 +113,7 @@ class Popen(subprocess.Popen):
         if not self.stdin:
             return None
 
-        if not select.select([], [self.stdin], [], 0)[1]:
+        if not _select([], [self.stdin], [], 0)[1]:
             return 0
 
         try:
@@ -124,7 +135,7 @@ class Popen(subprocess.Popen):
             fcntl.fcntl(conn, fcntl.F_SETFL, flags | os.O_NONBLOCK)
 
         try:
-            if not select.select([conn], [], [], 0)[0]:
+            if not _select([conn], [], [], 0)[0]:
                 return ''
 
             r = conn.read(maxsize)
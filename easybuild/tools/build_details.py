@@ -29,9 +29,11 @@ and allow for reproducable builds
 @author: Stijn De Weirdt (Ghent University)
 """
 import time
+from easybuild.tools.counters import counter_totals, counters_since
 from easybuild.tools.filetools import det_size
 from easybuild.tools.ordereddict import OrderedDict
 from easybuild.tools.systemtools import get_system_info
+from easybuild.tools.timing import STEP
 from easybuild.tools.version import EASYBLOCKS_VERSION, FRAMEWORK_VERSION
 
 
@@ -42,6 +44,8 @@ def get_build_stats(app, start_time, command_line):
 
     time_now = time.time()
     build_time = round(time_now - start_time, 2)
+    # total count/time for hot path operations performed during this installation
+    counters = counter_totals(counters_since(app.counters_start))
 
     buildstats = OrderedDict([
         ('easybuild-framework_version', str(FRAMEWORK_VERSION)),
@@ -51,7 +55,12 @@ def get_build_stats(app, start_time, command_line):
         ('install_size', det_size(app.installdir)),
         ('command_line', command_line),
         ('modules_tool', app.modules_tool.buildstats()),
+        ('step_timings', app.timings.totals(STEP)),
+        ('step_cmd_usage', app.timings.cmd_usage_per_step()),
+        ('hot_path_counters', [(kind, cnt, tot) for (kind, (cnt, tot)) in counters.items()]),
     ])
+    if app.resource_sampler is not None:
+        buildstats.update({'resource_peaks': app.resource_sampler.peaks()})
     for key, val in sorted(get_system_info().items()):
         buildstats.update({key: val})
 
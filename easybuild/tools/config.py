@@ -55,6 +55,7 @@ _log = fancylogger.getLogger('config', fname=False)
 DEFAULT_LOGFILE_FORMAT = ("easybuild", "easybuild-%(name)s-%(version)s-%(date)s.%(time)s.log")
 DEFAULT_MNS = 'EasyBuildMNS'
 DEFAULT_MODULES_TOOL = 'EnvironmentModulesC'
+DEFAULT_MODULE_SYNTAX = 'Tcl'
 DEFAULT_PATH_SUBDIRS = {
     'buildpath': 'build',
     'installpath': '',
@@ -80,6 +81,7 @@ def mk_full_default_path(name, prefix=DEFAULT_PREFIX):
 BUILD_OPTIONS_CMDLINE = {
     None: [
         'aggregate_regtest',
+        'cachedir',
         'download_timeout',
         'dump_test_report',
         'easyblock',
@@ -92,6 +94,7 @@ BUILD_OPTIONS_CMDLINE = {
         'only_blocks',
         'optarch',
         'regtest_output_dir',
+        'sample_resources',
         'skip',
         'stop',
         'suffix_modules_path',
@@ -191,6 +194,7 @@ class ConfigurationVariables(FrozenDictKnownKeys):
         'subdir_software',
         'modules_tool',
         'module_naming_scheme',
+        'module_syntax',
     ]
     KNOWN_KEYS = REQUIRED  # KNOWN_KEYS must be defined for FrozenDictKnownKeys functionality
 
@@ -355,6 +359,13 @@ def get_module_naming_scheme():
     return ConfigurationVariables()['module_naming_scheme']
 
 
+def get_module_syntax():
+    """
+    Return syntax for generated module files (Tcl, Lua)
+    """
+    return ConfigurationVariables()['module_syntax']
+
+
 def log_file_format(return_directory=False):
     """Return the format for the logfile or the directory"""
     idx = int(not return_directory)
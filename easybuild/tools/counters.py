@@ -0,0 +1,149 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Lightweight instrumentation of hot paths in the framework (running shell commands, running module commands,
+checking for files), which keeps track of how often each of these operations is performed and how much time is
+spent on them, per call site.
+"""
+import copy
+import os
+import sys
+import threading
+import time
+
+from easybuild.tools.ordereddict import OrderedDict
+
+
+# kinds of operations that are counted
+ISFILE = 'isfile'
+RUN_CMD = 'run_cmd'
+RUN_CMD_QA = 'run_cmd_qa'
+RUN_MODULE = 'run_module'
+
+# number of call sites to include in report of counters
+TOP_CALL_SITES = 10
+
+# (count, total time) per (kind of operation, call site)
+_counters = {}
+# counted operations may be performed concurrently (e.g. by ModulesTool.dependencies_for)
+_counters_lock = threading.Lock()
+
+
+def call_site(frame):
+    """Return description of call site for specified frame, i.e. <path>:<function>:<line>."""
+    path = frame.f_code.co_filename
+    # only retain path relative to easybuild package (if possible)
+    idx = path.rfind(os.path.join('easybuild', ''))
+    if idx >= 0:
+        path = path[idx:]
+    return "%s:%s:%d" % (path, frame.f_code.co_name, frame.f_lineno)
+
+
+def counted(kind, skip_callers=None):
+    """
+    Decorator to count calls of the decorated function as the specified kind of operation.
+    The call site is the first calling frame that is not a function with the same name as the decorated function,
+    so calls made by methods overriding a decorated method are attributed to the caller of the overriding method.
+
+    @param skip_callers: names of functions that call the decorated function on behalf of their caller
+                         (calls are attributed to the call site of these functions instead)
+    """
+    def decorator(func):
+        """Decorate specified function."""
+        skip_names = [func.__name__] + (skip_callers or [])
+
+        def counted_func(*args, **kwargs):
+            """Call decorated function, and keep track of how often it's called and how long it takes."""
+            frame = sys._getframe(1)
+            while frame.f_back is not None and frame.f_code.co_name in skip_names:
+                frame = frame.f_back
+            key = (kind, call_site(frame))
+
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _counters_lock.acquire()
+                try:
+                    (cnt, total_time) = _counters.get(key, (0, 0.0))
+                    _counters[key] = (cnt + 1, total_time + time.time() - start)
+                finally:
+                    _counters_lock.release()
+
+        counted_func.__name__ = func.__name__
+        counted_func.__doc__ = func.__doc__
+        return counted_func
+
+    return decorator
+
+
+@counted(ISFILE)
+def isfile(path):
+    """Check whether specified path is an existing regular file (counted equivalent of os.path.isfile)."""
+    return os.path.isfile(path)
+
+
+def get_counters():
+    """Return (copy of) current counters."""
+    _counters_lock.acquire()
+    try:
+        return copy.copy(_counters)
+    finally:
+        _counters_lock.release()
+
+
+def reset_counters():
+    """Reset all counters."""
+    _counters_lock.acquire()
+    try:
+        _counters.clear()
+    finally:
+        _counters_lock.release()
+
+
+def counters_since(start_counters):
+    """Return counters for operations performed since the specified counters were obtained (see get_counters)."""
+    res = {}
+    for (key, (cnt, total_time)) in get_counters().items():
+        (start_cnt, start_time) = start_counters.get(key, (0, 0.0))
+        if cnt > start_cnt:
+            res[key] = (cnt - start_cnt, total_time - start_time)
+    return res
+
+
+def counter_totals(counters):
+    """Return total count and time for specified counters, per kind of operation (sorted by kind)."""
+    totals = {}
+    for ((kind, _), (cnt, total_time)) in counters.items():
+        (kind_cnt, kind_time) = totals.get(kind, (0, 0.0))
+        totals[kind] = (kind_cnt + cnt, kind_time + total_time)
+    return OrderedDict([(kind, (totals[kind][0], round(totals[kind][1], 2))) for kind in sorted(totals)])
+
+
+def top_call_sites(counters, top_n=TOP_CALL_SITES):
+    """Return list of (kind, call site, count, time) tuples for top N call sites (most time spent first)."""
+    call_sites = [(kind, site, cnt, total_time) for ((kind, site), (cnt, total_time)) in counters.items()]
+    call_sites.sort(key=lambda (kind, site, cnt, total_time): (-total_time, kind, site))
+    return call_sites[:top_n]
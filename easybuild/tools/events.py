@@ -0,0 +1,116 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for writing a stream of structured events on the progress of an EasyBuild session (see --events-file),
+in JSON Lines format (one JSON object per line), so it can be monitored without parsing log files.
+
+Every event includes the type of event, a timestamp, and the hostname and process ID of the EasyBuild session.
+Events are appended to the events file with a single write each, so multiple sessions can share an events file
+(on a local file system). Events are also passed to the registered event listeners (e.g., for exporting metrics).
+"""
+import json
+import os
+import socket
+import time
+from vsc.utils import fancylogger
+
+
+# types of events
+SESSION_START = 'session_start'
+PARSE_DONE = 'parse_done'
+RESOLUTION_DONE = 'resolution_done'
+BUILD_START = 'build_start'
+STEP_START = 'step_start'
+STEP_END = 'step_end'
+DOWNLOAD = 'download'
+FAILURE = 'failure'
+BUILD_END = 'build_end'
+SESSION_END = 'session_end'
+
+_events_file = None
+_listeners = []
+
+_log = fancylogger.getLogger('tools.events', fname=False)
+
+
+def enable_events_file(path):
+    """Start writing events to specified file (events are appended if the file already exists)."""
+    global _events_file
+    disable_events_file()
+
+    # avoid relying on filetools, since it also emits events
+    dirpath = os.path.dirname(os.path.abspath(path))
+    try:
+        if not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+        # unbuffered, so every event is written with a single write
+        _events_file = open(path, 'a', 0)
+        _log.info("Writing events to %s" % path)
+    except (IOError, OSError), err:
+        _log.error("Failed to open events file %s: %s" % (path, err))
+
+
+def disable_events_file():
+    """Stop writing events."""
+    global _events_file
+    if _events_file is not None:
+        _events_file.close()
+        _events_file = None
+
+
+def add_event_listener(listener):
+    """Register function to call with every emitted event (a dict, cfr. the JSON objects in the events file)."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_event_listener(listener):
+    """Unregister specified event listener."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def emit_event(event, **data):
+    """
+    Write event of specified type to events file and pass it to event listeners (no-op if neither are used).
+
+    @param event: type of event (e.g., STEP_END)
+    @param data: additional information on the event (should be serializable to JSON)
+    """
+    if _events_file is not None or _listeners:
+        record = {
+            'event': event,
+            'hostname': socket.gethostname(),
+            'pid': os.getpid(),
+            'time': time.time(),
+        }
+        record.update(data)
+        if _events_file is not None:
+            try:
+                _events_file.write(json.dumps(record, sort_keys=True) + '\n')
+            except (IOError, TypeError, ValueError), err:
+                _log.warning("Failed to write %s event to events file: %s" % (event, err))
+        for listener in _listeners:
+            listener(record)
@@ -46,6 +46,7 @@ from vsc.utils import fancylogger
 import easybuild.tools.environment as env
 from easybuild.tools.build_log import print_msg  # import build_log must stay, to activate use of EasyBuildLog
 from easybuild.tools.config import build_option
+from easybuild.tools.events import DOWNLOAD, emit_event
 from easybuild.tools import run
 
 
@@ -275,8 +276,13 @@ def download_file(filename, url, path):
             # urllib2 does the right thing for http proxy setups, urllib does not!
             url_fd = urllib2.urlopen(url, timeout=timeout)
             _log.debug('response code for given url %s: %s' % (url, url_fd.getcode()))
-            write_file(path, url_fd.read())
+            download_start = time.time()
+            data = url_fd.read()
+            download_time = time.time() - download_start
+            write_file(path, data)
             _log.info("Downloaded file %s from url %s to %s" % (filename, url, path))
+            emit_event(DOWNLOAD, url=url, path=path, bytes=len(data), duration=download_time,
+                       rate=len(data) / max(download_time, 1e-6))
             downloaded = True
             url_fd.close()
         except urllib2.HTTPError as err:
@@ -0,0 +1,111 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for reporting the time spent on importing Python modules (cfr. 'python -X importtime' in Python 3.7+).
+
+This module should not import any other EasyBuild modules,
+since it needs to be usable before anything else is imported.
+"""
+import __builtin__
+import atexit
+import os
+import sys
+import time
+
+
+IMPORT_TIMES_OPTION = '--import-times'
+IMPORT_TIMES_ENV_VAR = 'EASYBUILD_IMPORT_TIMES'
+
+# list of (module name, nesting depth, self time, cumulative time) tuples, in order of completion
+_import_times = []
+# time spent in nested imports, for each import that is in progress
+_nested_import_times = []
+_orig_import = None
+
+
+def import_times_requested(args):
+    """
+    Determine whether a report of import times is requested, via the command line arguments or the environment.
+    This needs to be determined before the command line options are parsed, since parsing them requires imports.
+    """
+    return IMPORT_TIMES_OPTION in args or os.environ.get(IMPORT_TIMES_ENV_VAR, '').lower() in ['1', 'true', 'yes']
+
+
+def _timed_import(name, *args, **kwargs):
+    """Replacement for __import__ built-in function, which keeps track of the time spent on importing modules."""
+    # only time imports of modules that were not imported yet
+    if name in sys.modules:
+        return _orig_import(name, *args, **kwargs)
+
+    _nested_import_times.append(0.0)
+    start = time.time()
+    try:
+        return _orig_import(name, *args, **kwargs)
+    finally:
+        cumulative = time.time() - start
+        nested = _nested_import_times.pop()
+        if _nested_import_times:
+            _nested_import_times[-1] += cumulative
+        # failed imports are not reported
+        if sys.modules.get(name) is not None:
+            _import_times.append((name, len(_nested_import_times), cumulative - nested, cumulative))
+
+
+def import_times_report():
+    """Return report of import times, using the same format as 'python -X importtime'."""
+    lines = ["import time: self [us] | cumulative | imported package"]
+    for (name, depth, self_time, cumulative) in _import_times:
+        lines.append("import time: %9d | %10d | %s%s" % (self_time * 1e6, cumulative * 1e6, '  ' * depth, name))
+
+    total = sum([cumulative for (_, depth, _, cumulative) in _import_times if depth == 0])
+    lines.append("import time: %.1f ms in total for %d modules" % (total * 1e3, len(_import_times)))
+
+    return '\n'.join(lines)
+
+
+def print_import_times_report():
+    """Print report of import times to stderr."""
+    sys.stderr.write(import_times_report() + '\n')
+
+
+def enable_import_times(report_at_exit=True):
+    """
+    Start keeping track of the time spent on importing modules.
+    @param report_at_exit: print report of import times to stderr when the Python interpreter exits
+    """
+    global _orig_import
+    if _orig_import is None:
+        _orig_import = __builtin__.__import__
+        __builtin__.__import__ = _timed_import
+        if report_at_exit:
+            atexit.register(print_import_times_report)
+
+
+def disable_import_times():
+    """Stop keeping track of the time spent on importing modules."""
+    global _orig_import
+    if _orig_import is not None:
+        __builtin__.__import__ = _orig_import
+        _orig_import = None
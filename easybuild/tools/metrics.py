@@ -0,0 +1,304 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for exposing metrics on the progress of an EasyBuild session (see --metrics-file and --metrics-http),
+so build hosts can be monitored via Prometheus.
+
+Metrics are derived from the events emitted during the session (see easybuild.tools.events),
+and from the counters for hot path operations (see easybuild.tools.counters).
+They are served in the OpenMetrics text format via HTTP (or the Prometheus text format, if the client doesn't
+accept OpenMetrics), and written in the Prometheus text format to the metrics file (cfr. the textfile collector
+of the Prometheus node exporter).
+"""
+import BaseHTTPServer
+import os
+import tempfile
+import threading
+import time
+from vsc.utils import fancylogger
+
+from easybuild.tools.counters import counter_totals, get_counters
+from easybuild.tools.events import BUILD_END, BUILD_START, DOWNLOAD, PARSE_DONE, RESOLUTION_DONE, SESSION_END
+from easybuild.tools.events import STEP_END, STEP_START, add_event_listener, remove_event_listener
+from easybuild.tools.filetools import mkdir
+
+
+METRICS_PREFIX = 'easybuild'
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_HTTP_HOST = 'localhost'
+
+_metrics = None
+_metrics_file = None
+_http_server = None
+
+_log = fancylogger.getLogger('tools.metrics', fname=False)
+
+
+def escape_label_value(value):
+    """Escape specified label value, as required by the OpenMetrics/Prometheus text formats."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_metric(name, mtype, descr, samples, openmetrics=True):
+    """
+    Format metric family with specified name, type and description, and specified samples.
+
+    @param samples: list of (suffix, labels, value) tuples (labels is a dict)
+    @param openmetrics: use OpenMetrics text format (rather than Prometheus text format)
+    """
+    name = '%s_%s' % (METRICS_PREFIX, name)
+    # in the Prometheus text format, the name of a counter includes the '_total' suffix
+    family = name
+    if mtype == 'counter' and not openmetrics:
+        family += '_total'
+
+    lines = [
+        "# HELP %s %s" % (family, descr),
+        "# TYPE %s %s" % (family, mtype),
+    ]
+    for (suffix, labels, value) in samples:
+        labels_txt = ','.join(['%s="%s"' % (key, escape_label_value(labels[key])) for key in sorted(labels)])
+        if labels_txt:
+            labels_txt = '{%s}' % labels_txt
+        lines.append("%s%s%s %s" % (name, suffix, labels_txt, repr(float(value))))
+
+    return lines
+
+
+class SessionMetrics(object):
+    """Metrics for an EasyBuild session, which are updated based on the events emitted during the session."""
+
+    def __init__(self):
+        """SessionMetrics constructor."""
+        # events may be handled while metrics are being rendered for an HTTP request
+        self.lock = threading.Lock()
+
+        self.start_time = time.time()
+        # end time of session, 0 while session is still running
+        self.end_time = 0
+        self.easyconfigs_parsed = 0
+        self.builds_queued = 0
+        self.builds = {True: 0, False: 0}
+        self.builds_in_progress = 0
+        self.current_step = None
+        # (count, total duration) per step
+        self.step_durations = {}
+        self.downloads = 0
+        self.downloaded_bytes = 0
+
+    def handle_event(self, event):
+        """Update metrics based on specified event."""
+        self.lock.acquire()
+        try:
+            etype = event['event']
+            if etype == PARSE_DONE:
+                self.easyconfigs_parsed += event['easyconfigs']
+            elif etype == RESOLUTION_DONE:
+                self.builds_queued = event['easyconfigs']
+            elif etype == BUILD_START:
+                self.builds_in_progress += 1
+                self.builds_queued = event['total'] - event['index']
+            elif etype == BUILD_END:
+                self.builds_in_progress -= 1
+                self.builds[bool(event['success'])] += 1
+                self.current_step = None
+            elif etype == STEP_START:
+                self.current_step = (event['module'], event['step'])
+            elif etype == STEP_END:
+                self.current_step = None
+                (cnt, total) = self.step_durations.get(event['step'], (0, 0.0))
+                self.step_durations[event['step']] = (cnt + 1, total + event['wall'])
+            elif etype == DOWNLOAD:
+                self.downloads += 1
+                self.downloaded_bytes += event['bytes']
+            elif etype == SESSION_END:
+                # builds that were not started (yet) or did not complete will not be (by this session)
+                self.end_time = event['time']
+                self.builds_queued = 0
+                self.builds_in_progress = 0
+                self.current_step = None
+        finally:
+            self.lock.release()
+
+    def render(self, openmetrics=True):
+        """Render current metrics in OpenMetrics (or Prometheus) text format."""
+        self.lock.acquire()
+        try:
+            metrics = [
+                ('session_start_time_seconds', 'gauge', "Start time of the EasyBuild session",
+                 [('', {}, self.start_time)]),
+                ('session_end_time_seconds', 'gauge', "End time of the EasyBuild session (0 while still running)",
+                 [('', {}, self.end_time)]),
+                ('easyconfigs_parsed', 'gauge', "Number of parsed easyconfig files",
+                 [('', {}, self.easyconfigs_parsed)]),
+                ('builds_queued', 'gauge', "Number of builds that were not started yet",
+                 [('', {}, self.builds_queued)]),
+                ('builds_in_progress', 'gauge', "Number of builds in progress",
+                 [('', {}, self.builds_in_progress)]),
+                ('builds', 'counter', "Number of completed builds, by result",
+                 [('_total', {'result': 'success'}, self.builds[True]),
+                  ('_total', {'result': 'failure'}, self.builds[False])]),
+            ]
+
+            current_step = []
+            if self.current_step is not None:
+                current_step.append(('', {'module': self.current_step[0], 'step': self.current_step[1]}, 1))
+            metrics.append(('current_step', 'gauge', "Build step in progress", current_step))
+
+            step_durations = []
+            for step in sorted(self.step_durations):
+                (cnt, total) = self.step_durations[step]
+                step_durations.extend([('_count', {'step': step}, cnt), ('_sum', {'step': step}, total)])
+            metrics.append(('step_duration_seconds', 'summary', "Time spent in build steps", step_durations))
+
+            metrics.extend([
+                ('downloads', 'counter', "Number of downloaded files", [('_total', {}, self.downloads)]),
+                ('downloaded_bytes', 'counter', "Number of downloaded bytes", [('_total', {}, self.downloaded_bytes)]),
+            ])
+        finally:
+            self.lock.release()
+
+        op_counts, op_times = [], []
+        for (kind, (cnt, total_time)) in counter_totals(get_counters()).items():
+            op_counts.append(('_total', {'kind': kind}, cnt))
+            op_times.append(('_total', {'kind': kind}, total_time))
+        metrics.extend([
+            ('operations', 'counter', "Number of hot path operations (shell commands, module commands, ...)",
+             op_counts),
+            ('operation_seconds', 'counter', "Time spent in hot path operations", op_times),
+        ])
+
+        lines = []
+        for (name, mtype, descr, samples) in metrics:
+            lines.extend(format_metric(name, mtype, descr, samples, openmetrics=openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+
+        return '\n'.join(lines) + '\n'
+
+
+def write_metrics_file(path, metrics):
+    """Write specified metrics to specified path (in Prometheus text format)."""
+    # write to a temporary file first and rename, to avoid that the metrics are scraped from a partial file
+    try:
+        metrics_dir = os.path.dirname(os.path.abspath(path))
+        mkdir(metrics_dir, parents=True)
+        fd, tmp_path = tempfile.mkstemp(dir=metrics_dir)
+        os.write(fd, metrics.render(openmetrics=False))
+        os.close(fd)
+        os.chmod(tmp_path, 0644)
+        os.rename(tmp_path, path)
+    except (IOError, OSError), err:
+        _log.warning("Failed to write metrics to %s: %s" % (path, err))
+
+
+class MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Handler for HTTP requests for metrics."""
+
+    def do_GET(self):
+        """Serve current metrics."""
+        if self.path.split('?')[0] in ['/', '/metrics']:
+            openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+            txt = self.server.metrics.render(openmetrics=openmetrics)
+            self.send_response(200)
+            if openmetrics:
+                self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE)
+            else:
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(txt)))
+            self.end_headers()
+            self.wfile.write(txt)
+        else:
+            self.send_error(404)
+
+    def log_message(self, fmt, *args):
+        """Log requests to the EasyBuild log rather than to stderr."""
+        _log.debug("Metrics request from %s: %s" % (self.client_address[0], fmt % args))
+
+
+def parse_http_address(address):
+    """Parse specified address to serve metrics on ('<port>' or '<host>:<port>') into a (host, port) tuple."""
+    host, port = DEFAULT_HTTP_HOST, address
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+    try:
+        return (host, int(port))
+    except ValueError:
+        _log.error("Invalid address to serve metrics on, should be '<port>' or '<host>:<port>': %s" % address)
+
+
+def _handle_event(event):
+    """Update metrics based on specified event, and update metrics file (if any)."""
+    _metrics.handle_event(event)
+    if _metrics_file is not None:
+        write_metrics_file(_metrics_file, _metrics)
+
+
+def enable_metrics(path=None, http_address=None):
+    """
+    Start keeping track of metrics for this session.
+
+    @param path: path to metrics file, which is updated for every event
+    @param http_address: address to serve metrics on via HTTP ('<port>' or '<host>:<port>')
+    """
+    global _metrics, _metrics_file, _http_server
+    disable_metrics()
+
+    _metrics = SessionMetrics()
+    _metrics_file = path
+    add_event_listener(_handle_event)
+
+    if http_address is not None:
+        (host, port) = parse_http_address(http_address)
+        try:
+            _http_server = BaseHTTPServer.HTTPServer((host, port), MetricsRequestHandler)
+        except IOError, err:
+            _log.error("Failed to serve metrics on %s:%s: %s" % (host, port, err))
+        _http_server.metrics = _metrics
+        thread = threading.Thread(target=_http_server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        _log.info("Serving metrics on http://%s:%s/metrics" % _http_server.server_address)
+
+    if _metrics_file is not None:
+        write_metrics_file(_metrics_file, _metrics)
+
+    return _metrics
+
+
+def disable_metrics():
+    """Stop keeping track of metrics (metrics file is updated one last time, and HTTP server is stopped)."""
+    global _metrics, _metrics_file, _http_server
+    if _metrics is not None:
+        remove_event_listener(_handle_event)
+        if _metrics_file is not None:
+            write_metrics_file(_metrics_file, _metrics)
+        if _http_server is not None:
+            _http_server.shutdown()
+            _http_server.server_close()
+        _metrics, _metrics_file, _http_server = None, None, None
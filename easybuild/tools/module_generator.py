@@ -23,7 +23,7 @@
 # along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
 # #
 """
-Generating module files.
+Generating module files, in Tcl or Lua syntax.
 
 @author: Stijn De Weirdt (Ghent University)
 @author: Dries Verdegem (Ghent University)
@@ -36,10 +36,11 @@ import os
 import re
 import tempfile
 from vsc.utils import fancylogger
+from vsc.utils.missing import get_subclasses
 
 from easybuild.framework.easyconfig.easyconfig import ActiveMNS
 from easybuild.tools import config
-from easybuild.tools.config import build_option
+from easybuild.tools.config import build_option, get_module_syntax, get_modules_tool
 from easybuild.tools.filetools import mkdir
 from easybuild.tools.module_naming_scheme.utilities import det_hidden_modname
 from easybuild.tools.utilities import quote_str
@@ -48,10 +49,28 @@ from easybuild.tools.utilities import quote_str
 _log = fancylogger.getLogger('module_generator', fname=False)
 
 
+def quote_lua_str(txt):
+    """Quote specified string value for use in Lua code."""
+    return '"%s"' % txt.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def quote_lua_long_str(txt):
+    """Quote specified string value as a Lua long string, using long brackets of a level that don't clash with it."""
+    level = 0
+    # also consider the closing bracket, since the string value may end with (part of) a closing long bracket
+    while ']%s]' % ('=' * level) in txt + ']':
+        level += 1
+    return '[%(eqs)s[%(txt)s]%(eqs)s]' % {'eqs': '=' * level, 'txt': txt}
+
+
 class ModuleGenerator(object):
     """
-    Class for generating module files.
+    Class for generating module files (in Tcl syntax).
     """
+    # syntax of generated module files
+    SYNTAX = 'Tcl'
+    # file extension for generated module files
+    MODULE_FILE_EXTENSION = ''
 
     # chars we want to escape in the generated modulefiles
     CHARS_TO_ESCAPE = ["$"]
@@ -69,12 +88,12 @@ class ModuleGenerator(object):
         Creates the absolute filename for the module.
         """
         mod_path_suffix = build_option('suffix_modules_path')
-        full_mod_name = self.app.full_mod_name
+        mod_file_name = self.app.full_mod_name + self.MODULE_FILE_EXTENSION
         # module file goes in general moduleclass category
-        self.filename = os.path.join(self.module_path, mod_path_suffix, full_mod_name)
+        self.filename = os.path.join(self.module_path, mod_path_suffix, mod_file_name)
         # make symlink in moduleclass category
         mod_symlink_paths = ActiveMNS().det_module_symlink_paths(self.app.cfg)
-        self.class_mod_files = [os.path.join(self.module_path, p, full_mod_name) for p in mod_symlink_paths]
+        self.class_mod_files = [os.path.join(self.module_path, p, mod_file_name) for p in mod_symlink_paths]
 
         # create directories and links
         for path in [os.path.dirname(x) for x in [self.filename] + self.class_mod_files]:
@@ -138,8 +157,9 @@ class ModuleGenerator(object):
         txt = '\n'.join(lines) % {
             'name': self.app.name,
             'version': self.app.version,
-            'description': description,
+            'help': quote_lua_long_str(description),
             'installdir': self.app.installdir,
+            'whatis': quote_lua_long_str("Description: %s" % description),
         }
 
         return txt
@@ -203,10 +223,17 @@ class ModuleGenerator(object):
             use_statements.append("module use %s" % path)
         return '\n'.join(use_statements)
 
-    def set_environment(self, key, value):
+    def set_environment(self, key, value, relpath=False):
         """
         Generate setenv statement for the given key/value pair.
+
+        @param relpath: value is a path relative to the installation directory (empty string for installation directory)
         """
+        if relpath:
+            if value:
+                value = os.path.join('$root', value)
+            else:
+                value = '$root'
         # quotes are needed, to ensure smooth working of EBDEVEL* modulefiles
         return 'setenv\t%s\t\t%s\n' % (key, quote_str(value))
     
@@ -238,6 +265,10 @@ class ModuleGenerator(object):
         # quotes are needed, to ensure smooth working of EBDEVEL* modulefiles
         return 'set-alias\t%s\t\t%s\n' % (key, quote_str(value))
 
+    def comment(self, msg):
+        """Generate comment with specified message."""
+        return "# %s\n" % msg
+
     def set_fake(self, fake):
         """Determine whether this ModuleGenerator instance should generate fake modules."""
         _log.debug("Updating fake for this ModuleGenerator instance to %s (was %s)" % (fake, self.fake))
@@ -253,3 +284,169 @@ class ModuleGenerator(object):
     def is_fake(self):
         """Return whether this ModuleGenerator instance generates fake modules or not."""
         return self.fake
+
+
+class ModuleGeneratorLua(ModuleGenerator):
+    """
+    Class for generating module files in Lua syntax (only supported by Lmod).
+    """
+    SYNTAX = 'Lua'
+    MODULE_FILE_EXTENSION = '.lua'
+
+    def get_description(self, conflict=True):
+        """
+        Generate a description.
+        """
+        description = "%s - Homepage: %s" % (self.app.cfg['description'], self.app.cfg['homepage'])
+
+        lines = [
+            "help(%(help)s)",
+            "",
+            "whatis(%(whatis)s)",
+            "",
+            'local root = "%(installdir)s"',
+            "",
+        ]
+
+        if self.app.cfg['moduleloadnoconflict']:
+            lines.extend([
+                'if isloaded("%(name)s") and not isloaded("%(name)s/%(version)s") then',
+                '    unload("%(name)s")',
+                "end",
+                "",
+            ])
+
+        elif conflict:
+            # conflict on 'name' part of module name (excluding version part at the end)
+            lines.append('conflict("%s")\n' % os.path.dirname(self.app.short_mod_name))
+
+        txt = '\n'.join(lines) % {
+            'name': self.app.name,
+            'version': self.app.version,
+            'help': quote_lua_long_str(description),
+            'installdir': self.app.installdir,
+            'whatis': quote_lua_long_str("Description: %s" % description),
+        }
+
+        return txt
+
+    def load_module(self, mod_name):
+        """
+        Generate load statements for module.
+        """
+        if build_option('recursive_mod_unload'):
+            # not wrapping the 'load' with an isloaded guard ensures recursive unloading
+            load_statement = ['load("%(mod_name)s")']
+        else:
+            load_statement = [
+                'if not isloaded("%(mod_name)s") then',
+                '    load("%(mod_name)s")',
+                "end",
+            ]
+        return '\n'.join([""] + load_statement + [""]) % {'mod_name': mod_name}
+
+    def unload_module(self, mod_name):
+        """
+        Generate unload statements for module.
+        """
+        return '\n'.join([
+            "",
+            'if isloaded("%(mod_name)s") then',
+            '    unload("%(mod_name)s")',
+            "end",
+            "",
+        ]) % {'mod_name': mod_name}
+
+    def prepend_paths(self, key, paths, allow_abs=False):
+        """
+        Generate prepend_path statements for the given list of paths.
+        """
+        if isinstance(paths, basestring):
+            _log.info("Wrapping %s into a list before using it to prepend path %s" % (paths, key))
+            paths = [paths]
+
+        statements = []
+        for path in paths:
+            # make sure only relative paths are passed
+            if os.path.isabs(path):
+                if allow_abs:
+                    statements.append('prepend_path("%s", %s)\n' % (key, quote_lua_str(path)))
+                else:
+                    _log.error("Absolute path %s passed to prepend_paths which only expects relative paths." % path)
+            else:
+                # prepend root (= installdir) for relative paths
+                statements.append('prepend_path("%s", pathJoin(root, %s))\n' % (key, quote_lua_str(path)))
+
+        return ''.join(statements)
+
+    def use(self, paths):
+        """
+        Generate statements to extend $MODULEPATH with given list of module paths.
+        """
+        return '\n'.join(['prepend_path("MODULEPATH", %s)' % quote_lua_str(path) for path in paths])
+
+    def set_environment(self, key, value, relpath=False):
+        """
+        Generate setenv statement for the given key/value pair.
+
+        @param relpath: value is a path relative to the installation directory (empty string for installation directory)
+        """
+        if relpath:
+            if value:
+                value = 'pathJoin(root, %s)' % quote_lua_str(value)
+            else:
+                value = 'root'
+        else:
+            value = quote_lua_str(value)
+        return 'setenv("%s", %s)\n' % (key, value)
+
+    def msg_on_load(self, msg):
+        """
+        Add a message that should be printed when loading the module.
+        """
+        return '\n'.join([
+            "",
+            'if mode() == "load" then',
+            "    io.stderr:write(%s)" % quote_lua_str(msg),
+            "end",
+            "",
+        ])
+
+    def add_tcl_footer(self, tcltxt):
+        """
+        Append whatever Tcl code you want to your modulefile
+        """
+        _log.error("Including a Tcl footer is not supported when generating module files in Lua syntax: %s" % tcltxt)
+
+    def set_alias(self, key, value):
+        """
+        Generate set_alias statement in modulefile for the given key/value pair.
+        """
+        return 'set_alias("%s", %s)\n' % (key, quote_lua_str(value))
+
+    def comment(self, msg):
+        """Generate comment with specified message."""
+        return "-- %s\n" % msg
+
+
+def avail_module_generators():
+    """
+    Return all known module generators, as a dictionary with the module syntax as key.
+    """
+    return dict([(klass.SYNTAX, klass) for klass in [ModuleGenerator] + get_subclasses(ModuleGenerator)])
+
+
+def module_generator(app, fake=False):
+    """
+    Return module generator instance for the module syntax that is configured (Tcl, Lua).
+    """
+    module_syntax = get_module_syntax()
+    module_generator_class = avail_module_generators().get(module_syntax)
+    if module_generator_class is None:
+        _log.error("Unknown module syntax: %s" % module_syntax)
+    if module_syntax == 'Lua' and get_modules_tool() != 'Lmod':
+        _log.error("Generating module files in Lua syntax requires Lmod as modules tool")
+    if module_syntax == 'Lua' and build_option('modules_footer') is not None:
+        _log.error("Including a modules footer (see --modules-footer) is not supported for module files in Lua syntax")
+
+    return module_generator_class(app, fake=fake)
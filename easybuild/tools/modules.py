@@ -39,6 +39,7 @@ import os
 import re
 import subprocess
 import sys
+import time
 from distutils.version import StrictVersion
 from subprocess import PIPE
 from vsc.utils import fancylogger
@@ -47,11 +48,14 @@ from vsc.utils.patterns import Singleton
 
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option, get_modules_tool, install_path
+from easybuild.tools.counters import RUN_MODULE, counted
 from easybuild.tools.environment import restore_env
-from easybuild.tools.filetools import convert_name, mkdir, read_file, path_matches, which
+from easybuild.tools.filetools import convert_name, mkdir, read_file, path_matches, which, write_file
 from easybuild.tools.module_naming_scheme import DEVEL_MODULE_SUFFIX
+from easybuild.tools.registry import load_registry, store_registry
 from easybuild.tools.run import run_cmd
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME, DUMMY_TOOLCHAIN_VERSION
+from easybuild.tools.version import VERSION
 from vsc.utils.missing import nub
 
 # software root/version environment variable name prefixes
@@ -115,6 +119,37 @@ output_matchers = {
         """, re.VERBOSE),
 }
 
+# magic cookie that (Tcl) module files start with
+MODULEFILE_MAGIC = '#%Module'
+# names of files/directories in module paths that do not correspond to modules
+NON_MODULE_FILES = ['.git', '.modulerc', '.modulerc.lua', '.svn', '.version', 'CVS', 'RCS']
+
+# files that hold module commands for the module directory they're in (typically to set a default version)
+MODULERC_FILES = ['.modulerc', '.modulerc.lua', '.version']
+# lines in .modulerc/.version files that set the default version, which can be interpreted without the modules tool
+MODULERC_DEFAULT_REGEXES = [
+    re.compile(r'^\s*set\s+ModulesVersion\s+"?(?P<version>[^"\s]+)"?\s*$'),
+    re.compile(r'^\s*module-version\s+"?(?P<version>[^"\s]+)"?\s+default\s*$'),
+]
+# regex for statements in module files that extend $MODULEPATH, i.e. 'module use' (Tcl) or 'prepend_path' (Lua)
+MODULE_USE_REGEX = re.compile(r'^\s*(?:module\s+use\s+"?|prepend_path\(\s*"MODULEPATH"\s*,\s*")([^"\s]+)', re.M)
+# regex for statements in module files that load other modules, i.e. 'module load' (Tcl) or 'load' (Lua)
+MODULE_LOAD_REGEX = re.compile(r'^\s*(?:module\s+load\s+"?|load\(\s*")([^"\s]+)', re.M)
+# regexes for (supported) statements in Tcl and Lua module files, see VirtualModules
+VIRTUAL_MODULES_TCL_REGEX = re.compile(r'^(?P<cmd>set|setenv|unsetenv|prepend-path|append-path|module)\s+(?P<args>.+)$')
+VIRTUAL_MODULES_LUA_REGEX = re.compile(r'^(?:local\s+(?P<var>\w+)\s*=\s*(?P<value>.+)|'
+                                       r'(?P<cmd>setenv|unsetenv|prepend_path|append_path|load|unload)'
+                                       r'\((?P<args>.*)\))$')
+
+# subdirectory of cache directory to store results of probing modules tools in
+PROBE_CACHE_SUBDIR = 'modules_tool'
+
+# cache for results of probing modules tools (per class), see probe method
+_probe_cache = {}
+
+# maximum number of threads to use for reading module files concurrently
+MAX_MODULEFILE_READERS = 8
+
 _log = fancylogger.getLogger('modules', fname=False)
 
 
@@ -136,6 +171,10 @@ class ModulesTool(object):
     VERSION_REGEXP = None
     # modules tool user cache directory
     USER_CACHE_DIR = None
+    # whether multiple modules can be loaded with a single module command
+    BATCH_LOAD = True
+    # file extensions for module files (empty string for module files without extension)
+    MODULEFILE_EXTENSIONS = ['']
 
     __metaclass__ = Singleton
 
@@ -170,6 +209,17 @@ class ModulesTool(object):
         # version of modules tool
         self.version = None
 
+        # cache for output of 'module avail', see available method
+        self._available_cache = {}
+        # cache for changes to the environment made by 'module load', see run_module method
+        self._load_env_cache = {}
+        # cache for modules loaded directly by module files, see direct_dependencies_for method
+        self._direct_deps_cache = {}
+
+        # whether updates after new modules were added should be deferred, and whether such an update is pending
+        self._defer_updates = False
+        self._update_pending = False
+
         # some initialisation/verification
         self.check_cmd_avail()
         self.check_module_path()
@@ -191,7 +241,7 @@ class ModulesTool(object):
             self.log.error('No VERSION_REGEXP defined')
 
         try:
-            txt = self.run_module(self.VERSION_OPTION, return_output=True)
+            txt = self.probe('version', lambda: self.run_module(self.VERSION_OPTION, return_output=True))
 
             ver_re = re.compile(self.VERSION_REGEXP, re.M)
             res = ver_re.search(txt)
@@ -220,6 +270,82 @@ class ModulesTool(object):
             else:
                 self.log.debug('Version %s matches requirement %s' % (self.version, self.REQ_VERSION))
 
+    def probe_cache_stamp(self):
+        """
+        Return stamp for results of probing the modules tool, which changes whenever the modules tool command is
+        changed (i.e. reinstalled) or when the definition of the 'module' function in the environment changes.
+        """
+        try:
+            cmd_mtime = os.stat(self.cmd).st_mtime
+        except OSError:
+            cmd_mtime = None
+
+        # the 'module' function is exported via the environment ($BASH_FUNC_module%%, or $module during testing),
+        # or is defined by the script that $BASH_ENV points to
+        func_env = {}
+        for (key, val) in os.environ.items():
+            if key in ['BASH_ENV', 'module'] or key.startswith('BASH_FUNC_module'):
+                func_env[key] = val
+
+        return {
+            'cmd': self.cmd,
+            'cmd_mtime': cmd_mtime,
+            'module_function': func_env,
+            'version': str(VERSION),
+            'version_option': self.VERSION_OPTION,
+        }
+
+    def probe_cache_path(self):
+        """Return path to file to store results of probing the modules tool in (None if no cache dir is available)."""
+        cachedir = build_option('cachedir')
+        if cachedir is None:
+            return None
+        else:
+            return os.path.join(cachedir, PROBE_CACHE_SUBDIR, '%s.json' % self.__class__.__name__)
+
+    def probe(self, name, probe_func):
+        """
+        Return result of probing the modules tool, e.g. the output of 'module --version';
+        results are cached in memory and in the cache directory (if one is configured),
+        so the modules tool only needs to be probed once as long as it is not changed.
+
+        @param name: name of the probe
+        @param probe_func: function to probe the modules tool (result must be serializable to JSON)
+        """
+        key = self.__class__.__name__
+        stamp = self.probe_cache_stamp()
+
+        if key in _probe_cache and _probe_cache[key][0] == stamp:
+            results = _probe_cache[key][1]
+        else:
+            results = None
+            path = self.probe_cache_path()
+            if path is not None:
+                results = load_registry(path, stamp)
+            if results is None:
+                results = {}
+            _probe_cache[key] = (stamp, results)
+
+        if name in results:
+            self.log.debug("Using cached result for '%s' probe of %s: %s" % (name, key, results[name]))
+        else:
+            results[name] = probe_func()
+            path = self.probe_cache_path()
+            if path is not None:
+                store_registry(path, stamp, results)
+
+        return results[name]
+
+    def invalidate_probe_cache(self):
+        """Invalidate cached results of probing the modules tool, both in memory and in the cache directory."""
+        _probe_cache.pop(self.__class__.__name__, None)
+        path = self.probe_cache_path()
+        if path is not None and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError, err:
+                self.log.warning("Failed to remove %s: %s" % (path, err))
+
     def check_cmd_avail(self):
         """Check whether modules tool command is available."""
         cmd_path = which(self.cmd)
@@ -239,7 +365,8 @@ class ModulesTool(object):
             else:
                 out, ec = None, 1
         else:
-            out, ec = run_cmd("type module", simple=False, log_ok=False, log_all=False)
+            type_module = lambda: run_cmd("type module", simple=False, log_ok=False, log_all=False)
+            out, ec = self.probe('module_function', type_module)
 
         if regex is None:
             regex = r".*%s" % os.path.basename(self.cmd)
@@ -327,48 +454,326 @@ class ModulesTool(object):
             self.use(mod_path)
         self.log.info("$MODULEPATH set based on list of module paths (via 'module use'): %s" % os.environ['MODULEPATH'])
 
+    def invalidate_available_cache(self):
+        """Invalidate cache for available modules, e.g. after new module files have been installed."""
+        self.log.debug("Invalidating cache for available modules")
+        self._available_cache.clear()
+
+    def modulefiles_stamp(self, paths):
+        """
+        Return stamp for the specified module files (or other paths, e.g. directories),
+        which consists of the modification time and size of each of them.
+        """
+        stamp = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stamp.append((path, st.st_mtime, st.st_size))
+            except OSError:
+                stamp.append((path, None, None))
+        return tuple(stamp)
+
+    def load_env_cache_key(self, mod_names):
+        """
+        Determine key for cached environment changes made by loading the specified modules,
+        or None if these changes should not be cached (if no module file was found for one of the modules).
+        """
+        mod_paths = [self.find_modulefile(mod_name) for mod_name in mod_names]
+        if None in mod_paths:
+            return None
+        return (tuple(mod_names), tuple(mod_paths),
+                os.environ.get('MODULEPATH', ''), os.environ.get('LOADEDMODULES', ''))
+
+    def invalidate_load_env_cache(self):
+        """Invalidate cache for environment changes made by loading modules."""
+        self.log.debug("Invalidating cache for environment changes made by loading modules")
+        self._load_env_cache.clear()
+
+    def cached_load(self, key):
+        """
+        Apply cached changes to the environment for loading modules, if they're still valid;
+        returns True if cached changes were applied, False otherwise.
+        """
+        if key is None or key not in self._load_env_cache:
+            return False
+
+        (stamp, env_delta) = self._load_env_cache[key]
+        # changes can only be applied if the module files are unchanged, and if the environment variables that are
+        # changed by loading the modules have the same value as when the changes were recorded
+        if self.modulefiles_stamp([path for (path, _, _) in stamp]) != stamp:
+            return False
+        if any([os.environ.get(var) != old for (var, (old, _)) in env_delta.items()]):
+            return False
+
+        self.log.debug("Applying cached changes to environment for 'module load %s'" % ' '.join(key[0]))
+        for (var, (_, new)) in env_delta.items():
+            if new is None:
+                del os.environ[var]
+            else:
+                os.environ[var] = new
+        return True
+
+    def cache_load(self, key, env_before):
+        """Cache changes to the environment made by loading modules (compared to the specified environment)."""
+        env_delta = {}
+        for var in set(env_before.keys() + os.environ.keys()):
+            if env_before.get(var) != os.environ.get(var):
+                env_delta[var] = (env_before.get(var), os.environ.get(var))
+
+        # (all) module files that were loaded, including those of modules loaded by the specified modules
+        mod_files = [f for f in os.environ.get('_LMFILES_', '').split(':') if f]
+        self._load_env_cache[key] = (self.modulefiles_stamp(mod_files), env_delta)
+
     def available(self, mod_name=None, extra_args=None):
         """
         Return a list of available modules for the given (partial) module name;
         use None to obtain a list of all available modules.
 
+        Available modules are determined by scanning $MODULEPATH if possible (see scan_available),
+        and by running 'module avail' otherwise.
+
+        Results are cached per value of $MODULEPATH, and reused as long as none of the directories (and modulerc files)
+        that were scanned are modified; if 'module avail' had to be run, only changes to the module path entries
+        themselves are noticed, so the cache must be invalidated explicitly (see invalidate_available_cache).
+
         @param mod_name: a (partial) module name for filtering (default: None)
         """
         if extra_args is None:
             extra_args = []
         if mod_name is None:
             mod_name = ''
-        args = ['avail'] + extra_args + [mod_name]
-        mods = self.run_module(*args)
 
-        # sort list of modules in alphabetical order
-        mods.sort(key=lambda m: m['mod_name'])
-        ans = nub([mod['mod_name'] for mod in mods])
+        key = (mod_name, tuple(extra_args), os.environ.get('MODULEPATH', ''))
+        if key in self._available_cache:
+            (stamp_paths, stamp, ans) = self._available_cache[key]
+            if self.modulefiles_stamp(stamp_paths) == stamp:
+                self.log.debug("Using cached result for 'module available %s': %s" % (mod_name, ans))
+                return ans[:]
+
+        # scanning $MODULEPATH is much cheaper than running the modules tool, but it's not always possible
+        stamp_paths = self.global_modulerc_files()
+        scanned_paths = []
+        ans = self.scan_available(mod_name=mod_name, scanned_paths=scanned_paths)
+        if ans is None:
+            stamp_paths.extend(curr_module_paths())
+
+            args = ['avail'] + extra_args + [mod_name]
+            mods = self.run_module(*args)
+
+            # sort list of modules in alphabetical order
+            mods.sort(key=lambda m: m['mod_name'])
+            ans = nub([mod['mod_name'] for mod in mods])
+
+            self.log.debug("'module available %s' gave %d answers: %s" % (mod_name, len(ans), ans))
+        else:
+            stamp_paths.extend(scanned_paths)
+
+        self._available_cache[key] = (stamp_paths, self.modulefiles_stamp(stamp_paths), ans)
+
+        return ans[:]
+
+    def is_modulefile(self, path):
+        """Check whether the specified file is a module file (without running the modules tool)."""
+        for ext in self.MODULEFILE_EXTENSIONS:
+            if ext and path.endswith(ext):
+                return True
+        try:
+            fh = open(path, 'r')
+            magic = fh.read(len(MODULEFILE_MAGIC))
+            fh.close()
+        except IOError, err:
+            self.log.debug("Failed to read %s, so not considering it as a module file: %s" % (path, err))
+            return False
+        return magic == MODULEFILE_MAGIC
+
+    def find_modulefile(self, mod_name, mod_paths=None):
+        """
+        Find module file for specified module in $MODULEPATH, by checking the file system directly
+        (i.e. without running the modules tool); returns None if no module file was found.
+
+        @param mod_name: module name
+        @param mod_paths: list of module paths to consider (default: current $MODULEPATH)
+        """
+        if os.path.basename(mod_name) in NON_MODULE_FILES or mod_name.endswith('~'):
+            return None
+        if mod_paths is None:
+            mod_paths = curr_module_paths()
+        for mod_path in [p for p in mod_paths if p]:
+            for ext in self.MODULEFILE_EXTENSIONS:
+                path = os.path.join(mod_path, mod_name + ext)
+                if os.path.isfile(path) and self.is_modulefile(path):
+                    return path
+        return None
 
-        self.log.debug("'module available %s' gave %d answers: %s" % (mod_name, len(ans), ans))
+    def global_modulerc_files(self):
+        """Return list of global modulerc files that are taken into account by the modules tool."""
+        return [os.environ.get('MODULERC', ''), os.path.join(os.path.expanduser('~'), '.modulerc')]
+
+    def parse_modulerc(self, path, mod_dir):
+        """
+        Parse specified .modulerc/.version file for the module directory with the specified name, without running the
+        modules tool; returns a tuple with a boolean that indicates whether all module commands in the file could be
+        interpreted, and the name of the default module that it defines (or None).
+        """
+        if path.endswith('.lua'):
+            return (False, None)
+
+        try:
+            txt = read_file(path)
+        except EasyBuildError, err:
+            self.log.debug("Failed to read %s: %s" % (path, err))
+            return (False, None)
+
+        default = None
+        for line in txt.split('\n'):
+            if not line.strip() or line.strip().startswith('#'):
+                continue
+            for regex in MODULERC_DEFAULT_REGEXES:
+                res = regex.match(line)
+                if res:
+                    # default version may be specified as '<name>/<version>', '/<version>' or '<version>'
+                    default = res.group('version')
+                    if default.startswith('/') or '/' not in default:
+                        default = '/'.join([mod_dir, default.lstrip('/')])
+                    break
+            else:
+                self.log.debug("Module command in %s can only be interpreted by modules tool: %s" % (path, line))
+                return (False, None)
+
+        return (True, default)
+
+    def scan_available(self, mod_name=None, include_hidden=False, strict=True, scanned_paths=None):
+        """
+        Return a list of available modules for the given (partial) module name, by walking the directories in
+        $MODULEPATH (i.e. without running the modules tool); use None to obtain a list of all available modules.
+        This yields the same result as 'module avail'.
+
+        Returns None if $MODULEPATH contains anything that can only be interpreted by the modules tool itself,
+        i.e. global modulerc files, module commands other than setting the default version in .modulerc/.version
+        files (e.g., aliases), 'default' symlinks, or default versions for which there's no module file.
+
+        @param mod_name: a (partial) module name for filtering (default: None)
+        @param include_hidden: also include hidden modules (i.e. modules for which the name starts with a '.')
+        @param strict: return None for constructs that can only be interpreted by the modules tool itself;
+                       if False, these are ignored instead (i.e. only module files are considered)
+        @param scanned_paths: list to add paths of scanned directories and modulerc files to
+                              (the result only changes if one of these is modified)
+        """
+        if scanned_paths is None:
+            scanned_paths = []
+
+        for modulerc in self.global_modulerc_files():
+            if strict and modulerc and os.path.exists(modulerc):
+                self.log.debug("Not scanning $MODULEPATH for modules, found global modulerc file %s" % modulerc)
+                return None
+
+        mods, defaults = [], []
+        for mod_path in [p for p in curr_module_paths() if p]:
+            for (dirpath, dirnames, filenames) in os.walk(mod_path, followlinks=True):
+                scanned_paths.append(dirpath)
+                # don't consider hidden directories or directories that can not hold module files,
+                # and avoid infinite loops via symlinks that point to a parent directory
+                retained_dirnames = []
+                for dirname in sorted(dirnames):
+                    if dirname.startswith('.') or dirname in NON_MODULE_FILES:
+                        continue
+                    path = os.path.join(dirpath, dirname)
+                    if os.path.islink(path):
+                        target, realdirpath = os.path.realpath(path), os.path.realpath(dirpath)
+                        if realdirpath == target or realdirpath.startswith(target + os.path.sep):
+                            self.log.debug("Not following symlink %s to parent directory %s" % (path, target))
+                            continue
+                    retained_dirnames.append(dirname)
+                dirnames[:] = retained_dirnames
+
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    if filename in MODULERC_FILES and not strict:
+                        continue
+                    if filename in MODULERC_FILES:
+                        scanned_paths.append(path)
+                        (ok, default) = self.parse_modulerc(path, os.path.relpath(dirpath, mod_path))
+                        if not ok:
+                            self.log.debug("Not scanning $MODULEPATH for modules, can't interpret %s" % path)
+                            return None
+                        if default is not None:
+                            defaults.append(default)
+                        continue
+                    if filename == 'default' and os.path.islink(path):
+                        if not strict:
+                            continue
+                        self.log.debug("Not scanning $MODULEPATH for modules, found 'default' symlink %s" % path)
+                        return None
+                    if filename in NON_MODULE_FILES or filename.endswith('~'):
+                        continue
+                    if self.is_modulefile(path):
+                        name = os.path.relpath(path, mod_path)
+                        for ext in self.MODULEFILE_EXTENSIONS:
+                            if ext and name.endswith(ext):
+                                name = name[:-len(ext)]
+                                break
+                        mods.append(name)
+
+        missing_defaults = [default for default in defaults if default not in mods]
+        if missing_defaults:
+            self.log.debug("Not scanning $MODULEPATH for modules, no module files for defaults %s" % missing_defaults)
+            return None
+
+        # only retain module names that would also be recognised in the output of 'module avail'
+        res = []
+        for mod in mods:
+            if os.path.basename(mod).startswith('.') and not include_hidden:
+                continue
+            if mod_name is not None and not mod.startswith(mod_name):
+                continue
+            avail_match = output_matchers['available'].match(mod)
+            if avail_match and avail_match.group('mod_name') == mod:
+                res.append(mod)
+
+        ans = nub(sorted(res))
+        self.log.debug("Scanning $MODULEPATH for modules (%s) yielded %d modules: %s" % (mod_name, len(ans), ans))
         return ans
 
     def exist(self, mod_names):
         """
         Check if modules with specified names exists.
+
+        Modules for which a module file is found in $MODULEPATH are considered to exist without consulting the modules
+        tool; for the remaining modules, the modules tool is run at most twice, regardless of the number of modules:
+        'avail' for visible modules, and a single 'show' for all hidden modules.
         """
-        avail_mod_names = self.available()
-        # differentiate between hidden and visible modules
-        mod_names = [(mod_name, not os.path.basename(mod_name).startswith('.')) for mod_name in mod_names]
+        mods_exist = dict((mod_name, self.find_modulefile(mod_name) is not None) for mod_name in mod_names)
 
-        mods_exist = []
-        for (mod_name, visible) in mod_names:
-            if visible:
-                mods_exist.append(mod_name in avail_mod_names)
+        visible_mod_names, hidden_mod_names = [], []
+        for mod_name in nub([m for m in mod_names if not mods_exist[m]]):
+            # differentiate between hidden and visible modules
+            if os.path.basename(mod_name).startswith('.'):
+                hidden_mod_names.append(mod_name)
             else:
-                # hidden modules are not visible in 'avail', need to use 'show' instead
-                modtype = ('hidden', 'visible (not hidden)')[visible]
-                self.log.debug("checking whether %s module %s exists via 'show'..." % (modtype, mod_name))
-                txt = self.show(mod_name)
-                mods_exist_re = re.compile('^\s*\S*/%s:\s*$' % re.escape(mod_name), re.M)
-                mods_exist.append(bool(mods_exist_re.search(txt)))
+                visible_mod_names.append(mod_name)
+
+        if visible_mod_names:
+            avail_mod_names = self.available()
+            for mod_name in visible_mod_names:
+                mods_exist[mod_name] = mod_name in avail_mod_names
+
+        if hidden_mod_names:
+            # hidden modules are not visible in 'avail', need to use 'show' instead
+            self.log.debug("checking whether hidden modules %s exist via 'show'..." % hidden_mod_names)
+            for mod_name in self.shown_modules(hidden_mod_names):
+                mods_exist[mod_name] = True
+
+        return [mods_exist[mod_name] for mod_name in mod_names]
 
-        return mods_exist
+    def shown_modules(self, mod_names):
+        """
+        Determine which of the specified modules can be found by the modules tool, using a single 'show' command.
+        """
+        txt = self.show(mod_names)
+        # 'show' prints the path to the module file (followed by a colon) for every module it finds
+        mod_names_regex = '|'.join([re.escape(mod_name) for mod_name in mod_names])
+        shown_mod_re = re.compile(r'^\s*\S*/(?P<mod_name>%s):\s*$' % mod_names_regex, re.M)
+        return nub([res.group('mod_name') for res in shown_mod_re.finditer(txt)])
 
     def exists(self, mod_name):
         """NO LONGER SUPPORTED: use exist method instead"""
@@ -400,6 +805,19 @@ class ModulesTool(object):
             full_mod_path = os.path.join(install_path('mod'), build_option('suffix_modules_path'), mod_path)
             self.prepend_module_path(full_mod_path)
 
+        modules = list(modules)
+        if self.BATCH_LOAD and len(modules) > 1:
+            # load all modules with a single module command, which is a lot cheaper than running one command per module;
+            # if that fails, fall back to loading the modules one by one (which also yields a clear error message)
+            env_before_load = os.environ.copy()
+            try:
+                # errors are not logged, since they're dealt with by loading the modules one by one
+                self.run_module(['load'] + modules, log_errors=False)
+                modules = []
+            except EasyBuildError, err:
+                self.log.debug("Loading modules %s in batch failed, loading them one by one: %s" % (modules, err))
+                restore_env(env_before_load)
+
         for mod in modules:
             self.run_module('load', mod)
 
@@ -420,11 +838,15 @@ class ModulesTool(object):
         self.log.debug("List of loaded modules before purge: %s" % os.getenv('_LMFILES_'))
         self.run_module('purge', '')
 
-    def show(self, mod_name):
+    def show(self, mod_names):
         """
-        Run 'module show' for the specified module.
+        Run 'module show' for the specified module(s).
+
+        @param mod_names: name of a module, or list of module names
         """
-        return self.run_module('show', mod_name, return_output=True)
+        if isinstance(mod_names, basestring):
+            mod_names = [mod_names]
+        return self.run_module(['show'] + list(mod_names), return_output=True)
 
     def get_value_from_modulefile(self, mod_name, regex):
         """
@@ -446,6 +868,10 @@ class ModulesTool(object):
 
     def modulefile_path(self, mod_name):
         """Get the path of the module file for the specified module."""
+        modfile = self.find_modulefile(mod_name)
+        if modfile is not None:
+            return modfile
+
         # (possible relative) path is always followed by a ':', and may be prepended by whitespace
         # this works for both environment modules and Lmod
         modpath_re = re.compile('^\s*(?P<modpath>[^/\n]*/[^ ]+):$', re.M)
@@ -458,6 +884,9 @@ class ModulesTool(object):
     def run_module(self, *args, **kwargs):
         """
         Run module command.
+
+        Errors reported by the modules tool are logged and raised as an EasyBuildError;
+        use log_errors=False to only raise them (e.g., for commands that may fail, see load).
         """
         if isinstance(args[0], (list, tuple,)):
             args = args[0]
@@ -478,6 +907,15 @@ class ModulesTool(object):
 
         self.log.debug('Current MODULEPATH: %s' % os.environ.get('MODULEPATH', ''))
 
+        # loading the same modules in the same context again yields the same changes to the environment,
+        # so these can be cached rather than running the module command again
+        load_env_cache_key, env_before_load = None, None
+        if args[0] == 'load' and not kwargs.get('return_output', False):
+            load_env_cache_key = self.load_env_cache_key(args[1:])
+            if self.cached_load(load_env_cache_key):
+                return []
+            env_before_load = os.environ.copy()
+
         # change our LD_LIBRARY_PATH here
         environ = os.environ.copy()
         environ['LD_LIBRARY_PATH'] = LD_LIBRARY_PATH
@@ -485,21 +923,9 @@ class ModulesTool(object):
         new_ld_library_path = environ['LD_LIBRARY_PATH']
         self.log.debug("Adjusted LD_LIBRARY_PATH from '%s' to '%s'" % (cur_ld_library_path, new_ld_library_path))
 
-        # prefix if a particular shell is specified, using shell argument to Popen doesn't work (no output produced (?))
-        cmdlist = [self.cmd, 'python']
-        if self.COMMAND_SHELL is not None:
-            if not isinstance(self.COMMAND_SHELL, (list, tuple)):
-                msg = 'COMMAND_SHELL needs to be list or tuple, now %s (value %s)'
-                self.log.error(msg % (type(self.COMMAND_SHELL), self.COMMAND_SHELL))
-            cmdlist = self.COMMAND_SHELL + cmdlist
-
-        full_cmd = ' '.join(cmdlist + args)
-        self.log.debug("Running module command '%s' from %s" % (full_cmd, os.getcwd()))
-        proc = subprocess.Popen(cmdlist + args, stdout=PIPE, stderr=PIPE, env=environ)
         # stdout will contain python code (to change environment etc)
         # stderr will contain text (just like the normal module command)
-        (stdout, stderr) = proc.communicate()
-        self.log.debug("Output of module command '%s': stdout: %s; stderr: %s" % (full_cmd, stdout, stderr))
+        (stdout, stderr) = self.run_module_cmd(args, environ)
 
         if kwargs.get('return_output', False):
             return stdout + stderr
@@ -537,14 +963,41 @@ class ModulesTool(object):
 
                 error = output_matchers['error'].search(line)
                 if error:
-                    self.log.error(line)
+                    if kwargs.get('log_errors', True):
+                        self.log.error(line)
                     raise EasyBuildError(line)
 
                 modules = output_matchers['available'].finditer(line)
                 for module in modules:
                     result.append(module.groupdict())
+
+            if load_env_cache_key is not None:
+                self.cache_load(load_env_cache_key, env_before_load)
+
             return result
 
+    @counted(RUN_MODULE, skip_callers=['run_module'])
+    def run_module_cmd(self, args, environ):
+        """
+        Run module command with specified arguments in specified environment,
+        and return its output as a tuple (stdout, stderr).
+        """
+        # prefix if a particular shell is specified, using shell argument to Popen doesn't work (no output produced (?))
+        cmdlist = [self.cmd, 'python']
+        if self.COMMAND_SHELL is not None:
+            if not isinstance(self.COMMAND_SHELL, (list, tuple)):
+                msg = 'COMMAND_SHELL needs to be list or tuple, now %s (value %s)'
+                self.log.error(msg % (type(self.COMMAND_SHELL), self.COMMAND_SHELL))
+            cmdlist = self.COMMAND_SHELL + cmdlist
+
+        full_cmd = ' '.join(cmdlist + args)
+        self.log.debug("Running module command '%s' from %s" % (full_cmd, os.getcwd()))
+        proc = subprocess.Popen(cmdlist + args, stdout=PIPE, stderr=PIPE, env=environ)
+        (stdout, stderr) = proc.communicate()
+        self.log.debug("Output of module command '%s': stdout: %s; stderr: %s" % (full_cmd, stdout, stderr))
+
+        return (stdout, stderr)
+
     def list(self):
         """Return result of 'module list'."""
         return self.run_module('list')
@@ -568,29 +1021,174 @@ class ModulesTool(object):
 
         return read_file(modfilepath)
 
+    def direct_dependencies_for(self, mod_name, modfile=None):
+        """
+        Obtain a list of modules that are loaded directly by the module file for the given module.
+        Results are cached (per $MODULEPATH), and are reused for as long as the module file is not changed.
+
+        @param modfile: path to module file for this module (default: determined via modulefile_path)
+        """
+        key = (mod_name, os.environ.get('MODULEPATH', ''))
+        if key in self._direct_deps_cache:
+            (stamp, mods) = self._direct_deps_cache[key]
+            cached_modfile = stamp[0][0]
+            if self.find_modulefile(mod_name) in [None, cached_modfile]:
+                if self.modulefiles_stamp([cached_modfile]) == stamp:
+                    return mods[:]
+
+        if modfile is None:
+            modfile = self.modulefile_path(mod_name)
+        stamp = self.modulefiles_stamp([modfile])
+        mods = MODULE_LOAD_REGEX.findall(read_file(modfile))
+        self._direct_deps_cache[key] = (stamp, mods)
+
+        return mods[:]
+
+    def dependency_closures(self, mod_names, depth=sys.maxint):
+        """
+        Obtain dictionary with list of dependencies for each of the given modules, determined recursively,
+        up to a specified depth (optionally). Module files are read (concurrently) only once,
+        even if they correspond to dependencies that are shared by several modules.
+
+        @param mod_names: list of module names
+        @param depth: recursion depth (default is sys.maxint, which should be equivalent to infinite recursion depth)
+        """
+        # determine direct dependencies for all modules in the dependency graph (up to the specified depth),
+        # level by level so the module files in each level can be read concurrently
+        direct_deps = {}
+        level_mods = nub(mod_names)
+        level = 0
+        while level_mods and level <= depth:
+            direct_deps.update(zip(level_mods, self._direct_dependencies_for_all(level_mods)))
+            level_mods = nub([dep for mod in level_mods for dep in direct_deps[mod] if dep not in direct_deps])
+            level += 1
+
+        # the dependencies of a module don't depend on the (remaining) depth if it's larger than the number of modules
+        # in the dependency graph, since that's an upper bound for the length of the longest path in the graph
+        unlimited = depth >= len(direct_deps)
+        closures = {}
+        # positions in the stack of modules for which dependencies are being determined
+        in_progress = {}
+
+        def closure(mod_name, depth):
+            """
+            Determine list of dependencies for specified module, up to specified depth.
+            Returns a tuple with the list of dependencies, and the lowest position of a module in the stack on which
+            it (cyclically) depends (or None); only lists that don't depend on a module lower in the stack are complete.
+            """
+            key = (mod_name, None) if unlimited else (mod_name, depth)
+            if key in closures:
+                return (closures[key], None)
+            if key in in_progress:
+                # cyclic dependency, dependencies of this module are being determined lower in the stack
+                return ([], in_progress[key])
+
+            pos = len(in_progress)
+            in_progress[key] = pos
+            mods = direct_deps[mod_name][:]
+            low = None
+            if depth > 0:
+                # add dependencies of dependency modules only if they're not there yet
+                seen = set(mods)
+                for dep in direct_deps[mod_name]:
+                    (depdeps, dep_low) = closure(dep, depth - 1)
+                    if dep_low is not None and (low is None or dep_low < low):
+                        low = dep_low
+                    for depdep in depdeps:
+                        if depdep not in seen:
+                            seen.add(depdep)
+                            mods.append(depdep)
+            del in_progress[key]
+
+            # only memoize complete lists of dependencies, so the result doesn't depend on the order of mod_names
+            if low is not None and low >= pos:
+                low = None
+            if low is None:
+                closures[key] = mods
+
+            return (mods, low)
+
+        return dict([(mod_name, closure(mod_name, depth)[0][:]) for mod_name in mod_names])
+
+    def _direct_dependencies_for_all(self, mod_names):
+        """
+        Obtain list of direct dependencies for each of the specified modules, reading module files concurrently.
+        Only module files that are located directly in $MODULEPATH are read concurrently; the modules tool is only run
+        (serially, in the main thread) for modules for which no module file could be located.
+        """
+        res = {}
+        if len(mod_names) > 1:
+            modfiles = dict([(mod_name, self.find_modulefile(mod_name)) for mod_name in mod_names])
+            located = [mod_name for mod_name in mod_names if modfiles[mod_name] is not None]
+            if located:
+                # only import multiprocessing when it's actually needed
+                from multiprocessing.pool import ThreadPool
+                pool = ThreadPool(min(len(located), MAX_MODULEFILE_READERS))
+                read_deps = lambda mod_name: self.direct_dependencies_for(mod_name, modfile=modfiles[mod_name])
+                try:
+                    deps = pool.map(read_deps, located)
+                finally:
+                    pool.close()
+                    pool.join()
+                res.update(zip(located, deps))
+
+        for mod_name in [mod_name for mod_name in mod_names if mod_name not in res]:
+            res[mod_name] = self.direct_dependencies_for(mod_name)
+
+        return [res[mod_name] for mod_name in mod_names]
+
     def dependencies_for(self, mod_name, depth=sys.maxint):
         """
         Obtain a list of dependencies for the given module, determined recursively, up to a specified depth (optionally)
         @param depth: recursion depth (default is sys.maxint, which should be equivalent to infinite recursion depth)
         """
-        modtxt = self.read_module_file(mod_name)
-        loadregex = re.compile(r"^\s*module\s+load\s+(\S+)", re.M)
-        mods = loadregex.findall(modtxt)
+        return self.dependency_closures([mod_name], depth=depth)[mod_name]
 
-        if depth > 0:
-            # recursively determine dependencies for these dependency modules, until depth is non-positive
-            moddeps = [self.dependencies_for(mod, depth=depth - 1) for mod in mods]
-        else:
-            # ignore any deeper dependencies
-            moddeps = []
+    def modpath_extensions_in(self, modtxt):
+        """
+        Determine list of $MODULEPATH extensions in specified module file contents.
+        """
+        return MODULE_USE_REGEX.findall(modtxt)
 
-        # add dependencies of dependency modules only if they're not there yet
-        for moddepdeps in moddeps:
-            for dep in moddepdeps:
-                if not dep in mods:
-                    mods.append(dep)
+    def locate_modulefiles(self, mod_names):
+        """
+        Locate module files for specified modules, and determine the $MODULEPATH extensions they make,
+        by only considering the module files themselves (i.e. without loading any module).
+
+        Modules are considered in order, and the $MODULEPATH extensions made by a module are taken into account
+        when locating the module files for the subsequent modules (just like loading them in order would do).
+
+        Returns a dictionary with a tuple (module path, module file path, list of $MODULEPATH extensions)
+        for each module, or None if this can not be determined for all modules without using the modules tool,
+        i.e. if a module file can not be found or if it extends $MODULEPATH with a non-absolute path.
+        """
+        mod_paths = curr_module_paths()
+        res = {}
+        for mod_name in mod_names:
+            mod_path, modfile = None, None
+            for path in mod_paths:
+                modfile = self.find_modulefile(mod_name, mod_paths=[path])
+                if modfile is not None:
+                    mod_path = path
+                    break
+
+            if modfile is None:
+                self.log.debug("No module file found for %s in %s, so can't determine location" % (mod_name, mod_paths))
+                return None
+
+            exts = self.modpath_extensions_in(read_file(modfile))
+            if [ext for ext in exts if not os.path.isabs(ext)]:
+                self.log.debug("Found non-absolute $MODULEPATH extensions in %s: %s" % (modfile, exts))
+                return None
 
-        return mods
+            self.log.debug("Found module file for %s: %s (in %s, $MODULEPATH extensions: %s)" % (mod_name, modfile,
+                                                                                                  mod_path, exts))
+            res[mod_name] = (mod_path, modfile, exts)
+
+            # 'module use' prepends to $MODULEPATH
+            mod_paths = exts[::-1] + [p for p in mod_paths if p not in exts]
+
+        return res
 
     def modpath_extensions_for(self, mod_names):
         """
@@ -599,14 +1197,18 @@ class ModulesTool(object):
         """
         self.log.debug("Determining $MODULEPATH extensions for modules %s" % mod_names)
 
+        # try to determine $MODULEPATH extensions by only considering module files first, which is a lot cheaper
+        located_modfiles = self.locate_modulefiles(mod_names)
+        if located_modfiles is not None:
+            return dict([(mod_name, located_modfiles[mod_name][2]) for mod_name in mod_names])
+
         # copy environment so we can restore it
         orig_env = os.environ.copy()
 
         modpath_exts = {}
         for mod_name in mod_names:
             modtxt = self.read_module_file(mod_name)
-            useregex = re.compile(r"^\s*module\s+use\s+(\S+)", re.M)
-            exts = useregex.findall(modtxt)
+            exts = self.modpath_extensions_in(modtxt)
 
             self.log.debug("Found $MODULEPATH extensions for %s: %s" % (mod_name, exts))
             modpath_exts.update({mod_name: exts})
@@ -621,7 +1223,8 @@ class ModulesTool(object):
 
         return modpath_exts
 
-    def path_to_top_of_module_tree(self, top_paths, mod_name, full_mod_subdir, deps, modpath_exts=None):
+    def path_to_top_of_module_tree(self, top_paths, mod_name, full_mod_subdir, deps, modpath_exts=None,
+                                   dep_mod_subdirs=None):
         """
         Recursively determine path to the top of the module tree,
         for given module, module subdir and list of $MODULEPATH extensions per dependency module.
@@ -651,6 +1254,7 @@ class ModulesTool(object):
         @param full_mod_subdir: absolute path to module subdirectory for starting point
         @param deps: list of dependency modules for module at starting point
         @param modpath_exts: list of module path extensions for each of the dependency modules
+        @param dep_mod_subdirs: module subdirectory for each of the dependency modules (determined when None)
         """
         # copy environment so we can restore it
         orig_env = os.environ.copy()
@@ -662,8 +1266,17 @@ class ModulesTool(object):
         self.log.debug("Checking for dependency that extends $MODULEPATH with %s" % full_mod_subdir)
 
         if modpath_exts is None:
+            # try to determine the module subdirectories and $MODULEPATH extensions for the dependencies
+            # by only considering their module files, so no modules need to be loaded
+            located_modfiles = self.locate_modulefiles(deps)
+            if located_modfiles is None:
+                modpath_exts = self.modpath_extensions_for(deps)
+            else:
+                modpath_exts = dict([(dep, located_modfiles[dep][2]) for dep in deps])
+                dep_mod_subdirs = dict([(dep, located_modfiles[dep][0]) for dep in deps])
+
             # only retain dependencies that have a non-empty lists of $MODULEPATH extensions
-            modpath_exts = dict([(k, v) for k, v in self.modpath_extensions_for(deps).items() if v])
+            modpath_exts = dict([(k, v) for k, v in modpath_exts.items() if v])
             self.log.debug("Non-empty lists of module path extensions for dependencies: %s" % modpath_exts)
 
         mods_to_top = []
@@ -673,15 +1286,23 @@ class ModulesTool(object):
             # use os.path.samefile when comparing paths to avoid issues with resolved symlinks
             full_modpath_exts = modpath_exts[dep]
             if path_matches(full_mod_subdir, full_modpath_exts):
-                # full path to module subdir of dependency is simply path to module file without (short) module name
-                dep_full_mod_subdir = self.modulefile_path(dep)[:-len(dep)-1]
+                if dep_mod_subdirs is None:
+                    # full path to module subdir of dependency is simply path to module file without (short) module name
+                    # (and without file extension, if any)
+                    dep_modfile = self.modulefile_path(dep)
+                    for ext in [e for e in self.MODULEFILE_EXTENSIONS if e]:
+                        if dep_modfile.endswith(dep + ext):
+                            dep_modfile = dep_modfile[:-len(ext)]
+                    dep_full_mod_subdir = dep_modfile[:-len(dep)-1]
+                else:
+                    dep_full_mod_subdir = dep_mod_subdirs[dep]
                 full_mod_subdirs.append(dep_full_mod_subdir)
 
                 mods_to_top.append(dep)
                 tup = (dep, dep_full_mod_subdir, full_modpath_exts)
                 self.log.debug("Found module to top of module tree: %s (subdir: %s, modpath extensions %s)" % tup)
 
-            if full_modpath_exts:
+            if full_modpath_exts and dep_mod_subdirs is None:
                 # load module for this dependency, since it may extend $MODULEPATH to make dependencies available
                 # this is required to obtain the corresponding module file paths (via 'module show')
                 self.load([dep])
@@ -697,7 +1318,8 @@ class ModulesTool(object):
             self.log.debug("Path to top from %s extended to %s, so recursing to find way to the top" % (mod_name, mods_to_top))
             for mod_name, full_mod_subdir in zip(mods_to_top, full_mod_subdirs):
                 path.extend(self.path_to_top_of_module_tree(top_paths, mod_name, full_mod_subdir, None,
-                                                            modpath_exts=remaining_modpath_exts))
+                                                            modpath_exts=remaining_modpath_exts,
+                                                            dep_mod_subdirs=dep_mod_subdirs))
         else:
             self.log.debug("Path not extended, we must have reached the top of the module tree")
 
@@ -708,6 +1330,31 @@ class ModulesTool(object):
         """Update after new modules were added."""
         raise NotImplementedError
 
+    def request_update(self):
+        """
+        Request update after new modules were added.
+        The update is performed right away, unless updates are being deferred (see defer_updates).
+        """
+        if self._defer_updates:
+            self.log.debug("Deferring update after new modules were added")
+            self._update_pending = True
+        else:
+            self.update()
+
+    def defer_updates(self):
+        """Defer updates after new modules were added until flush_updates is called, so only a single update is done."""
+        self._defer_updates = True
+
+    def flush_updates(self):
+        """Stop deferring updates, and perform pending update (if any); returns result of update (or None)."""
+        self._defer_updates = False
+        res = None
+        if self._update_pending:
+            self._update_pending = False
+            self.log.debug("Performing deferred update after new modules were added")
+            res = self.update()
+        return res
+
 
 class EnvironmentModulesC(ModulesTool):
     """Interface to (C) environment modules (modulecmd)."""
@@ -795,6 +1442,7 @@ class Lmod(ModulesTool):
     REQ_VERSION = '5.6.3'
     VERSION_REGEXP = r"^Modules\s+based\s+on\s+Lua:\s+Version\s+(?P<version>\d\S*)\s"
     USER_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.lmod.d', '.cache')
+    MODULEFILE_EXTENSIONS = ['.lua', '']
 
     def __init__(self, *args, **kwargs):
         """Constructor, set lmod-specific class variable values."""
@@ -834,6 +1482,34 @@ class Lmod(ModulesTool):
 
         return correct_real_mods
 
+    def scan_available(self, mod_name=None, include_hidden=None, strict=True, scanned_paths=None):
+        """
+        Return a list of available modules for the given (partial) module name, by walking the directories in
+        $MODULEPATH (i.e. without running Lmod); use None to obtain a list of all available modules.
+
+        @param mod_name: a (partial) module name for filtering (default: None)
+        @param include_hidden: also include hidden modules (default: only for Lmod versions that show them in 'avail')
+        @param strict: return None for constructs that can only be interpreted by Lmod itself (see ModulesTool)
+        @param scanned_paths: list to add paths of scanned directories and modulerc files to (see ModulesTool)
+        """
+        if include_hidden is None:
+            include_hidden = StrictVersion(self.version) >= StrictVersion('5.7.5')
+        return super(Lmod, self).scan_available(mod_name=mod_name, include_hidden=include_hidden, strict=strict,
+                                                scanned_paths=scanned_paths)
+
+    def global_modulerc_files(self):
+        """Return list of global modulerc files that are taken into account by Lmod."""
+        modulerc_files = super(Lmod, self).global_modulerc_files()
+        modulerc_files.extend([
+            os.environ.get('LMOD_MODULERCFILE', ''),
+            os.path.join(os.path.expanduser('~'), '.modulerc.lua'),
+        ])
+        return modulerc_files
+
+    def spider_cache_path(self):
+        """Return path to (user) Lmod spider cache file."""
+        return os.path.join(self.USER_CACHE_DIR, 'moduleT.lua')
+
     def update(self):
         """Update after new modules were added."""
         if build_option('update_modules_tool_cache'):
@@ -852,7 +1528,7 @@ class Lmod(ModulesTool):
                 return stdout
             else:
                 try:
-                    cache_fp = os.path.join(self.USER_CACHE_DIR, 'moduleT.lua')
+                    cache_fp = self.spider_cache_path()
                     self.log.debug("Updating Lmod spider cache %s with output from '%s'" % (cache_fp, ' '.join(cmd)))
                     cache_dir = os.path.dirname(cache_fp)
                     if not os.path.exists(cache_dir):
@@ -869,6 +1545,233 @@ class Lmod(ModulesTool):
         self.set_mod_paths()
 
 
+class VirtualModules(ModulesTool):
+    """
+    In-process modules tool, intended for (performance) testing: module commands are emulated in Python,
+    so no actual modules tool needs to be installed, and an artificial latency can be added to every module command
+    (in seconds, via $VIRTUAL_MODULES_LATENCY), to simulate a slow modules tool.
+
+    The module tree consists of the (Tcl or Lua) module files in $MODULEPATH, e.g. module files generated by EasyBuild
+    or (trivial) module files created in a temporary directory via add_module. Only the basic module file statements
+    are supported: setting variables, (un)setting environment variables, changing paths, (un)loading modules
+    and changing $MODULEPATH.
+    """
+    COMMAND = 'VirtualModules'
+    # environment variable to specify latency for every module command (in seconds)
+    LATENCY_ENVIRONMENT = 'VIRTUAL_MODULES_LATENCY'
+    TERSE_OPTION = (1, '--terse')
+    VERSION_REGEXP = r'^VirtualModules\s+(?P<version>\d\S*)\s*$'
+    MODULEFILE_EXTENSIONS = ['.lua', '']
+
+    def __init__(self, *args, **kwargs):
+        """Constructor, determine latency for module commands."""
+        self.latency = float(os.environ.get(self.LATENCY_ENVIRONMENT, 0))
+        super(VirtualModules, self).__init__(*args, **kwargs)
+        self.log.debug("Using latency of %s seconds for every module command" % self.latency)
+
+    def check_cmd_avail(self):
+        """No actual command is required."""
+        pass
+
+    def check_module_function(self, *args, **kwargs):
+        """The 'module' function is not used."""
+        pass
+
+    def update(self):
+        """Update after new modules were added."""
+        pass
+
+    def add_module(self, mod_name, mod_path=None, txt=None):
+        """
+        Add (trivial) module file for specified module, in specified module path (default: first entry of $MODULEPATH).
+
+        @param txt: module file contents (default: module file that doesn't change anything)
+        """
+        if mod_path is None:
+            mod_path = curr_module_paths()[0]
+        if txt is None:
+            txt = MODULEFILE_MAGIC + '\n'
+        write_file(os.path.join(mod_path, mod_name), txt)
+        # adding a module file in an existing directory doesn't change the stamp for the list of available modules
+        self.invalidate_available_cache()
+
+    def modulefile_statements(self, txt):
+        """
+        Return list of supported statements in specified module file contents,
+        as tuples with a statement ('setenv', 'prepend-path', 'append-path', 'load', 'unload', 'use', 'unuse')
+        and its arguments.
+        """
+        variables = {}
+        statements = []
+        for line in txt.split('\n'):
+            line = line.strip()
+            res = VIRTUAL_MODULES_TCL_REGEX.match(line)
+            if res:
+                args = [self._tcl_value(arg, variables) for arg in res.group('args').split(None, 1)]
+                cmd = res.group('cmd')
+                if cmd == 'set' and len(args) == 2:
+                    variables[args[0]] = args[1]
+                elif cmd == 'module':
+                    statements.append(tuple(args[0:1] + ' '.join(args[1:]).split()))
+                elif cmd == 'unsetenv' or len(args) == 2:
+                    statements.append(tuple([cmd] + args))
+                continue
+
+            res = VIRTUAL_MODULES_LUA_REGEX.match(line)
+            if res and res.group('var'):
+                variables[res.group('var')] = self._lua_value(res.group('value'), variables)
+            elif res:
+                args = [self._lua_value(arg, variables) for arg in res.group('args').split(',', 1)]
+                cmd = res.group('cmd').replace('_', '-')
+                if cmd == 'prepend-path' and args[0] == 'MODULEPATH':
+                    statements.append(('use', args[1]))
+                else:
+                    statements.append(tuple([cmd] + args))
+
+        return statements
+
+    def _tcl_value(self, value, variables):
+        """Evaluate value in Tcl module file (only quoting and substitution of (environment) variables)."""
+        value = value.strip()
+        if len(value) > 1 and value[0] + value[-1] in ['""', '{}']:
+            value = value[1:-1]
+        value = re.sub(r'\$env\((\w+)\)', lambda m: os.environ.get(m.group(1), ''), value)
+        return re.sub(r'\$\{?(\w+)\}?', lambda m: variables.get(m.group(1), ''), value)
+
+    def _lua_value(self, value, variables):
+        """Evaluate value in Lua module file (only string literals, variables, pathJoin and os.getenv)."""
+        value = value.strip()
+        res = re.match(r'^(pathJoin|os\.getenv)\((.*)\)$', value)
+        if res:
+            args = [self._lua_value(arg, variables) for arg in res.group(2).split(',')]
+            if res.group(1) == 'pathJoin':
+                return os.path.join(*args)
+            else:
+                return os.environ.get(args[0], '')
+        elif len(value) > 1 and value[0] + value[-1] in ['""', "''"]:
+            return value[1:-1]
+        elif value.startswith('[[') and value.endswith(']]'):
+            return value[2:-2]
+        else:
+            return variables.get(value, '')
+
+    def _locate(self, mod_name, env):
+        """
+        Locate module file for specified module (or default version of it) in $MODULEPATH of specified environment.
+        """
+        mod_paths = env.get('MODULEPATH', '').split(':')
+        modfile = self.find_modulefile(mod_name, mod_paths=mod_paths)
+        if modfile is None:
+            # pick last version in alphabetical order as default version, if only the software name is specified
+            for mod_path in [p for p in mod_paths if p and os.path.isdir(os.path.join(p, mod_name))]:
+                versions = [os.path.join(mod_name, v) for v in sorted(os.listdir(os.path.join(mod_path, mod_name)))]
+                versions = [v for v in versions if self.find_modulefile(v, mod_paths=[mod_path])]
+                if versions:
+                    mod_name = versions[-1]
+                    modfile = self.find_modulefile(mod_name, mod_paths=[mod_path])
+                    break
+        return (mod_name, modfile)
+
+    def _change_path(self, env, var, path, prepend=True, remove=False):
+        """Prepend/append specified path to path-like environment variable, or remove it."""
+        paths = [p for p in env.get(var, '').split(':') if p and p != path]
+        if not remove:
+            if prepend:
+                paths.insert(0, path)
+            else:
+                paths.append(path)
+        if paths:
+            env[var] = ':'.join(paths)
+        else:
+            env.pop(var, None)
+
+    def _load(self, mod_name, env, unload=False):
+        """(Un)load specified module by applying (or reverting) the statements in its module file to environment."""
+        (mod_name, modfile) = self._locate(mod_name, env)
+        if modfile is None:
+            return "%s:ERROR:105: Unable to locate a modulefile for '%s'" % (self.COMMAND, mod_name)
+
+        loaded = [m for m in env.get('LOADEDMODULES', '').split(':') if m]
+        if (mod_name in loaded) != unload:
+            return None
+
+        errors = []
+        for statement in self.modulefile_statements(read_file(modfile)):
+            (cmd, args) = (statement[0], statement[1:])
+            if cmd == 'setenv':
+                if unload:
+                    env.pop(args[0], None)
+                else:
+                    env[args[0]] = args[1]
+            elif cmd == 'unsetenv' and not unload:
+                env.pop(args[0], None)
+            elif cmd in ['prepend-path', 'append-path']:
+                self._change_path(env, args[0], args[1], prepend=cmd == 'prepend-path', remove=unload)
+            elif cmd in ['use', 'unuse']:
+                for path in args:
+                    self._change_path(env, 'MODULEPATH', path, remove=unload or cmd == 'unuse')
+            elif cmd == 'load' and not unload:
+                errors.extend([self._load(dep, env) for dep in args])
+
+        if unload:
+            self._change_path(env, 'LOADEDMODULES', mod_name, remove=True)
+            self._change_path(env, '_LMFILES_', modfile, remove=True)
+        else:
+            self._change_path(env, 'LOADEDMODULES', mod_name, prepend=False)
+            self._change_path(env, '_LMFILES_', modfile, prepend=False)
+
+        return '\n'.join([e for e in errors if e]) or None
+
+    @counted(RUN_MODULE, skip_callers=['run_module'])
+    def run_module_cmd(self, args, environ):
+        """
+        Emulate module command with specified arguments in specified environment,
+        and return its output as a tuple (stdout, stderr), just like 'modulecmd python' would.
+        """
+        self.log.debug("Emulating module command '%s' (latency: %ss)" % (' '.join(args), self.latency))
+        if self.latency:
+            time.sleep(self.latency)
+
+        args = [arg for arg in args if arg and arg != self.TERSE_OPTION[1]]
+        subcmd, args = args[0], args[1:]
+
+        env = environ.copy()
+        out = []
+        if subcmd == self.VERSION_OPTION:
+            out.append("%s %s" % (self.COMMAND, VERSION))
+        elif subcmd in ['avail', 'available']:
+            # only module files are taken into account, .modulerc files are not supported
+            out.extend(self.scan_available(mod_name=(args or [None])[0], strict=False))
+        elif subcmd == 'list':
+            out.extend([m for m in env.get('LOADEDMODULES', '').split(':') if m])
+        elif subcmd == 'show':
+            for mod_name in args:
+                (mod_name, modfile) = self._locate(mod_name, env)
+                if modfile is None:
+                    out.append("%s:ERROR:105: Unable to locate a modulefile for '%s'" % (self.COMMAND, mod_name))
+                else:
+                    out.extend(['-' * 67, '%s:' % modfile, '', read_file(modfile), '-' * 67])
+        elif subcmd in ['load', 'unload']:
+            out.extend([self._load(mod_name, env, unload=subcmd == 'unload') for mod_name in args])
+        elif subcmd == 'purge':
+            for mod_name in [m for m in env.get('LOADEDMODULES', '').split(':') if m][::-1]:
+                out.append(self._load(mod_name, env, unload=True))
+        elif subcmd in ['use', 'unuse']:
+            for path in args:
+                self._change_path(env, 'MODULEPATH', path, remove=subcmd == 'unuse')
+        else:
+            out.append("%s:ERROR:104: '%s' is an unrecognized subcommand" % (self.COMMAND, subcmd))
+
+        stdout = []
+        for var in sorted(set(environ.keys() + env.keys())):
+            if var not in env:
+                stdout.append("os.environ.pop(%r, None)" % var)
+            elif environ.get(var) != env[var]:
+                stdout.append("os.environ[%r] = %r" % (var, env[var]))
+
+        return ('\n'.join(stdout), '\n'.join([x for x in out if x is not None]))
+
+
 def get_software_root_env_var_name(name):
     """Return name of environment variable for software root."""
     newname = convert_name(name, upper=True)
@@ -978,7 +1881,8 @@ def avail_modules_tools():
 
 def modules_tool(mod_paths=None, testing=False):
     """
-    Return interface to modules tool (environment modules (C, Tcl), or Lmod)
+    Return interface to modules tool (environment modules (C, Tcl), or Lmod);
+    this is a singleton that is shared during the session, see invalidate_modules_tool.
     """
     # get_modules_tool might return none (e.g. if config was not initialized yet)
     modules_tool = get_modules_tool()
@@ -989,6 +1893,22 @@ def modules_tool(mod_paths=None, testing=False):
         return None
 
 
+def invalidate_modules_tool(invalidate_probes=False):
+    """
+    Discard the modules tool instance(s) shared during the session, so a new instance is created by modules_tool,
+    e.g. after the environment was changed in a way that affects the modules tool.
+
+    @param invalidate_probes: also discard cached results of probing the modules tool(s) (e.g. the version)
+    """
+    for modules_tool_class in avail_modules_tools().values():
+        inst = Singleton._instances.pop(modules_tool_class, None)
+        if inst is not None and invalidate_probes:
+            inst.invalidate_probe_cache()
+
+    if invalidate_probes:
+        _probe_cache.clear()
+
+
 class Modules(EnvironmentModulesC):
     """NO LONGER SUPPORTED: interface to modules tool, use modules_tool from easybuild.tools.modules instead"""
     def __init__(self, *args, **kwargs):
@@ -40,27 +40,26 @@ import sys
 from distutils.version import LooseVersion
 from vsc.utils.missing import nub
 
-from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig import EASYCONFIGS_PKG_SUBDIR
 from easybuild.framework.easyconfig.constants import constant_documentation
 from easybuild.framework.easyconfig.format.pyheaderconfigobj import build_easyconfig_constants_dict
 from easybuild.framework.easyconfig.licenses import license_documentation
 from easybuild.framework.easyconfig.templates import template_documentation
 from easybuild.framework.easyconfig.tools import get_paths_for
-from easybuild.framework.extension import Extension
 from easybuild.tools import build_log, config, run  # @UnusedImport make sure config is always initialized!
-from easybuild.tools.config import DEFAULT_LOGFILE_FORMAT, DEFAULT_MNS, DEFAULT_MODULES_TOOL, DEFAULT_MODULECLASSES
+from easybuild.tools.config import DEFAULT_LOGFILE_FORMAT, DEFAULT_MNS, DEFAULT_MODULE_SYNTAX, DEFAULT_MODULES_TOOL
+from easybuild.tools.config import DEFAULT_MODULECLASSES
 from easybuild.tools.config import DEFAULT_PATH_SUBDIRS, DEFAULT_PREFIX, DEFAULT_REPOSITORY
 from easybuild.tools.config import get_pretend_installpath
 from easybuild.tools.config import mk_full_default_path
 from easybuild.tools.docs import FORMAT_RST, FORMAT_TXT, avail_easyconfig_params
-from easybuild.tools.github import HAVE_GITHUB_API, HAVE_KEYRING, fetch_github_token
 from easybuild.tools.modules import avail_modules_tools
+from easybuild.tools.module_generator import avail_module_generators
 from easybuild.tools.module_naming_scheme import GENERAL_CLASS
 from easybuild.tools.module_naming_scheme.utilities import avail_module_naming_schemes
 from easybuild.tools.ordereddict import OrderedDict
-from easybuild.tools.toolchain.utilities import search_toolchain
-from easybuild.tools.repository.repository import avail_repositories
+from easybuild.tools.registry import easyblocks_registry
+from easybuild.tools.toolchain.utilities import search_toolchain, toolchains_registry
 from easybuild.tools.version import this_is_easybuild
 from vsc.utils import fancylogger
 from vsc.utils.generaloption import GeneralOption
@@ -73,6 +72,12 @@ XDG_CONFIG_DIRS = os.environ.get('XDG_CONFIG_DIRS', '/etc').split(os.pathsep)
 DEFAULT_SYS_CFGFILES = [f for d in XDG_CONFIG_DIRS for f in sorted(glob.glob(os.path.join(d, 'easybuild.d', '*.cfg')))]
 DEFAULT_USER_CFGFILE = os.path.join(XDG_CONFIG_HOME, 'easybuild', 'config.cfg')
 
+# names of installation steps (see EasyBlock.get_steps) and of known repository types (see avail_repositories),
+# hardcoded since importing the modules that define them is too expensive just to set up the options
+STEP_NAMES = ['fetch', 'ready', 'source', 'patch', 'prepare', 'configure', 'build', 'test', 'install', 'extensions',
+              'package', 'postproc', 'sanitycheck', 'cleanup', 'module', 'testcases']
+REPOSITORY_TYPES = ['FileRepository', 'GitRepository', 'SvnRepository']
+
 
 class EasyBuildOptions(GeneralOption):
     """Easybuild generaloption class"""
@@ -85,28 +90,41 @@ class EasyBuildOptions(GeneralOption):
 
     def __init__(self, *args, **kwargs):
         """Constructor."""
+        # default robot paths and constants for config files are only determined once, when they are first needed
+        # (see det_cfgfile_constants)
+        self.default_robot_paths = None
+        self.go_cfg_constants = None
 
-        self.default_robot_paths = get_paths_for(subdir=EASYCONFIGS_PKG_SUBDIR, robot_path=None) or []
+        super(EasyBuildOptions, self).__init__(*args, **kwargs)
 
-        # set up constants to seed into config files parser, by section
-        self.go_cfg_constants = {
-            self.DEFAULTSECT: {
-                'DEFAULT_ROBOT_PATHS': (os.pathsep.join(self.default_robot_paths),
-                                        "List of default robot paths ('%s'-separated)" % os.pathsep),
+    def det_cfgfile_constants(self):
+        """Determine default robot paths and constants that can be used in config files (only once)."""
+        if self.go_cfg_constants is None:
+            self.default_robot_paths = get_paths_for(subdir=EASYCONFIGS_PKG_SUBDIR, robot_path=None) or []
+
+            # set up constants to seed into config files parser, by section
+            self.go_cfg_constants = {
+                self.DEFAULTSECT: {
+                    'DEFAULT_ROBOT_PATHS': (os.pathsep.join(self.default_robot_paths),
+                                            "List of default robot paths ('%s'-separated)" % os.pathsep),
+                }
             }
-        }
 
-        # update or define go_configfiles_initenv in named arguments to pass to parent constructor
-        go_cfg_initenv = kwargs.setdefault('go_configfiles_initenv', {})
-        for section, constants in self.go_cfg_constants.items():
+        return self.go_cfg_constants
+
+    def configfile_parser_init(self, initenv=None):
+        """Initialise the config files parser, and seed it with constants that can be used in config files."""
+        if initenv is None:
+            initenv = {}
+        for section, constants in self.det_cfgfile_constants().items():
             constants = dict([(name, value) for (name, (value, _)) in constants.items()])
-            go_cfg_initenv.setdefault(section, {}).update(constants)
+            initenv.setdefault(section, {}).update(constants)
 
-        super(EasyBuildOptions, self).__init__(*args, **kwargs)
+        super(EasyBuildOptions, self).configfile_parser_init(initenv=initenv)
 
     def basic_options(self):
         """basic runtime options"""
-        all_stops = [x[0] for x in EasyBlock.get_steps()]
+        self.det_cfgfile_constants()
         strictness_options = [run.IGNORE, run.WARN, run.ERROR]
 
         descr = ("Basic options", "Basic runtime options for EasyBuild.")
@@ -114,18 +132,37 @@ class EasyBuildOptions(GeneralOption):
         opts = OrderedDict({
             'dry-run': ("Print build overview incl. dependencies (full paths)", None, 'store_true', False),
             'dry-run-short': ("Print build overview incl. dependencies (short paths)", None, 'store_true', False, 'D'),
+            'events-file': ("Write events on the progress of the session to specified file, in JSON Lines format",
+                            None, 'store', None, {'metavar': 'PATH'}),
             'force': ("Force to rebuild software even if it's already installed (i.e. if it can be found as module)",
                       None, 'store_true', False, 'f'),
             'job': ("Submit the build as a job", None, 'store_true', False),
             'logtostdout': ("Redirect main log to stdout", None, 'store_true', False, 'l'),
+            'metrics-file': ("Write metrics on the progress of the session to specified file, "
+                             "in Prometheus text format", None, 'store', None, {'metavar': 'PATH'}),
+            'metrics-http': ("Serve metrics on the progress of the session via HTTP on specified port, in OpenMetrics "
+                             "text format", None, 'store', None, {'metavar': '[HOST:]PORT'}),
             'only-blocks': ("Only build listed blocks", None, 'extend', None, 'b', {'metavar': 'BLOCKS'}),
+            'profile': ("Profile EasyBuild itself (per phase), and dump profiling results in specified directory",
+                        None, 'store_or_None', 'easybuild-profile', {'metavar': 'DIR'}),
+            'profile-memory': ("Profile memory usage of EasyBuild itself (per phase), and dump memory profile in "
+                               "specified directory", None, 'store_or_None', 'easybuild-memory-profile',
+                               {'metavar': 'DIR'}),
+            'profile-memory-steps': ("Also profile memory usage per build step (see --profile-memory)",
+                                     None, 'store_true', False),
+            'profile-sampling': ("Profile by sampling the call stack with specified interval (in seconds) "
+                                 "rather than by tracing all function calls (lower overhead, requires --profile)",
+                                 float, 'store_or_None', 0.01, {'metavar': 'INTERVAL'}),
             'robot': ("Enable dependency resolution, using easyconfigs in specified paths",
                       'pathlist', 'store_or_None', [], 'r', {'metavar': 'PATH[%sPATH]' % os.pathsep}),
             'robot-paths': ("Additional paths to consider by robot for easyconfigs (--robot paths get priority)",
                             'pathlist', 'store', self.default_robot_paths, {'metavar': 'PATH[%sPATH]' % os.pathsep}),
+            'sample-resources': ("Sample resource usage of installations with specified interval (in seconds), "
+                                 "incl. CPU utilisation, memory and disk usage",
+                                 float, 'store_or_None', 10, {'metavar': 'INTERVAL'}),
             'skip': ("Skip existing software (useful for installing additional packages)",
                      None, 'store_true', False, 'k'),
-            'stop': ("Stop the installation after certain step", 'choice', 'store_or_None', 'source', 's', all_stops),
+            'stop': ("Stop the installation after certain step", 'choice', 'store_or_None', 'source', 's', STEP_NAMES),
             'strict': ("Set strictness level", 'choice', 'store', run.WARN, strictness_options),
         })
 
@@ -225,6 +262,8 @@ class EasyBuildOptions(GeneralOption):
             'avail-repositories': ("Show all repository types (incl. non-usable)",
                                    None, "store_true", False,),
             'buildpath': ("Temporary build path", None, 'store', mk_full_default_path('buildpath')),
+            'cachedir': ("Directory to store persistent cache files in (no persistent caching if not specified)",
+                         None, 'store', None),
             'ignore-dirs': ("Directory names to ignore when searching for files/dirs",
                             'strlist', 'store', ['.git', '.svn']),
             'installpath': ("Install path for software and modules",
@@ -241,13 +280,17 @@ class EasyBuildOptions(GeneralOption):
                                None, 'store_or_None', None, {'metavar': "PATH"}),
             'modules-tool': ("Modules tool to use",
                              'choice', 'store', DEFAULT_MODULES_TOOL, sorted(avail_modules_tools().keys())),
+            'module-syntax': ("Syntax to use for generated module files (Lua syntax requires Lmod as modules tool)",
+                              'choice', 'store', DEFAULT_MODULE_SYNTAX, sorted(avail_module_generators().keys())),
             'prefix': (("Change prefix for buildpath, installpath, sourcepath and repositorypath "
                         "(used prefix for defaults %s)" % DEFAULT_PREFIX),
                        None, 'store', None),
             'recursive-module-unload': ("Enable generating of modules that unload recursively.",
                                         None, 'store_true', False),
-            'repository': ("Repository type, using repositorypath",
-                           'choice', 'store', DEFAULT_REPOSITORY, sorted(avail_repositories().keys())),
+            'regenerate-registries': ("Regenerate registries of available toolchains and easyblocks "
+                                      "(see --cachedir)", None, 'store_true', False),
+            'repository': ("Repository type, using repositorypath (see --avail-repositories)",
+                           'choice', 'store', DEFAULT_REPOSITORY, REPOSITORY_TYPES),
             'repositorypath': (("Repository path, used by repository "
                                 "(is passed as list of arguments to create the repository instance). "
                                 "For more info, use --avail-repositories."),
@@ -291,6 +334,8 @@ class EasyBuildOptions(GeneralOption):
                                            None, 'store_true', False),
             'dep-graph': ("Create dependency graph",
                           None, "store", None, {'metavar': 'depgraph.<ext>'}),
+            'import-times': ("Print report of time spent on importing Python modules (to stderr, at exit)",
+                             None, 'store_true', False),
             'list-easyblocks': ("Show list of available easyblocks",
                                 'choice', 'store_or_None', 'simple', ['simple', 'detailed']),
             'list-toolchains': ("Show list of known toolchains",
@@ -370,6 +415,20 @@ class EasyBuildOptions(GeneralOption):
                 self.log.warning("--umask value should be 3 digits (0-7) (regex pattern '%s')" % umask_regex.pattern)
                 error_cnt += 1
 
+        if self.options.profile_sampling is not None and self.options.profile is None:
+            self.log.warning("--profile-sampling requires that profiling is enabled via --profile")
+            error_cnt += 1
+
+        # only import the repository modules to check whether the selected repository type is usable when needed,
+        # to keep startup fast
+        if self.options.repository != DEFAULT_REPOSITORY:
+            from easybuild.tools.repository.repository import avail_repositories
+            usable_repos = sorted(avail_repositories().keys())
+            if self.options.repository not in usable_repos:
+                tup = (', '.join(usable_repos), self.options.repository)
+                self.log.warning("--repository value should be one of usable repository types %s (given %s)" % tup)
+                error_cnt += 1
+
         if error_cnt > 0:
             self.log.error("Found %s problems validating the options, treating warnings above as fatal." % error_cnt)
 
@@ -390,6 +449,11 @@ class EasyBuildOptions(GeneralOption):
         if self.options.unittest_file:
             fancylogger.logToFile(self.options.unittest_file)
 
+        # regenerate registries of available toolchains/easyblocks, if requested
+        if self.options.regenerate_registries:
+            toolchains_registry(cachedir=self.options.cachedir, regenerate=True)
+            easyblocks_registry(cachedir=self.options.cachedir, regenerate=True)
+
         # prepare for --list/--avail
         if any([self.options.avail_easyconfig_params, self.options.avail_easyconfig_templates,
                 self.options.list_easyblocks, self.options.list_toolchains, self.options.avail_cfgfile_constants,
@@ -402,6 +466,8 @@ class EasyBuildOptions(GeneralOption):
 
         # fail early if required dependencies for functionality requiring using GitHub API are not available:
         if self.options.from_pr or self.options.upload_test_report:
+            # only import GitHub support when needed, to keep startup fast
+            from easybuild.tools.github import HAVE_GITHUB_API, HAVE_KEYRING, fetch_github_token
             if not HAVE_GITHUB_API:
                 self.log.error("Required support for using GitHub API is not available (see warnings).")
 
@@ -504,12 +570,13 @@ class EasyBuildOptions(GeneralOption):
             "Constants available (only) in configuration files:",
             "syntax: %(CONSTANT_NAME)s",
         ]
-        for section in self.go_cfg_constants:
+        cfg_constants = self.det_cfgfile_constants()
+        for section in cfg_constants:
             lines.append('')
             if section != self.DEFAULTSECT:
                 section_title = "only in '%s' section:" % section
                 lines.append(section_title)
-            for cst_name, (cst_value, cst_help) in sorted(self.go_cfg_constants[section].items()):
+            for cst_name, (cst_value, cst_help) in sorted(cfg_constants[section].items()):
                 lines.append("* %s: %s [value: %s]" % (cst_name, cst_help, cst_value))
         return '\n'.join(lines)
 
@@ -529,45 +596,14 @@ class EasyBuildOptions(GeneralOption):
     def avail_easyblocks(self):
         """Get a class tree for easyblocks."""
         detailed = self.options.list_easyblocks == "detailed"
-        module_regexp = re.compile(r"^([^_].*)\.py$")
-
-        # finish initialisation of the toolchain module (ie set the TC_CONSTANT constants)
-        search_toolchain('')
-
-        for package in ["easybuild.easyblocks", "easybuild.easyblocks.generic"]:
-            __import__(package)
-
-            # determine paths for this package
-            paths = sys.modules[package].__path__
-
-            # import all modules in these paths
-            for path in paths:
-                if os.path.exists(path):
-                    for f in os.listdir(path):
-                        res = module_regexp.match(f)
-                        if res:
-                            __import__("%s.%s" % (package, res.group(1)))
-
-        def add_class(classes, cls):
-            """Add a new class, and all of its subclasses."""
-            children = cls.__subclasses__()
-            classes.update({cls.__name__: {
-                'module': cls.__module__,
-                'children': [x.__name__ for x in children]
-            }})
-            for child in children:
-                add_class(classes, child)
-
-        roots = [EasyBlock, Extension]
-
-        classes = {}
-        for root in roots:
-            add_class(classes, root)
+
+        classes = easyblocks_registry(cachedir=self.options.cachedir)
+
+        roots = ['EasyBlock', 'Extension']
 
         # Print the tree, start with the roots
         txt = []
         for root in roots:
-            root = root.__name__
             if detailed:
                 txt.append("%s (%s)" % (root, classes[root]['module']))
             else:
@@ -580,7 +616,7 @@ class EasyBuildOptions(GeneralOption):
 
     def avail_toolchains(self):
         """Show list of known toolchains."""
-        _, all_tcs = search_toolchain('')
+        _, all_tcs = search_toolchain('', cachedir=self.options.cachedir)
         all_tcs_names = [x.NAME for x in all_tcs]
         tclist = sorted(zip(all_tcs_names, all_tcs))
 
@@ -595,6 +631,8 @@ class EasyBuildOptions(GeneralOption):
 
     def avail_repositories(self):
         """Show list of known repository types."""
+        from easybuild.tools.repository.repository import avail_repositories
+
         repopath_defaults = mk_full_default_path('repositorypath')
         all_repos = avail_repositories(check_useable=False)
         usable_repos = avail_repositories(check_useable=True).keys()
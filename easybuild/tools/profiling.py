@@ -0,0 +1,433 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for profiling EasyBuild itself (see --profile), per phase of an EasyBuild session
+(e.g., parsing easyconfig files, resolving dependencies, steps of each installation).
+
+Either deterministic profiling (using cProfile) or statistical profiling (by periodically sampling the call stack,
+which has a lot less overhead for long-running sessions) is supported.
+
+The memory usage can be profiled too (see --profile-memory), by taking a snapshot at the end of each phase.
+"""
+import atexit
+import cProfile
+import gc
+import os
+import pstats
+import re
+import resource
+import signal
+import sys
+from cStringIO import StringIO
+from vsc.utils import fancylogger
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import mkdir, write_file
+from easybuild.tools.ordereddict import OrderedDict
+
+try:
+    # only available in Python 3.4+, or with pytracemalloc
+    import tracemalloc
+    HAVE_TRACEMALLOC = True
+except ImportError:
+    HAVE_TRACEMALLOC = False
+
+
+PROFILE_OPTION = '--profile'
+PROFILE_ENV_VAR = 'EASYBUILD_PROFILE'
+PROFILE_SAMPLING_OPTION = '--profile-sampling'
+PROFILE_SAMPLING_ENV_VAR = 'EASYBUILD_PROFILE_SAMPLING'
+# number of entries to include in summary of profiling results, per phase
+PROFILE_TOP_N = 20
+PROFILE_SUMMARY_FILENAME = 'summary.txt'
+MEMORY_PROFILE_FILENAME = 'memory.txt'
+
+# classes for which the number of instances is reported when profiling memory usage, with the module they're in;
+# modules are not imported just for this, there are no instances if a module was not imported (yet)
+MEMORY_PROFILE_CLASSES = [
+    ('easybuild.framework.easyconfig.easyconfig', 'EasyConfig'),
+    ('easybuild.framework.easyblock', 'EasyBlock'),
+    ('easybuild.tools.toolchain.toolchain', 'Toolchain'),
+]
+
+_profiler = None
+_memory_profiler = None
+
+_log = fancylogger.getLogger('tools.profiling', fname=False)
+
+
+def profiling_requested(args):
+    """
+    Determine whether (deterministic) profiling is requested, via the command line arguments or the environment.
+    This needs to be determined before the command line options are parsed, so option parsing can be profiled too;
+    statistical profiling can only be started after parsing the options, since the sampling interval is needed.
+    """
+    profile_args = [arg for arg in args if arg == PROFILE_OPTION or arg.startswith(PROFILE_OPTION + '=')]
+    sampling_args = [arg for arg in args if arg.startswith(PROFILE_SAMPLING_OPTION)]
+    requested = bool(profile_args) or PROFILE_ENV_VAR in os.environ
+    return requested and not sampling_args and PROFILE_SAMPLING_ENV_VAR not in os.environ
+
+
+class Profiler(object):
+    """
+    Profiler for an EasyBuild session, which keeps track of profiling results per phase.
+    Phases can be nested: while a nested phase is active, the enclosing phase is paused.
+    """
+
+    def __init__(self, sampling_interval=None):
+        """
+        Create profiler.
+        @param sampling_interval: interval (in seconds) for sampling the call stack (None implies using cProfile)
+        """
+        self.sampling_interval = sampling_interval
+        # profiling results per phase: cProfile.Profile instance or dict with sample count per call stack
+        self.phases = OrderedDict()
+        self.active = []
+
+        if self.sampling_interval is not None:
+            signal.signal(signal.SIGPROF, self._sample)
+            # make sure interrupted system calls are restarted, rather than failing with EINTR
+            signal.siginterrupt(signal.SIGPROF, False)
+            signal.setitimer(signal.ITIMER_PROF, self.sampling_interval, self.sampling_interval)
+
+    def _sample(self, signum, frame):
+        """Signal handler: sample call stack, and attribute it to the active phase."""
+        if self.active:
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("%s:%s:%d" % (code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            samples = self.phases[self.active[-1]]
+            key = ';'.join(reversed(stack))
+            samples[key] = samples.get(key, 0) + 1
+
+    def _pause(self):
+        """Pause profiling of active phase."""
+        if self.active and self.sampling_interval is None:
+            self.phases[self.active[-1]].disable()
+
+    def _resume(self):
+        """Resume profiling of active phase."""
+        if self.active and self.sampling_interval is None:
+            self.phases[self.active[-1]].enable()
+
+    def start_phase(self, name):
+        """Start (or continue) profiling the specified phase."""
+        self._pause()
+        if name not in self.phases:
+            if self.sampling_interval is None:
+                self.phases[name] = cProfile.Profile()
+            else:
+                self.phases[name] = {}
+        self.active.append(name)
+        self._resume()
+
+    def stop_phase(self, name):
+        """Stop profiling the specified phase, which must be the active phase."""
+        if not self.active or self.active[-1] != name:
+            _log.error("Can't stop profiling phase '%s', active phases: %s" % (name, self.active))
+        self._pause()
+        self.active.pop()
+        self._resume()
+
+    def stop(self):
+        """Stop profiling altogether."""
+        self._pause()
+        self.active = []
+        if self.sampling_interval is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def phase_summary(self, name, top_n=PROFILE_TOP_N):
+        """Return summary of profiling results for specified phase, i.e. the top N functions (by cumulative time)."""
+        phase = self.phases[name]
+        if self.sampling_interval is None:
+            phase.create_stats()
+            if phase.stats:
+                out = StringIO()
+                stats = pstats.Stats(phase, stream=out)
+                stats.sort_stats('cumulative').print_stats(top_n)
+                txt = out.getvalue().strip()
+            else:
+                txt = "(no function calls recorded)"
+        else:
+            # count samples in which each function occurs in the call stack
+            cum_counts = {}
+            for (stack, cnt) in phase.items():
+                for func in set(stack.split(';')):
+                    cum_counts[func] = cum_counts.get(func, 0) + cnt
+            total = sum(phase.values())
+            lines = ["%d samples (interval: %ss)" % (total, self.sampling_interval), "", "   samples  function"]
+            top_funcs = sorted(cum_counts.items(), key=lambda (func, cnt): (-cnt, func))[:top_n]
+            lines.extend(["%10d  %s" % (cnt, func) for (func, cnt) in top_funcs])
+            txt = '\n'.join(lines)
+
+        return "== %s\n\n%s\n" % (name, txt)
+
+    def dump(self, outdir):
+        """
+        Dump profiling results to specified directory, one file per phase (plus a summary);
+        pstats files for deterministic profiling, files with sample counts per call stack for statistical profiling
+        (in the 'collapsed' format that is used to create flame graphs).
+        Returns summary of profiling results.
+        """
+        # avoid relying on build options, since configuration may not be initialized (e.g. if option parsing failed)
+        mkdir(outdir, parents=True, set_gid=False, sticky=False)
+
+        summary = []
+        for (idx, name) in enumerate(self.phases):
+            fn_base = '%02d-%s' % (idx, re.sub(r'[^\w.-]', '_', name))
+            if self.sampling_interval is None:
+                path = os.path.join(outdir, '%s.pstats' % fn_base)
+                self.phases[name].dump_stats(path)
+            else:
+                path = os.path.join(outdir, '%s.samples' % fn_base)
+                lines = ["%s %d" % (stack, cnt) for (stack, cnt) in sorted(self.phases[name].items())]
+                write_file(path, '\n'.join(lines) + '\n')
+            _log.info("Profiling results for phase '%s' dumped to %s" % (name, path))
+            summary.append(self.phase_summary(name))
+
+        summary = '\n'.join(summary)
+        write_file(os.path.join(outdir, PROFILE_SUMMARY_FILENAME), summary)
+        return summary
+
+
+class MemoryProfiler(object):
+    """
+    Memory profiler for an EasyBuild session, which takes a snapshot of the memory usage at the end of each phase:
+    resident set size, number of instances of EasyConfig/EasyBlock/Toolchain, number of objects per type
+    (for objects tracked by the garbage collector), and the top allocation sites (only if tracemalloc is available).
+
+    A summary of each snapshot (incl. the changes since the previous snapshot) is appended to the memory profile
+    right away; only the previous snapshot is retained, to keep the memory usage of the profiler itself bounded.
+    """
+
+    def __init__(self, outdir, steps=False):
+        """
+        Create memory profiler.
+        @param outdir: directory to write memory profile to
+        @param steps: also take a snapshot at the end of each build step (rather than only for each build)
+        """
+        self.path = os.path.join(outdir, MEMORY_PROFILE_FILENAME)
+        self.steps = steps
+        self.prev = None
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+
+        # avoid relying on build options, since configuration is not initialized yet
+        mkdir(outdir, parents=True, set_gid=False, sticky=False)
+        self._write('', append=False)
+
+        if HAVE_TRACEMALLOC:
+            tracemalloc.start()
+        else:
+            _log.info("tracemalloc is not available, so allocation sites will not be included in memory profile")
+
+    def _write(self, txt, append=True):
+        """Write specified text to memory profile."""
+        try:
+            if append:
+                fh = open(self.path, 'a')
+            else:
+                fh = open(self.path, 'w')
+            fh.write(txt)
+            fh.close()
+        except IOError, err:
+            _log.warning("Failed to write to memory profile %s: %s" % (self.path, err))
+
+    def rss(self):
+        """Return current resident set size (in bytes), or None if it can't be determined."""
+        try:
+            return int(open('/proc/self/statm').read().split()[1]) * self.page_size
+        except (IOError, IndexError, ValueError):
+            return None
+
+    def snapshot(self, name):
+        """Take snapshot of memory usage at the end of specified phase, and add summary of it to memory profile."""
+        counts = {}
+        for obj in gc.get_objects():
+            typ = getattr(obj, '__class__', type(obj))
+            counts[typ] = counts.get(typ, 0) + 1
+
+        instances = OrderedDict()
+        for (modname, clsname) in MEMORY_PROFILE_CLASSES:
+            cls = getattr(sys.modules.get(modname), clsname, None)
+            instances[clsname] = sum([cnt for (typ, cnt) in counts.items() if isinstance(typ, type) and
+                                      cls is not None and issubclass(typ, cls)])
+
+        type_counts = {}
+        for (typ, cnt) in counts.items():
+            typ_name = getattr(typ, '__name__', str(typ))
+            if getattr(typ, '__module__', None) not in [None, '__builtin__', 'builtins']:
+                typ_name = '%s.%s' % (typ.__module__, typ_name)
+            type_counts[typ_name] = type_counts.get(typ_name, 0) + cnt
+
+        tracemalloc_snapshot = None
+        if HAVE_TRACEMALLOC:
+            # exclude allocations done for taking this snapshot
+            this_file = os.path.splitext(__file__)[0] + '.py'
+            tracemalloc_snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, this_file)])
+
+        snapshot = {
+            'name': name,
+            'rss': self.rss(),
+            # maximum resident set size is expressed in kilobytes (on Linux)
+            'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'objects': sum(counts.values()),
+            'instances': instances,
+            'type_counts': type_counts,
+            'tracemalloc': tracemalloc_snapshot,
+        }
+        self._write(self.snapshot_summary(snapshot, self.prev) + '\n')
+        self.prev = snapshot
+
+    def stop(self):
+        """Stop profiling memory usage."""
+        if HAVE_TRACEMALLOC:
+            tracemalloc.stop()
+        self.prev = None
+
+    def snapshot_summary(self, snapshot, prev=None, top_n=PROFILE_TOP_N):
+        """
+        Return summary of specified snapshot, incl. changes since the previous snapshot (if any):
+        top N types of objects (by number of objects) and top N allocation sites (by size).
+        """
+        if prev is None:
+            prev = {'rss': None, 'objects': 0, 'instances': {}, 'type_counts': {}, 'tracemalloc': None}
+
+        mb = 1024.0 * 1024.0
+        if snapshot['rss'] is None:
+            rss_txt = "(unknown)"
+        else:
+            rss_txt = "%.1f MB" % (snapshot['rss'] / mb)
+        lines = [
+            "RSS: %s (max: %.1f MB), %d objects tracked by garbage collector (%+d)" %
+            (rss_txt, snapshot['maxrss'] / mb, snapshot['objects'], snapshot['objects'] - prev['objects']),
+            "instances: %s" % ', '.join(["%s: %d (%+d)" % (cls, cnt, cnt - prev['instances'].get(cls, 0))
+                                         for (cls, cnt) in snapshot['instances'].items()]),
+            "",
+            "     count    change  type",
+        ]
+        type_counts = sorted(snapshot['type_counts'].items(), key=lambda (typ, cnt): (-cnt, typ))[:top_n]
+        for (typ, cnt) in type_counts:
+            lines.append("%10d %+9d  %s" % (cnt, cnt - prev['type_counts'].get(typ, 0), typ))
+
+        lines.append('')
+        if snapshot['tracemalloc'] is None:
+            lines.append("(allocation sites are only available if tracemalloc is available)")
+        else:
+            if prev['tracemalloc'] is None:
+                stats = snapshot['tracemalloc'].statistics('lineno')
+            else:
+                stats = snapshot['tracemalloc'].compare_to(prev['tracemalloc'], 'lineno')
+            lines.append("   size_kb change_kb     count  allocation site")
+            for stat in stats[:top_n]:
+                frame = stat.traceback[0]
+                lines.append("%10d %+9d %9d  %s:%s" % (stat.size / 1024, getattr(stat, 'size_diff', 0) / 1024,
+                                                       stat.count, frame.filename, frame.lineno))
+
+        return "== %s\n\n%s\n" % (snapshot['name'], '\n'.join(lines))
+
+
+def enable_profiling(sampling_interval=None):
+    """
+    Enable profiling (no-op if profiling is already enabled).
+    @param sampling_interval: interval (in seconds) for sampling the call stack (None implies using cProfile)
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(sampling_interval=sampling_interval)
+    return _profiler
+
+
+def disable_profiling(outdir=None, report=True):
+    """
+    Disable profiling, and dump the profiling results to specified directory (if any).
+    @param report: print summary of profiling results to stderr
+    """
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+        if outdir is not None:
+            try:
+                summary = _profiler.dump(outdir)
+                if report:
+                    sys.stderr.write("%s\nProfiling results dumped to %s\n" % (summary, outdir))
+            except (EasyBuildError, IOError), err:
+                _log.warning("Failed to dump profiling results to %s: %s" % (outdir, err))
+        _profiler = None
+
+
+def disable_profiling_at_exit(outdir):
+    """Make sure profiling results are dumped to specified directory when the Python interpreter exits."""
+    atexit.register(disable_profiling, outdir=outdir)
+
+
+def enable_memory_profiling(outdir, steps=False):
+    """
+    Enable profiling of memory usage (no-op if memory profiling is already enabled).
+    @param outdir: directory to write memory profile to
+    @param steps: also take a snapshot of the memory usage at the end of each build step
+    """
+    global _memory_profiler
+    if _memory_profiler is None:
+        _memory_profiler = MemoryProfiler(outdir, steps=steps)
+    return _memory_profiler
+
+
+def disable_memory_profiling(report=True):
+    """
+    Disable profiling of memory usage.
+    @param report: print location of memory profile to stderr
+    """
+    global _memory_profiler
+    if _memory_profiler is not None:
+        _memory_profiler.stop()
+        if report:
+            sys.stderr.write("Memory profile written to %s\n" % _memory_profiler.path)
+        _memory_profiler = None
+
+
+def disable_memory_profiling_at_exit():
+    """Make sure profiling of memory usage is disabled when the Python interpreter exits."""
+    atexit.register(disable_memory_profiling)
+
+
+def start_profile_phase(name):
+    """Start profiling the specified phase (no-op if profiling is not enabled)."""
+    if _profiler is not None:
+        _profiler.start_phase(name)
+
+
+def stop_profile_phase(name, step=False):
+    """
+    Stop profiling the specified phase (no-op if profiling is not enabled),
+    and take a snapshot of the memory usage (if memory profiling is enabled).
+    @param step: phase corresponds to a build step (memory usage is only profiled per step if requested)
+    """
+    if _profiler is not None:
+        _profiler.stop_phase(name)
+    if _memory_profiler is not None and (_memory_profiler.steps or not step):
+        _memory_profiler.snapshot(name)
@@ -0,0 +1,212 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for registries of what is available in a set of Python packages (e.g., toolchains, easyblocks),
+so that the modules in these packages only need to be imported when they are actually used.
+
+A registry is generated by importing all modules in the packages it covers, and is stored in the cache directory
+(only if one is configured, see --cachedir); it is regenerated automatically when modules in the packages
+are added, removed or changed, and when requested (see --regenerate-registries).
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+from vsc.utils import fancylogger
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import mkdir, read_file
+from easybuild.tools.utilities import package_paths_stamp
+from easybuild.tools.version import VERSION
+
+
+REGISTRY_SUBDIR = 'registry'
+
+_registries = {}
+
+_log = fancylogger.getLogger('tools.registry', fname=False)
+
+
+def registry_path(cachedir, kind):
+    """Return path to file for registry of specified kind in specified cache directory."""
+    return os.path.join(cachedir, REGISTRY_SUBDIR, '%s.json' % kind)
+
+
+def registry_stamp(packages):
+    """
+    Return stamp for registry covering the specified packages,
+    which changes whenever modules are added/removed/changed in these packages or when EasyBuild is upgraded.
+    """
+    stamp = {
+        'packages': {},
+        'version': str(VERSION),
+    }
+    for package in packages:
+        pkg_stamp = package_paths_stamp(package, files=True)
+        if pkg_stamp is not None:
+            # use lists rather than tuples, so stamp can be compared with a stamp loaded from a JSON file
+            stamp['packages'][package] = [list(x) for x in pkg_stamp]
+    return stamp
+
+
+def to_str(value):
+    """Convert unicode strings in specified (nested) value obtained from a JSON file to regular strings."""
+    if isinstance(value, unicode):
+        return str(value)
+    elif isinstance(value, list):
+        return [to_str(x) for x in value]
+    elif isinstance(value, dict):
+        return dict([(to_str(key), to_str(val)) for (key, val) in value.items()])
+    else:
+        return value
+
+
+def load_registry(path, stamp):
+    """Load registry from specified path, if it's there and if it matches the specified stamp (returns None if not)."""
+    registry = None
+    if os.path.exists(path):
+        try:
+            data = json.loads(read_file(path))
+            if data.get('stamp') == stamp:
+                registry = to_str(data['registry'])
+                _log.debug("Loaded registry from %s" % path)
+            else:
+                _log.debug("Registry in %s is outdated, ignoring it" % path)
+        except (EasyBuildError, KeyError, ValueError), err:
+            _log.warning("Failed to load registry from %s, ignoring it: %s" % (path, err))
+    return registry
+
+
+def store_registry(path, stamp, registry):
+    """Store registry with specified stamp at specified path."""
+    # write to a temporary file first and rename, to avoid that concurrent eb sessions pick up a partial file
+    try:
+        regdir = os.path.dirname(path)
+        # avoid relying on build options, since registry may be used before configuration is initialized
+        mkdir(regdir, parents=True, set_gid=False, sticky=False)
+        fd, tmp_path = tempfile.mkstemp(dir=regdir)
+        os.write(fd, json.dumps({'stamp': stamp, 'registry': registry}, indent=1, sort_keys=True))
+        os.close(fd)
+        os.rename(tmp_path, path)
+        _log.debug("Stored registry in %s" % path)
+    except (EasyBuildError, IOError, OSError), err:
+        _log.warning("Failed to store registry in %s: %s" % (path, err))
+
+
+def get_registry(kind, packages, generate, cachedir=None, regenerate=False):
+    """
+    Obtain registry of specified kind, which covers the specified Python packages.
+    The registry is cached in memory (per cache directory), and stored in the cache directory (if specified).
+
+    @param kind: kind of registry (e.g., 'toolchains'), also used as name for the registry file
+    @param packages: list of Python packages covered by the registry
+    @param generate: function to generate the registry, which should return a dict that can be serialized to JSON
+    @param cachedir: cache directory to store the registry in (registry is only cached in memory if None)
+    @param regenerate: regenerate the registry, even if an up-to-date registry is available
+    """
+    stamp = registry_stamp(packages)
+
+    key = (kind, cachedir)
+    registry = None
+    if not regenerate:
+        if key in _registries and _registries[key][0] == stamp:
+            registry = _registries[key][1]
+        elif cachedir is not None:
+            registry = load_registry(registry_path(cachedir, kind), stamp)
+
+    if registry is None:
+        _log.debug("Generating %s registry" % kind)
+        registry = generate()
+        if cachedir is not None:
+            store_registry(registry_path(cachedir, kind), stamp, registry)
+
+    _registries[key] = (stamp, registry)
+
+    return registry
+
+
+def easyblocks_registry_packages():
+    """Return list of Python packages covered by the easyblocks registry."""
+    # imported here to avoid circular imports
+    from easybuild.framework.easyconfig.easyconfig import EASYBLOCKS_PKG, GENERIC_EASYBLOCKS_PKG
+    return [EASYBLOCKS_PKG, GENERIC_EASYBLOCKS_PKG]
+
+
+def generate_easyblocks_registry():
+    """
+    Generate registry of available easyblocks, by importing all available easyblock modules.
+    The registry specifies the module and the names of the direct subclasses for each class deriving from EasyBlock
+    or Extension (indexed by class name).
+    """
+    # imported here to avoid circular imports, and since these are only required when generating the registry
+    from easybuild.framework.easyblock import EasyBlock
+    from easybuild.framework.extension import Extension
+    from easybuild.tools.toolchain.utilities import search_toolchain
+
+    module_regexp = re.compile(r"^([^_].*)\.py$")
+
+    # finish initialisation of the toolchain module (ie set the TC_CONSTANT constants)
+    search_toolchain('')
+
+    for package in easyblocks_registry_packages():
+        __import__(package)
+
+        # determine paths for this package
+        paths = sys.modules[package].__path__
+
+        # import all modules in these paths
+        for path in paths:
+            if os.path.exists(path):
+                for f in os.listdir(path):
+                    res = module_regexp.match(f)
+                    if res:
+                        __import__("%s.%s" % (package, res.group(1)))
+
+    def add_class(classes, cls):
+        """Add a new class, and all of its subclasses."""
+        children = cls.__subclasses__()
+        classes.update({cls.__name__: {
+            'module': cls.__module__,
+            'children': [x.__name__ for x in children]
+        }})
+        for child in children:
+            add_class(classes, child)
+
+    classes = {}
+    for root in [EasyBlock, Extension]:
+        add_class(classes, root)
+
+    return classes
+
+
+def easyblocks_registry(cachedir=None, regenerate=False):
+    """
+    Obtain registry of available easyblocks (see generate_easyblocks_registry).
+    @param cachedir: cache directory to store the registry in (registry is only cached in memory if None)
+    @param regenerate: regenerate the registry, even if an up-to-date registry is available
+    """
+    return get_registry('easyblocks', easyblocks_registry_packages(), generate_easyblocks_registry,
+                        cachedir=cachedir, regenerate=regenerate)
@@ -33,6 +33,7 @@ Tools to run commands.
 @author: Toon Willems (Ghent University)
 @author: Ward Poelmans (Ghent University)
 """
+import functools
 import os
 import re
 import signal
@@ -44,6 +45,8 @@ from vsc.utils import fancylogger
 
 from easybuild.tools.asyncprocess import PIPE, STDOUT, Popen, recv_some, send_all
 import easybuild.tools.build_log  # this import is required to obtain a correct (EasyBuild) logger!
+from easybuild.tools.counters import RUN_CMD, RUN_CMD_QA, counted
+from easybuild.tools.rusage import format_cmd_usage, poll_cmd, start_cmd_usage, stop_cmd_usage
 
 
 _log = fancylogger.getLogger('run', fname=False)
@@ -63,6 +66,7 @@ strictness = WARN
 def adjust_cmd(func):
     """Make adjustments to given command, if required."""
 
+    @functools.wraps(func)
     def inner(cmd, *args, **kwargs):
         # SuSE hack
         # - profile is not resourced, and functions (e.g. module) is not inherited
@@ -82,6 +86,7 @@ def adjust_cmd(func):
     return inner
 
 
+@counted(RUN_CMD)
 @adjust_cmd
 def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True, log_output=False, path=None):
     """
@@ -115,6 +120,7 @@ def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True
 
     readSize = 1024 * 8
 
+    usage_handle = start_cmd_usage()
     try:
         p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
                              stdin=subprocess.PIPE, close_fds=True, executable="/bin/bash")
@@ -124,7 +130,7 @@ def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True
         p.stdin.write(inp)
     p.stdin.close()
 
-    ec = p.poll()
+    ec = poll_cmd(p)
     stdouterr = ''
     while ec < 0:
         # need to read from time to time.
@@ -133,11 +139,14 @@ def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True
         if runLog:
             runLog.write(output)
         stdouterr += output
-        ec = p.poll()
+        ec = poll_cmd(p)
 
     # read remaining data (all of it)
     stdouterr += p.stdout.read()
 
+    usage = stop_cmd_usage(cmd, usage_handle, proc=p)
+    _log.debug("run_cmd: resource usage for cmd %s: %s" % (cmd, format_cmd_usage(usage)))
+
     # not needed anymore. subprocess does this correct?
     # ec=os.WEXITSTATUS(ec)
 
@@ -153,6 +162,7 @@ def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True
     return parse_cmd_output(cmd, stdouterr, ec, simple, log_all, log_ok, regexp)
 
 
+@counted(RUN_CMD_QA)
 @adjust_cmd
 def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, regexp=True, std_qa=None, path=None):
     """
@@ -253,12 +263,13 @@ def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, re
 
     maxHitCount = 50
 
+    usage_handle = start_cmd_usage()
     try:
         p = Popen(cmd, shell=True, stdout=PIPE, stderr=STDOUT, stdin=PIPE, close_fds=True, executable="/bin/bash")
     except OSError, err:
         _log.error("run_cmd_qa init cmd %s failed:%s" % (cmd, err))
 
-    ec = p.poll()
+    ec = poll_cmd(p)
     stdoutErr = ''
     oldLenOut = -1
     hitCount = 0
@@ -333,7 +344,7 @@ def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, re
 
         # the sleep below is required to avoid exiting on unknown 'questions' too early (see above)
         time.sleep(1)
-        ec = p.poll()
+        ec = poll_cmd(p)
 
     # Process stopped. Read all remaining data
     try:
@@ -345,6 +356,9 @@ def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, re
     except IOError, err:
         _log.debug("runqanda cmd %s: remaining data read failed: %s" % (cmd, err))
 
+    usage = stop_cmd_usage(cmd, usage_handle, proc=p)
+    _log.debug("run_cmd_qa: resource usage for cmd %s: %s" % (cmd, format_cmd_usage(usage)))
+
     # Not needed anymore. Subprocess does this correct?
     # ec=os.WEXITSTATUS(ec)
 
@@ -0,0 +1,165 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for keeping track of the resources (CPU time, memory, I/O) used by the shell commands that are run
+(see run_cmd and run_cmd_qa in easybuild.tools.run).
+
+The exact resource usage of a command is obtained via wait4 when it finishes (see poll_cmd), which covers the command
+and all processes it has waited for (e.g. all compiler processes spawned by 'make -j'). If that's not possible,
+it is determined via getrusage(RUSAGE_CHILDREN) instead, in which case the maximum resident set size is only known
+for a command if it exceeds that of all earlier commands.
+"""
+import os
+import resource
+import time
+
+
+# maximum length of command included in records of resource usage
+MAX_CMD_LEN = 200
+# maximum number of records of resource usage that are retained (oldest records are dropped first)
+MAX_CMD_USAGES = 10000
+
+# records of resource usage for commands that were run: list of (command, start time, usage) tuples
+_cmd_usages = []
+# number of records of resource usage that were dropped
+_dropped_cmd_usages = 0
+
+
+def start_cmd_usage():
+    """Start keeping track of resource usage for a command; returns handle to pass to stop_cmd_usage."""
+    return (time.time(), resource.getrusage(resource.RUSAGE_CHILDREN))
+
+
+def poll_cmd(proc):
+    """
+    Check whether the command run by the specified process (a subprocess.Popen instance) has finished, cfr. Popen.poll;
+    returns its exit code, or None if it's still running. The exact resource usage of the command is obtained via wait4
+    when it has finished, and is stored as the 'rusage' attribute of the process (see stop_cmd_usage).
+    """
+    if proc.returncode is None:
+        try:
+            (pid, status, rusage) = os.wait4(proc.pid, os.WNOHANG)
+        except OSError:
+            # process may already have been waited for
+            return proc.poll()
+        if pid == proc.pid:
+            proc.rusage = rusage
+            proc.returncode = os.WEXITSTATUS(status)
+            if os.WIFSIGNALED(status):
+                proc.returncode = -os.WTERMSIG(status)
+    return proc.returncode
+
+
+def stop_cmd_usage(cmd, handle, proc=None):
+    """
+    Determine resource usage for a command that was started after obtaining the specified handle, and has finished.
+    Returns dict with wall time, user/system CPU time (in seconds), max. resident set size (in KB, None if unknown),
+    and number of block input/output operations.
+
+    @param proc: process that ran the command (see poll_cmd), to use exact resource usage for the command (if known)
+    """
+    global _dropped_cmd_usages
+
+    (start_time, start) = handle
+    rusage = getattr(proc, 'rusage', None)
+    if rusage is None:
+        end = resource.getrusage(resource.RUSAGE_CHILDREN)
+        maxrss = None
+        if end.ru_maxrss > start.ru_maxrss:
+            maxrss = end.ru_maxrss
+        usage = {
+            'utime': end.ru_utime - start.ru_utime,
+            'stime': end.ru_stime - start.ru_stime,
+            'maxrss': maxrss,
+            'inblock': end.ru_inblock - start.ru_inblock,
+            'oublock': end.ru_oublock - start.ru_oublock,
+        }
+    else:
+        usage = {
+            'utime': rusage.ru_utime,
+            'stime': rusage.ru_stime,
+            'maxrss': rusage.ru_maxrss,
+            'inblock': rusage.ru_inblock,
+            'oublock': rusage.ru_oublock,
+        }
+    usage['wall'] = time.time() - start_time
+
+    _cmd_usages.append((cmd[:MAX_CMD_LEN], start_time, usage))
+    if len(_cmd_usages) > MAX_CMD_USAGES:
+        del _cmd_usages[0]
+        _dropped_cmd_usages += 1
+
+    return usage
+
+
+def cmd_usage_count():
+    """Return number of commands for which resource usage was recorded so far."""
+    return _dropped_cmd_usages + len(_cmd_usages)
+
+
+def cmd_usages(start_idx=0):
+    """
+    Return records of resource usage for commands, starting from specified index (see cmd_usage_count);
+    only the most recent MAX_CMD_USAGES records are retained.
+    """
+    return _cmd_usages[max(start_idx - _dropped_cmd_usages, 0):]
+
+
+def summarize_cmd_usage(usages):
+    """
+    Summarize specified resource usage for commands: totals, max. resident set size, and effective parallelism
+    (i.e. the average number of cores that were kept busy while commands were running).
+    """
+    summary = {
+        'cmds': len(usages),
+        'wall': 0.0,
+        'utime': 0.0,
+        'stime': 0.0,
+        'maxrss': None,
+        'inblock': 0,
+        'oublock': 0,
+    }
+    for usage in usages:
+        for key in ['wall', 'utime', 'stime', 'inblock', 'oublock']:
+            summary[key] += usage[key]
+        if usage['maxrss'] is not None and (summary['maxrss'] is None or usage['maxrss'] > summary['maxrss']):
+            summary['maxrss'] = usage['maxrss']
+
+    summary['parallelism'] = None
+    if summary['wall'] > 0:
+        summary['parallelism'] = round((summary['utime'] + summary['stime']) / summary['wall'], 2)
+    for key in ['wall', 'utime', 'stime']:
+        summary[key] = round(summary[key], 2)
+
+    return summary
+
+
+def format_cmd_usage(usage):
+    """Return string representation of resource usage for a command."""
+    maxrss = usage['maxrss']
+    if maxrss is None:
+        maxrss = '?'
+    tup = (usage['wall'], usage['utime'], usage['stime'], maxrss, usage['inblock'], usage['oublock'])
+    return "%.2fs wall, %.2fs user, %.2fs sys, max RSS %s KB, %d blocks in, %d blocks out" % tup
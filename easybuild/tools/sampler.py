@@ -0,0 +1,236 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for sampling the resources used during an installation in the background (see --sample-resources):
+CPU utilisation, memory usage, number of processes and open files for the whole process tree (via /proc),
+and disk usage of the build and installation directories (determined much less often, since that requires
+walking the entire directory trees).
+"""
+import os
+import threading
+import time
+from vsc.utils import fancylogger
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import det_size, write_file
+
+
+PROC_DIR = '/proc'
+
+# minimal interval between determining disk usage of build/installation directories (in seconds)
+DISK_USAGE_INTERVAL = 300
+
+# metrics included in each sample, in order
+SAMPLE_FIELDS = ['time', 'cpu', 'rss_mb', 'procs', 'open_files', 'builddir_mb', 'installdir_mb']
+
+_log = fancylogger.getLogger('tools.sampler', fname=False)
+
+
+def proc_stats(proc_dir=PROC_DIR):
+    """
+    Return dict with statistics for all processes, by PID: parent PID, CPU time of the process itself and of its
+    waited-for children (in clock ticks) and resident set size (in pages), obtained from /proc/<pid>/stat.
+    """
+    stats = {}
+    for pid in [int(x) for x in os.listdir(proc_dir) if x.isdigit()]:
+        try:
+            txt = open(os.path.join(proc_dir, str(pid), 'stat')).read()
+        except IOError:
+            # process may have finished in the meantime
+            continue
+        # command name (2nd field) is enclosed in parentheses and may contain spaces, so split after last ')'
+        fields = txt[txt.rfind(')') + 2:].split()
+        # fields (after command name): state, ppid, ..., utime (12), stime, cutime, cstime, ..., rss (22)
+        stats[pid] = {
+            'ppid': int(fields[1]),
+            'cpu': sum([int(x) for x in fields[11:13]]),
+            'children_cpu': sum([int(x) for x in fields[13:15]]),
+            'rss': int(fields[21]),
+        }
+    return stats
+
+
+def process_tree(root_pid, stats):
+    """Determine list of PIDs for specified process and all of its descendants."""
+    children = {}
+    for (pid, pid_stats) in stats.items():
+        children.setdefault(pid_stats['ppid'], []).append(pid)
+
+    tree, todo = [], [root_pid]
+    while todo:
+        pid = todo.pop()
+        if pid in stats:
+            tree.append(pid)
+            todo.extend(children.get(pid, []))
+    return tree
+
+
+def count_open_files(pid, proc_dir=PROC_DIR):
+    """Count number of open files for process with specified PID."""
+    try:
+        return len(os.listdir(os.path.join(proc_dir, str(pid), 'fd')))
+    except OSError:
+        return 0
+
+
+class ResourceSampler(threading.Thread):
+    """Thread that samples resource usage of this process (and all of its descendants) at a regular interval."""
+
+    def __init__(self, interval, builddir=None, installdir=None, proc_dir=PROC_DIR,
+                 disk_usage_interval=DISK_USAGE_INTERVAL):
+        """
+        Create resource sampler.
+        @param interval: interval between samples (in seconds)
+        @param builddir: build directory to determine disk usage for
+        @param installdir: installation directory to determine disk usage for
+        @param disk_usage_interval: minimal interval between determining disk usage (in seconds)
+        """
+        threading.Thread.__init__(self, name='ResourceSampler')
+        # don't let the sampler keep the Python interpreter alive
+        self.setDaemon(True)
+
+        self.interval = interval
+        self.builddir = builddir
+        self.installdir = installdir
+        self.proc_dir = proc_dir
+
+        self.samples = []
+        self.pid = os.getpid()
+        self.start_time = None
+        self.clock_ticks = os.sysconf('SC_CLK_TCK')
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.stop_event = threading.Event()
+
+        # CPU time per process (incl. waited-for children) in previous sample, and time of previous sample
+        self.prev_cpu = {}
+        self.prev_time = None
+
+        # disk usage of build/installation directory (in MB) is only determined every so often,
+        # since walking the entire directory trees is way more expensive than taking a sample via /proc
+        self.disk_usage_interval = disk_usage_interval
+        self.disk_usage = [0.0, 0.0]
+        self.disk_usage_time = None
+
+    def det_disk_usage(self, now, force=False):
+        """Determine disk usage of build/installation directory (in MB), if last check was long enough ago."""
+        if force or self.disk_usage_time is None or now - self.disk_usage_time >= self.disk_usage_interval:
+            mb = 1024.0 * 1024.0
+            disk_usage = []
+            for path in [self.builddir, self.installdir]:
+                if path is not None and os.path.exists(path):
+                    disk_usage.append(det_size(path) / mb)
+                else:
+                    disk_usage.append(0.0)
+            self.disk_usage, self.disk_usage_time = disk_usage, now
+
+        return self.disk_usage
+
+    def sample(self, force_disk_usage=False):
+        """
+        Take a single sample of the resource usage.
+        @param force_disk_usage: determine disk usage, regardless of when it was last determined
+        """
+        now = time.time()
+        stats = proc_stats(proc_dir=self.proc_dir)
+        tree = process_tree(self.pid, stats)
+
+        # CPU utilisation (in number of cores) since previous sample;
+        # when a process in the tree exits and is waited for, the CPU time it used moves to the children CPU time of
+        # its parent, so the CPU time it had used by the previous sample must not be counted again
+        cpu = 0.0
+        cpu_now = dict([(pid, stats[pid]['cpu'] + stats[pid]['children_cpu']) for pid in tree])
+        if self.prev_time is not None and now > self.prev_time:
+            cpu_ticks = sum([cpu_now[pid] - self.prev_cpu.get(pid, 0) for pid in tree])
+            cpu_ticks -= sum([prev for (pid, prev) in self.prev_cpu.items() if pid not in cpu_now])
+            cpu = float(max(cpu_ticks, 0)) / self.clock_ticks / (now - self.prev_time)
+        self.prev_cpu, self.prev_time = cpu_now, now
+
+        mb = 1024.0 * 1024.0
+        disk_usage = self.det_disk_usage(now, force=force_disk_usage)
+
+        self.samples.append((
+            round(now - self.start_time, 2),
+            round(cpu, 2),
+            round(sum([stats[pid]['rss'] for pid in tree]) * self.page_size / mb, 2),
+            len(tree),
+            sum([count_open_files(pid, proc_dir=self.proc_dir) for pid in tree]),
+            round(disk_usage[0], 2),
+            round(disk_usage[1], 2),
+        ))
+
+    def run(self):
+        """Sample resource usage at regular interval, until the sampler is stopped."""
+        self.start_time = time.time()
+        while not self.stop_event.isSet():
+            try:
+                self.sample()
+            except (IOError, OSError, IndexError, ValueError), err:
+                _log.warning("Failed to sample resource usage: %s" % err)
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        """Stop sampling resource usage (after taking a last sample)."""
+        if self.isAlive():
+            self.stop_event.set()
+            self.join()
+            self.sample(force_disk_usage=True)
+
+    def peaks(self):
+        """Return peak values for sampled resource usage (as a dict)."""
+        peaks = {}
+        for (idx, field) in enumerate(SAMPLE_FIELDS):
+            if field != 'time':
+                peaks[field] = max([0] + [sample[idx] for sample in self.samples])
+        return peaks
+
+    def time_series(self):
+        """Return time series of sampled resource usage, in tab-separated format."""
+        lines = ['\t'.join(SAMPLE_FIELDS)]
+        lines.extend(['\t'.join([str(x) for x in sample]) for sample in self.samples])
+        return '\n'.join(lines) + '\n'
+
+    def write_time_series(self, path):
+        """Write time series of sampled resource usage to specified path."""
+        try:
+            write_file(path, self.time_series())
+            _log.info("Time series of sampled resource usage written to %s" % path)
+        except EasyBuildError, err:
+            _log.warning("Failed to write time series of sampled resource usage to %s: %s" % (path, err))
+
+
+def start_resource_sampler(interval, builddir=None, installdir=None):
+    """Start sampling resource usage in the background (returns None if /proc is not available)."""
+    if os.path.isdir(os.path.join(PROC_DIR, 'self')):
+        sampler = ResourceSampler(interval, builddir=builddir, installdir=installdir)
+        sampler.start()
+        return sampler
+    else:
+        _log.warning("%s is not available, so resource usage can't be sampled" % PROC_DIR)
+        return None
+
+
+def resources_file_path(logfile):
+    """Return path for file with time series of sampled resource usage that corresponds to specified log file."""
+    return '%s.resources.tsv' % os.path.splitext(logfile)[0]
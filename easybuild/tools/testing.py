@@ -41,17 +41,13 @@ from datetime import datetime
 from time import gmtime, strftime
 
 import easybuild.tools.config as config
-from easybuild.framework.easyblock import build_easyconfigs
 from easybuild.framework.easyconfig.tools import process_easyconfig
 from easybuild.framework.easyconfig.tools import skip_available
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option
+from easybuild.tools.counters import counter_totals, counters_since, get_counters, top_call_sites
 from easybuild.tools.filetools import find_easyconfigs, mkdir, read_file, write_file
-from easybuild.tools.github import create_gist, post_comment_in_issue
-from easybuild.tools.jenkins import aggregate_xml_in_dirs
 from easybuild.tools.modules import modules_tool
-from easybuild.tools.parallelbuild import build_easyconfigs_in_parallel
-from easybuild.tools.robot import resolve_dependencies
 from easybuild.tools.systemtools import get_system_info
 from easybuild.tools.version import FRAMEWORK_VERSION, EASYBLOCKS_VERSION
 from vsc.utils import fancylogger
@@ -67,6 +63,12 @@ def regtest(easyconfig_paths, build_specs=None):
     @param build_specs: dictionary specifying build specifications (e.g. version, toolchain, ...)
     """
 
+    # only import modules that are specific to running regression tests when needed, to keep startup fast
+    from easybuild.framework.easyblock import build_easyconfigs
+    from easybuild.tools.jenkins import aggregate_xml_in_dirs
+    from easybuild.tools.parallelbuild import build_easyconfigs_in_parallel
+    from easybuild.tools.robot import resolve_dependencies
+
     cur_dir = os.getcwd()
 
     aggregate_regtest = build_option('aggregate_regtest')
@@ -148,11 +150,12 @@ def regtest(easyconfig_paths, build_specs=None):
 
 
 def session_state():
-    """Get session state: timestamp, dump of environment, system info."""
+    """Get session state: timestamp, dump of environment, system info, hot path counters."""
     return {
         'time': gmtime(),
         'environment': copy.deepcopy(os.environ),
         'system_info': get_system_info(),
+        'hot_path_counters': get_counters(),
     }
 
 
@@ -162,6 +165,33 @@ def session_module_list(testing=False):
     return modtool.list()
 
 
+def hot_path_counters_report(ecs_with_res, init_session_state):
+    """Create section for test report on hot path counters (per build, and for the whole session)."""
+    def totals_txt(counters):
+        """Format totals for specified counters."""
+        totals = counter_totals(counters)
+        if totals:
+            return ', '.join(["%s: %d (%.2fs)" % (kind, cnt, tot) for (kind, (cnt, tot)) in totals.items()])
+        else:
+            return '(none)'
+
+    report = ["#### Hot path counters"]
+    for (ec, ec_res) in ecs_with_res:
+        if 'hot_path_counters' in ec_res:
+            report.append(" * _%s:_ %s" % (os.path.basename(ec['spec']), totals_txt(ec_res['hot_path_counters'])))
+
+    session_counters = counters_since(init_session_state.get('hot_path_counters', {}))
+    report.append(" * _session total:_ %s" % totals_txt(session_counters))
+
+    top_sites = top_call_sites(session_counters)
+    if top_sites:
+        report.extend([" * top call sites:", "```"])
+        report.extend(["%s: %d (%.2fs) @ %s" % (kind, cnt, tot, site) for (kind, site, cnt, tot) in top_sites])
+        report.append("```")
+
+    return report + [""]
+
+
 def create_test_report(msg, ecs_with_res, init_session_state, pr_nr=None, gist_log=False):
     """Create test report for easyconfigs PR, in Markdown format."""
     user = build_option('github_user')
@@ -199,6 +229,7 @@ def create_test_report(msg, ecs_with_res, init_session_state, pr_nr=None, gist_l
 
             # create gist for log file (if desired and available)
             if gist_log and 'log_file' in ec_res:
+                from easybuild.tools.github import create_gist
                 logtxt = read_file(ec_res['log_file'])
                 partial_log_txt = '\n'.join(logtxt.split('\n')[-500:])
                 descr = "(partial) EasyBuild log for failed build of %s" % ec['spec']
@@ -216,6 +247,8 @@ def create_test_report(msg, ecs_with_res, init_session_state, pr_nr=None, gist_l
     end_time = strftime(time_format, end_time)
     test_report.extend(["#### Time info", " * start: %s" % start_time, " * end: %s" % end_time, ""])
 
+    test_report.extend(hot_path_counters_report(ecs_with_res, init_session_state))
+
     eb_config = [x for x in sorted(init_session_state['easybuild_configuration'])]
     test_report.extend([
         "#### EasyBuild info",
@@ -262,6 +295,9 @@ def upload_test_report_as_gist(test_report, descr=None, fn=None):
     if fn is None:
         fn = 'easybuild_test_report_%s.md' % strftime("%Y%M%d-UTC-%H-%M-%S", gmtime())
 
+    # only import GitHub support when needed, to keep startup fast
+    from easybuild.tools.github import create_gist
+
     user = build_option('github_user')
 
     gist_url = create_gist(test_report, descr=descr, fn=fn, github_user=user)
@@ -270,6 +306,9 @@ def upload_test_report_as_gist(test_report, descr=None, fn=None):
 
 def post_easyconfigs_pr_test_report(pr_nr, test_report, msg, init_session_state, success):
     """Post test report in a gist, and submit comment in easyconfigs PR."""
+    # only import GitHub support when needed, to keep startup fast
+    from easybuild.tools.github import post_comment_in_issue
+
     user = build_option('github_user')
 
     # create gist with test report
@@ -0,0 +1,158 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Support for keeping track of the (wall and CPU) time spent in the different steps of an installation,
+which can be exported as a trace in the Chrome trace event format (see chrome://tracing).
+
+Shell commands that are run during a step are included in the trace as well,
+along with their resource usage (see easybuild.tools.rusage).
+"""
+import json
+import os
+import time
+from vsc.utils import fancylogger
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import write_file
+from easybuild.tools.ordereddict import OrderedDict
+from easybuild.tools.rusage import cmd_usage_count, cmd_usages, summarize_cmd_usage
+
+
+# categories of timed events
+STEP = 'step'
+SUBSTEP = 'substep'
+EXTENSION = 'extension'
+CMD = 'cmd'
+
+_log = fancylogger.getLogger('tools.timing', fname=False)
+
+
+def cpu_time():
+    """Return CPU time (user + system) spent so far by this process and its child processes that have finished."""
+    return sum(os.times()[:4])
+
+
+class Timings(object):
+    """Collection of timed events, e.g. the steps performed for an installation."""
+
+    def __init__(self):
+        """Initialise list of timed events."""
+        self.events = []
+        self.pid = os.getpid()
+
+    def start(self, name, cat):
+        """
+        Start timing an event, returns a handle that should be passed to stop.
+
+        @param name: name of the event (e.g., the name of a step)
+        @param cat: category of the event (e.g., STEP)
+        """
+        return (name, cat, time.time(), cpu_time(), cmd_usage_count())
+
+    def stop(self, handle, **args):
+        """
+        Stop timing an event, returns tuple with wall time and CPU time (in seconds) spent for this event.
+
+        @param handle: handle for the event, as returned by start
+        @param args: additional information on the event to include in the trace
+        """
+        (name, cat, start_wall, start_cpu, start_cmd_idx) = handle
+        wall, cpu = time.time() - start_wall, cpu_time() - start_cpu
+        event_args = {'cpu_time': cpu}
+        event_args.update(args)
+
+        # include summary of resource usage for shell commands that were run
+        cmds = cmd_usages(start_cmd_idx)
+        if cmds:
+            event_args['cmds'] = summarize_cmd_usage([usage for (_, _, usage) in cmds])
+
+        self.add_event(name, cat, start_wall, wall, event_args)
+
+        # commands are included in the trace as separate events (only once, as part of a step)
+        if cat == STEP:
+            for (cmd, cmd_start, usage) in cmds:
+                cmd_args = {'step': name}
+                cmd_args.update(usage)
+                self.add_event(cmd, CMD, cmd_start, usage['wall'], cmd_args)
+
+        _log.debug("Time spent for %s %s: %.2fs wall, %.2fs CPU" % (cat, name, wall, cpu))
+        return (wall, cpu)
+
+    def add_event(self, name, cat, start, duration, args):
+        """Add event with specified name, category, start time, duration (in seconds) and additional information."""
+        self.events.append({
+            'args': args,
+            'cat': cat,
+            'dur': int(duration * 1e6),
+            'name': name,
+            'ph': 'X',  # 'complete' event, i.e. with a duration
+            'pid': self.pid,
+            'tid': 0,
+            'ts': int(start * 1e6),
+        })
+
+    def cmd_usage_per_step(self):
+        """
+        Return summary of resource usage for shell commands that were run, per step
+        (as a list of (step name, summary) tuples, in order of first occurrence; only for steps that ran commands).
+        """
+        res = OrderedDict()
+        for event in sorted(self.events, key=lambda event: event['ts']):
+            if event['cat'] == CMD:
+                res.setdefault(event['args']['step'], []).append(event['args'])
+
+        return [(step, summarize_cmd_usage(usages)) for (step, usages) in res.items()]
+
+    def totals(self, cat):
+        """
+        Return total wall/CPU time spent for events of the specified category, per event name
+        (as a list of (name, wall time, CPU time) tuples, in order of first occurrence).
+        """
+        res = OrderedDict()
+        for event in sorted(self.events, key=lambda event: event['ts']):
+            if event['cat'] == cat:
+                wall, cpu = res.get(event['name'], (0.0, 0.0))
+                res[event['name']] = (wall + event['dur'] / 1e6, cpu + event['args']['cpu_time'])
+
+        return [(name, round(wall, 2), round(cpu, 2)) for (name, (wall, cpu)) in res.items()]
+
+    def chrome_trace(self):
+        """Return timed events as a trace in Chrome trace event format (JSON object format)."""
+        # events are recorded when they're stopped, so nested events end up before the event they are part of
+        trace_events = sorted(self.events, key=lambda event: (event['ts'], -event['dur']))
+        return json.dumps({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, indent=1, sort_keys=True)
+
+    def write_chrome_trace(self, path):
+        """Write trace of timed events in Chrome trace event format to specified path."""
+        try:
+            write_file(path, self.chrome_trace())
+            _log.info("Trace of timed events written to %s" % path)
+        except EasyBuildError, err:
+            _log.warning("Failed to write trace of timed events to %s: %s" % (path, err))
+
+
+def trace_file_path(logfile):
+    """Return path for trace file that corresponds to specified log file."""
+    return '%s.trace.json' % os.path.splitext(logfile)[0]
@@ -40,63 +40,123 @@ from vsc.utils import fancylogger
 from vsc.utils.missing import get_subclasses, nub
 
 import easybuild.tools.toolchain
+from easybuild.tools.config import build_option
+from easybuild.tools.registry import get_registry
 from easybuild.tools.toolchain.toolchain import Toolchain
 from easybuild.tools.utilities import import_available_modules
 
 
 TC_CONST_PREFIX = 'TC_CONSTANT_'
 
+# Python packages with toolchain modules (and the modules providing toolchain constants)
+TOOLCHAINS_PKG = 'easybuild.toolchains'
+TOOLCHAINS_REGISTRY_PACKAGES = [TOOLCHAINS_PKG] + ['%s.%s' % (TOOLCHAINS_PKG, x)
+                                                  for x in ['compiler', 'fft', 'linalg', 'mpi']]
+
 _initial_toolchain_instances = {}
 
 _log = fancylogger.getLogger("toolchain.utilities")
 
 
-def search_toolchain(name):
+def generate_toolchains_registry():
+    """
+    Generate registry of available toolchains, by importing all available toolchain modules.
+    The registry specifies the module and class name for each toolchain (indexed by toolchain name),
+    and the toolchain constants defined in the modules of classes that are used in toolchain modules.
+    """
+    tc_modules = import_available_modules(TOOLCHAINS_PKG)
+
+    # collect toolchain constants
+    tc_consts = {}
+    tc_const_re = re.compile('^%s(.*)$' % TC_CONST_PREFIX)
+    for tc_mod in tc_modules:
+        # determine classes imported in this module
+        mod_classes = []
+        for elem in [getattr(tc_mod, x) for x in dir(tc_mod)]:
+            if hasattr(elem, '__module__'):
+                # exclude the toolchain class defined in that module
+                if not tc_mod.__file__ == sys.modules[elem.__module__].__file__:
+                    _log.debug("Adding %s to list of imported classes used for looking for constants" % elem.__name__)
+                    mod_classes.append(elem)
+
+        # look for constants in modules of imported classes
+        for mod_class_mod in [sys.modules[mod_class.__module__] for mod_class in mod_classes]:
+            for elem in dir(mod_class_mod):
+                res = tc_const_re.match(elem)
+                if res:
+                    tc_const_name = res.group(1)
+                    tc_const_value = getattr(mod_class_mod, elem)
+                    _log.debug("Found constant %s ('%s') in module %s" % (tc_const_name, tc_const_value,
+                                                                           mod_class_mod.__name__))
+                    if tc_const_name in tc_consts and not tc_consts[tc_const_name] == tc_const_value:
+                        tup = (tc_const_name, tc_consts[tc_const_name], tc_const_value)
+                        _log.error("Toolchain constant %s defined as '%s', can't set it to '%s'." % tup)
+                    tc_consts[tc_const_name] = tc_const_value
+
+    toolchains = {}
+    for tc in nub(get_subclasses(Toolchain)):
+        # only consider toolchain classes that can be used as toolchain, and that are provided by toolchain modules
+        if tc._is_toolchain_for(None) and tc.__module__.startswith(TOOLCHAINS_PKG + '.'):
+            toolchains[tc.NAME] = [tc.__module__, tc.__name__]
+
+    return {
+        'constants': tc_consts,
+        'toolchains': toolchains,
+    }
+
+
+def toolchains_registry(cachedir=None, regenerate=False):
+    """
+    Obtain registry of available toolchains (see generate_toolchains_registry).
+    @param cachedir: cache directory to store the registry in (registry is only cached in memory if None)
+    @param regenerate: regenerate the registry, even if an up-to-date registry is available
+    """
+    return get_registry('toolchains', TOOLCHAINS_REGISTRY_PACKAGES, generate_toolchains_registry,
+                        cachedir=cachedir, regenerate=regenerate)
+
+
+def search_toolchain(name, cachedir=None):
     """
     Obtain a Toolchain instance for the toolchain with specified name, next to a list of available toolchains.
-    @return Toolchain instance (or None), found_toolchains
+    Only the module providing the specified toolchain is imported if it is known in the toolchains registry,
+    so the list of available toolchains is only complete if no toolchain was found (or no name was specified).
+
+    @param name: toolchain name (all toolchains are searched for if no name is specified)
+    @param cachedir: cache directory to use for persistent toolchains registry
+    @return Toolchain instance (or None), found_toolchains (which may be incomplete if a toolchain was found)
     """
+    registry = toolchains_registry(cachedir=cachedir)
 
     package = easybuild.tools.toolchain
     check_attr_name = '%s_PROCESSED' % TC_CONST_PREFIX
 
     if not hasattr(package, check_attr_name) or not getattr(package, check_attr_name):
-        # import all available toolchains, so we know about them
-        tc_modules = import_available_modules('easybuild.toolchains')
-
         # make sure all defined toolchain constants are available in toolchain module
-        tc_const_re = re.compile('^%s(.*)$' % TC_CONST_PREFIX)
-        for tc_mod in tc_modules:
-            # determine classes imported in this module
-            mod_classes = []
-            for elem in [getattr(tc_mod, x) for x in dir(tc_mod)]:
-                if hasattr(elem, '__module__'):
-                    # exclude the toolchain class defined in that module
-                    if not tc_mod.__file__ == sys.modules[elem.__module__].__file__:
-                        _log.debug("Adding %s to list of imported classes used for looking for constants" % elem.__name__)
-                        mod_classes.append(elem)
-
-            # look for constants in modules of imported classes, and make them available
-            for mod_class_mod in [sys.modules[mod_class.__module__] for mod_class in mod_classes]:
-                for elem in dir(mod_class_mod):
-                    res = tc_const_re.match(elem)
-                    if res:
-                        tc_const_name = res.group(1)
-                        tc_const_value = getattr(mod_class_mod, elem)
-                        tup = (tc_const_name, tc_const_value, mod_class_mod.__name__, package.__name__)
-                        _log.debug("Found constant %s ('%s') in module %s, adding it to %s" % tup)
-                        if hasattr(package, tc_const_name):
-                            cur_value = getattr(package, tc_const_name)
-                            if not tc_const_value == cur_value:
-                                tup = (package.__name__, tc_const_name, cur_value, tc_const_value)
-                                _log.error("Constant %s.%s defined as '%s', can't set it to '%s'." % tup)
-                        else:
-                            setattr(package, tc_const_name, tc_const_value)
+        for tc_const_name, tc_const_value in sorted(registry['constants'].items()):
+            _log.debug("Adding constant %s ('%s') to %s" % (tc_const_name, tc_const_value, package.__name__))
+            if hasattr(package, tc_const_name):
+                cur_value = getattr(package, tc_const_name)
+                if not tc_const_value == cur_value:
+                    tup = (package.__name__, tc_const_name, cur_value, tc_const_value)
+                    _log.error("Constant %s.%s defined as '%s', can't set it to '%s'." % tup)
+            else:
+                setattr(package, tc_const_name, tc_const_value)
 
         # indicate that processing of toolchain constants is done, so it's not done again
         setattr(package, check_attr_name, True)
     else:
-        _log.debug("Skipping importing of toolchain modules, processing of toolchain constants is already done.")
+        _log.debug("Skipping processing of toolchain constants, it is already done.")
+
+    if name in registry['toolchains']:
+        # only import the module that provides the requested toolchain
+        modpaths = [registry['toolchains'][name][0]]
+    else:
+        # import all available toolchains, so we know about them
+        modpaths = nub(sorted([modpath for (modpath, _) in registry['toolchains'].values()]))
+
+    for modpath in modpaths:
+        _log.debug("Importing toolchain module %s" % modpath)
+        __import__(modpath, globals(), locals(), [''])
 
     # obtain all subclasses of toolchain
     found_tcs = nub(get_subclasses(Toolchain))
@@ -121,7 +181,7 @@ def get_toolchain(tc, tcopts, mns):
         tc_inst = copy.deepcopy(_initial_toolchain_instances[key])
         _log.debug("Obtained cached toolchain instance for %s: %s" % (key, tc_inst.as_dict()))
     else:
-        tc_class, all_tcs = search_toolchain(tc['name'])
+        tc_class, all_tcs = search_toolchain(tc['name'], cachedir=build_option('cachedir'))
         if not tc_class:
             all_tcs_names = ",".join([x.NAME for x in all_tcs])
             _log.error("Toolchain %s not found, available toolchains: %s" % (tc['name'], all_tcs_names))
@@ -28,11 +28,13 @@ Module with various utility functions
 @author: Kenneth Hoste (Ghent University)
 """
 import glob
+import imp
 import os
 import string
 import sys
 from vsc.utils import fancylogger
 import easybuild.tools.environment as env
+from easybuild.tools.ordereddict import OrderedDict
 
 _log = fancylogger.getLogger('tools.utilities')
 
@@ -101,3 +103,100 @@ def import_available_modules(namespace):
                 _log.debug("importing module %s" % modpath)
                 modules.append(__import__(modpath, globals(), locals(), ['']))
     return modules
+
+
+def package_paths_stamp(package, files=False):
+    """
+    Return tuple of (path, modification time) tuples for the directories of the specified Python package,
+    or None if the package can not be imported or if any of its directories can not be inspected
+    (e.g., a zipped egg); modules in the package itself are not imported.
+    This can be used to determine whether the list of modules available in a package may have changed.
+
+    @param package: The package to consider (e.g., 'easybuild.easyblocks').
+    @param files: also include (path, modification time) tuples for the modules in the package,
+                  to determine whether any of them may have changed
+    """
+    try:
+        __import__(package, globals(), locals(), [''])
+    except ImportError, err:
+        _log.debug("Failed to import package %s: %s" % (package, err))
+        return None
+
+    stamp = []
+    for path in getattr(sys.modules[package], '__path__', []):
+        try:
+            stamp.append((path, os.stat(path).st_mtime))
+            if files:
+                for fn in sorted(os.listdir(path)):
+                    if fn.endswith('.py'):
+                        filepath = os.path.join(path, fn)
+                        stamp.append((filepath, os.stat(filepath).st_mtime))
+        except OSError, err:
+            _log.debug("Failed to inspect path %s for package %s: %s" % (path, package, err))
+            return None
+    return tuple(stamp)
+
+
+def avail_modules_in_package(package):
+    """
+    Return set of names of modules (and subpackages) available in the specified Python package,
+    determined by scanning the directories of the package, i.e. *without* importing any of the modules.
+    Returns None if the available modules can not be determined, e.g. if the package can not be imported
+    or if any of its directories can not be inspected.
+
+    @param package: The package to scan for available modules (e.g., 'easybuild.easyblocks').
+    """
+    stamp = package_paths_stamp(package)
+    if stamp is None:
+        return None
+
+    suffixes = [suffix for (suffix, _, _) in imp.get_suffixes()]
+    mod_names = set()
+    for (path, _) in stamp:
+        try:
+            fns = os.listdir(path)
+        except OSError, err:
+            _log.debug("Failed to list contents of path %s for package %s: %s" % (path, package, err))
+            return None
+        for fn in fns:
+            if os.path.isdir(os.path.join(path, fn)):
+                if os.path.exists(os.path.join(path, fn, '__init__.py')):
+                    mod_names.add(fn)
+            else:
+                for suffix in suffixes:
+                    if fn.endswith(suffix):
+                        mod_names.add(fn[:-len(suffix)])
+                        break
+
+    mod_names.discard('__init__')
+    _log.debug("Modules available in package %s: %s" % (package, sorted(mod_names)))
+    return mod_names
+
+
+class LRUCache(OrderedDict):
+    """Dictionary that only retains the specified number of most recently used entries."""
+
+    def __init__(self, maxsize):
+        """
+        Create empty cache.
+        @param maxsize: maximum number of entries to retain
+        """
+        OrderedDict.__init__(self)
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        """Return value for specified key (and mark it as most recently used), or default if it's not cached."""
+        if key in self:
+            value = OrderedDict.pop(self, key)
+            OrderedDict.__setitem__(self, key, value)
+            return value
+        else:
+            return default
+
+    def __setitem__(self, key, value):
+        """Add entry for specified key, and evict least recently used entries if the cache is full."""
+        if key in self:
+            del self[key]
+        OrderedDict.__setitem__(self, key, value)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
@@ -0,0 +1,186 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Generator for synthetic easyconfig repositories, to benchmark the framework with.
+
+The generated repository contains a toolchain hierarchy (GCC, OpenMPI built with GCC, and the gompi toolchain
+composed from both), and the requested number of packages, which are spread evenly over the selected levels of the
+toolchain hierarchy: the first packages use the dummy toolchain, the last ones use the gompi toolchain.
+Dependencies are picked randomly (but reproducibly, for a given seed) among the preceding packages
+installed with the same toolchain or a subtoolchain, so the dependency graph is guaranteed to be acyclic.
+"""
+import os
+import random
+
+
+# toolchain hierarchy, from bottom to top
+TOOLCHAIN_HIERARCHY = [
+    ('dummy', 'dummy'),
+    ('GCC', '4.8.2'),
+    ('gompi', '1.5.14'),
+]
+
+# easyconfigs that provide the toolchain hierarchy
+TOOLCHAIN_EASYCONFIGS = {
+    'GCC-4.8.2.eb': {
+        'name': 'GCC',
+        'version': '4.8.2',
+        'toolchain': ('dummy', 'dummy'),
+        'moduleclass': 'compiler',
+        'dependencies': [],
+    },
+    'OpenMPI-1.7.3-GCC-4.8.2.eb': {
+        'name': 'OpenMPI',
+        'version': '1.7.3',
+        'toolchain': ('GCC', '4.8.2'),
+        'moduleclass': 'mpi',
+        'dependencies': [],
+    },
+    'gompi-1.5.14.eb': {
+        'name': 'gompi',
+        'version': '1.5.14',
+        'toolchain': ('dummy', 'dummy'),
+        'moduleclass': 'toolchain',
+        'dependencies': ["('GCC', '4.8.2')", "('OpenMPI', '1.7.3', '', ('GCC', '4.8.2'))"],
+    },
+}
+
+EASYCONFIG_TEMPLATE = """easyblock = '%(easyblock)s'
+
+name = '%(name)s'
+version = '%(version)s'
+
+homepage = 'http://example.com/%(name)s'
+description = \"\"\"Synthetic %(name)s package, generated for benchmarking purposes.\"\"\"
+
+toolchain = {'name': '%(tc_name)s', 'version': '%(tc_version)s'}
+
+source_urls = ['http://example.com/%(name)s/download']
+sources = [SOURCELOWER_TAR_GZ]
+
+dependencies = [%(dependencies)s]
+
+moduleclass = '%(moduleclass)s'
+"""
+
+PKG_VERSION = '1.0'
+
+# use the generic easyblock provided by the framework itself, so no easyblocks need to be available
+EASYBLOCK = 'easybuild.framework.easyblock.EasyBlock'
+
+
+def easyconfig_txt(name, version, toolchain, dependencies, moduleclass='tools'):
+    """Return contents of easyconfig file with specified name, version, toolchain and (formatted) dependencies."""
+    return EASYCONFIG_TEMPLATE % {
+        'easyblock': EASYBLOCK,
+        'name': name,
+        'version': version,
+        'tc_name': toolchain[0],
+        'tc_version': toolchain[1],
+        'dependencies': ''.join(['\n    %s,' % dep for dep in dependencies]) + (dependencies and '\n' or ''),
+        'moduleclass': moduleclass,
+    }
+
+
+def package_name(idx):
+    """Return name for synthetic package with specified index."""
+    return 'pkg%05d' % idx
+
+
+def package_easyconfig_filename(idx, toolchain):
+    """Return name of easyconfig file for synthetic package with specified index and toolchain."""
+    if toolchain[0] == 'dummy':
+        return '%s-%s.eb' % (package_name(idx), PKG_VERSION)
+    else:
+        return '%s-%s-%s-%s.eb' % (package_name(idx), PKG_VERSION, toolchain[0], toolchain[1])
+
+
+def dependency_spec(idx, level, dep_idx, dep_level):
+    """Return specification of dependency for package at specified toolchain level (as a string)."""
+    if dep_level == level:
+        # dependency is installed with same toolchain, so it inherits the toolchain
+        return "('%s', '%s')" % (package_name(dep_idx), PKG_VERSION)
+    elif dep_level == 0:
+        return "('%s', '%s', '', True)" % (package_name(dep_idx), PKG_VERSION)
+    else:
+        return "('%s', '%s', '', %s)" % (package_name(dep_idx), PKG_VERSION, TOOLCHAIN_HIERARCHY[dep_level])
+
+
+def write_easyconfig(path, txt):
+    """
+    Write easyconfig file with specified contents.
+    Plain file operations are used rather than filetools, so easyconfigs can be generated before configuration is set.
+    """
+    handle = open(path, 'w')
+    handle.write(txt)
+    handle.close()
+
+
+def generate_easyconfigs(target_dir, packages, fan_out=3, fan_in=10, toolchain_levels=3, seed=42):
+    """
+    Generate repository of synthetic easyconfigs in specified directory.
+
+    @param target_dir: directory to generate easyconfig files in (in a single flat directory)
+    @param packages: number of packages to generate easyconfig files for (toolchain easyconfigs not included)
+    @param fan_out: maximum number of dependencies per package (at least one, if there are any candidates)
+    @param fan_in: maximum number of packages that can depend on a single package
+    @param toolchain_levels: number of levels in the toolchain hierarchy to spread packages over (1-3)
+    @param seed: seed for random number generator, to generate the same repository every time
+    @return: list of paths to easyconfig files for packages, ordered from bottom to top in the toolchain hierarchy
+    """
+    if toolchain_levels < 1 or toolchain_levels > len(TOOLCHAIN_HIERARCHY):
+        raise ValueError("Number of toolchain levels should be in range [1, %d]" % len(TOOLCHAIN_HIERARCHY))
+
+    if not os.path.exists(target_dir):
+        os.makedirs(target_dir)
+
+    for (fn, spec) in TOOLCHAIN_EASYCONFIGS.items():
+        txt = easyconfig_txt(spec['name'], spec['version'], spec['toolchain'], spec['dependencies'],
+                             moduleclass=spec['moduleclass'])
+        write_easyconfig(os.path.join(target_dir, fn), txt)
+
+    rnd = random.Random(seed)
+    # toolchain level for each package, and number of packages that depend on each package
+    levels = []
+    fan_in_cnts = []
+    paths = []
+    for idx in range(packages):
+        level = idx * toolchain_levels // packages
+        toolchain = TOOLCHAIN_HIERARCHY[level]
+
+        candidates = [i for i in range(idx) if levels[i] <= level and fan_in_cnts[i] < fan_in]
+        deps = sorted(rnd.sample(candidates, min(rnd.randint(1, fan_out), len(candidates))))
+        for dep_idx in deps:
+            fan_in_cnts[dep_idx] += 1
+
+        dep_specs = [dependency_spec(idx, level, dep_idx, levels[dep_idx]) for dep_idx in deps]
+        path = os.path.join(target_dir, package_easyconfig_filename(idx, toolchain))
+        write_easyconfig(path, easyconfig_txt(package_name(idx), PKG_VERSION, toolchain, dep_specs))
+        paths.append(path)
+
+        levels.append(level)
+        fan_in_cnts.append(0)
+
+    return paths
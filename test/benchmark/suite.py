@@ -0,0 +1,358 @@
+# #
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Micro-benchmark suite for the EasyBuild framework, using repositories of synthetic easyconfig files.
+
+Usage: "python -m test.benchmark.suite [options]", see --help for the available options.
+
+For each of the specified scales (number of packages), a synthetic easyconfig repository is generated
+(see test.benchmark.generator), and the time spent in the following operations is measured:
+ * process_easyconfig: parsing all easyconfig files in the repository
+ * resolve_dependencies: resolving the dependencies of all easyconfigs (using the robot)
+ * ActiveMNS[<scheme>]: determining the full module name of all dependencies, for each module naming scheme
+ * skip_available: checking which easyconfigs are already installed (module files are provided for half of them)
+ * tweak: tweaking the easyconfig for the package at the top of the hierarchy (and its dependencies)
+ * dep_graph: generating a dependency graph (in dot format) for all easyconfigs (requires pygraph)
+
+By default, the in-process VirtualModules modules tool is used (see --modules-tool), so no actual modules tool
+is required; an artificial latency for module commands can be specified via $VIRTUAL_MODULES_LATENCY.
+
+All caches are cleared before each repetition, so the results correspond to what a fresh 'eb' session experiences.
+The results can be written to a file in JSON format (--output), and compared with earlier results (--compare),
+e.g. to compare the performance of two commits.
+"""
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from vsc.utils import fancylogger
+from vsc.utils.generaloption import simple_option
+from vsc.utils.patterns import Singleton
+
+import easybuild.tools.module_naming_scheme.toolchain as mns_toolchain
+import easybuild.tools.toolchain.utilities as tc_utils
+from easybuild.framework.easyconfig import easyconfig
+from easybuild.framework.easyconfig.easyconfig import ActiveMNS, process_easyconfig
+from easybuild.framework.easyconfig.tools import dep_graph, graph_errors, skip_available
+from easybuild.framework.easyconfig.tweak import tweak
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools import config
+from easybuild.tools.config import module_classes, set_tmpdir
+from easybuild.tools.filetools import write_file
+from easybuild.tools.module_naming_scheme import GENERAL_CLASS
+from easybuild.tools.modules import MODULEFILE_MAGIC
+from easybuild.tools.options import CONFIG_ENV_VAR_PREFIX, EasyBuildOptions
+from easybuild.tools.robot import resolve_dependencies
+from easybuild.tools.version import FRAMEWORK_VERSION, get_git_revision
+from test.benchmark.generator import generate_easyconfigs
+
+
+BENCHMARKS = ['process_easyconfig', 'resolve_dependencies', 'ActiveMNS', 'skip_available', 'tweak', 'dep_graph']
+
+
+def init_bench_config(ecs_dir, installpath, naming_scheme, modules_tool):
+    """(Re)initialize configuration for benchmarks, after clearing all singletons and caches."""
+    Singleton._instances.clear()
+    tc_utils._initial_toolchain_instances.clear()
+    easyconfig._easyconfigs_cache.clear()
+    easyconfig._easyconfig_files_cache.clear()
+    easyconfig._avail_easyblock_modules_cache.clear()
+    easyconfig._easyblock_class_cache.clear()
+    easyconfig._escaped_template_strings_cache.clear()
+    mns_toolchain._toolchain_details_cache.clear()
+
+    # ignore configuration files, to make results comparable across systems
+    args = [
+        '--installpath=%s' % installpath,
+        '--module-naming-scheme=%s' % naming_scheme,
+        '--modules-tool=%s' % modules_tool,
+    ]
+    eb_go = EasyBuildOptions(envvar_prefix=CONFIG_ENV_VAR_PREFIX, go_args=args, go_useconfigfiles=False)
+    config.init(eb_go.options, eb_go.get_options_by_section('config'))
+
+    config.init_build_options(build_options={
+        'check_osdeps': False,
+        'robot_path': [ecs_dir],
+        'suffix_modules_path': GENERAL_CLASS,
+        'valid_module_classes': module_classes(),
+    })
+
+
+def parse_all(paths):
+    """Parse all specified easyconfig files."""
+    easyconfigs = []
+    for path in paths:
+        easyconfigs.extend(process_easyconfig(path))
+    return easyconfigs
+
+
+def det_module_names(easyconfigs):
+    """Determine full module name for dependencies of all specified easyconfigs, using active module naming scheme."""
+    for ec in easyconfigs:
+        for dep in ec['dependencies']:
+            ActiveMNS().det_full_module_name(dep)
+
+
+class BenchmarkContext(object):
+    """Context for running benchmarks on a synthetic easyconfig repository."""
+
+    def __init__(self, ecs_dir, paths, naming_scheme, modules_tool):
+        """Constructor: specify location of easyconfig repository, and paths to easyconfig files for packages."""
+        self.ecs_dir = ecs_dir
+        self.paths = paths
+        self.naming_scheme = naming_scheme
+        self.modules_tool = modules_tool
+        self.tmpdir = tempfile.mkdtemp(prefix='eb-benchmark-')
+        self.installpath = os.path.join(self.tmpdir, 'install')
+
+    def reset(self, naming_scheme=None):
+        """Reset configuration and caches."""
+        init_bench_config(self.ecs_dir, self.installpath, naming_scheme or self.naming_scheme, self.modules_tool)
+
+    def parsed(self):
+        """Return list of parsed easyconfigs, in a clean session."""
+        self.reset()
+        easyconfigs = parse_all(self.paths)
+        # start from a clean session again, so only the benchmarked operation itself benefits from caches
+        self.reset()
+        return easyconfigs
+
+    def bench_process_easyconfig(self):
+        """Set up benchmark for process_easyconfig."""
+        self.reset()
+        return (parse_all, (self.paths,))
+
+    def bench_resolve_dependencies(self):
+        """Set up benchmark for resolve_dependencies."""
+        return (resolve_dependencies, (self.parsed(),), {'retain_all_deps': True})
+
+    def bench_ActiveMNS(self, naming_scheme):
+        """Set up benchmark for determining module names with specified module naming scheme."""
+        self.reset(naming_scheme=naming_scheme)
+        easyconfigs = parse_all(self.paths)
+        self.reset(naming_scheme=naming_scheme)
+        # make sure active module naming scheme is initialized, this should not be included in the timing
+        ActiveMNS()
+        return (det_module_names, (easyconfigs,))
+
+    def bench_skip_available(self):
+        """Set up benchmark for skip_available, providing module files for half of the easyconfigs."""
+        easyconfigs = self.parsed()
+        mod_path = os.path.join(self.installpath, 'modules', GENERAL_CLASS)
+        for ec in easyconfigs[::2]:
+            modfile = os.path.join(mod_path, ec['full_mod_name'])
+            if not os.path.exists(modfile):
+                write_file(modfile, MODULEFILE_MAGIC + '\n')
+        return (skip_available, (easyconfigs,))
+
+    def bench_tweak(self):
+        """Set up benchmark for tweak."""
+        targetdir = os.path.join(self.tmpdir, 'tweaked')
+        if os.path.exists(targetdir):
+            shutil.rmtree(targetdir)
+        self.reset()
+        easyconfigs = process_easyconfig(self.paths[-1])
+        return (tweak, (easyconfigs, {'versionsuffix': '-tweaked'}), {'targetdir': targetdir})
+
+    def bench_dep_graph(self):
+        """Set up benchmark for dep_graph."""
+        ordered_ecs = resolve_dependencies(self.parsed(), retain_all_deps=True)
+        return (dep_graph, (os.path.join(self.tmpdir, 'dep-graph.dot'), ordered_ecs), {'silent': True})
+
+    def cleanup(self):
+        """Clean up temporary directory."""
+        shutil.rmtree(self.tmpdir)
+
+
+def run_benchmark(setup, repeat):
+    """
+    Run benchmark for specified number of times, and return list of timings (in seconds).
+    @param setup: function that sets up the benchmark (not timed), and returns a tuple with function and arguments
+    """
+    times = []
+    for _ in range(repeat):
+        bench = setup()
+        func, args, kwargs = (bench + ({},))[:3]
+        start = time.time()
+        func(*args, **kwargs)
+        times.append(time.time() - start)
+    return times
+
+
+def run_benchmarks(scale, opts, workdir):
+    """Run all selected benchmarks for synthetic easyconfig repository of specified scale."""
+    ecs_dir = os.path.join(workdir, 'easyconfigs-%d' % scale)
+    paths = generate_easyconfigs(ecs_dir, scale, fan_out=opts.fan_out, fan_in=opts.fan_in,
+                                 toolchain_levels=opts.toolchain_levels, seed=opts.seed)
+    ctx = BenchmarkContext(ecs_dir, paths, opts.naming_schemes[0], opts.modules_tool)
+
+    benchmarks = []
+    for name in opts.benchmarks:
+        if name == 'ActiveMNS':
+            for naming_scheme in opts.naming_schemes:
+                setup = lambda naming_scheme=naming_scheme: ctx.bench_ActiveMNS(naming_scheme)
+                benchmarks.append(('ActiveMNS[%s]' % naming_scheme, setup))
+        else:
+            benchmarks.append((name, getattr(ctx, 'bench_%s' % name)))
+
+    results = []
+    for (name, setup) in benchmarks:
+        res = {
+            'benchmark': name,
+            'scale': scale,
+        }
+        # dep_graph requires pygraph, which is an optional dependency
+        if name == 'dep_graph' and graph_errors:
+            res['skipped'] = graph_errors[0]
+        else:
+            times = run_benchmark(setup, opts.repeat)
+            res.update({
+                'times': times,
+                'min': min(times),
+                'mean': sum(times) / len(times),
+            })
+        results.append(res)
+        print_result(res, stream=progress_stream(opts))
+
+    ctx.cleanup()
+
+    return results
+
+
+def progress_stream(opts):
+    """Return stream to print human-readable output to: stderr if results are written to stdout in JSON format."""
+    if opts.output == '-':
+        return sys.stderr
+    else:
+        return sys.stdout
+
+
+def print_result(res, stream=None):
+    """Print result for a single benchmark to specified stream (default: stdout)."""
+    if stream is None:
+        stream = sys.stdout
+    if 'skipped' in res:
+        print >> stream, "%-32s %8d  SKIPPED (%s)" % (res['benchmark'], res['scale'], res['skipped'])
+    else:
+        tup = (res['benchmark'], res['scale'], res['min'], res['mean'])
+        print >> stream, "%-32s %8d  min: %8.4fs  mean: %8.4fs" % tup
+    stream.flush()
+
+
+def compare_results(old_results, new_results, stream=None):
+    """Print comparison of minimal timings for specified (old and new) benchmark results to specified stream."""
+    if stream is None:
+        stream = sys.stdout
+    old_mins = dict([((res['benchmark'], res['scale']), res['min']) for res in old_results if 'min' in res])
+    print >> stream, "%-32s %8s  %10s  %10s  %7s" % ('benchmark', 'scale', 'old (min)', 'new (min)', 'ratio')
+    for res in new_results:
+        key = (res['benchmark'], res['scale'])
+        if key in old_mins and 'min' in res:
+            ratio = res['min'] / max(old_mins[key], 1e-9)
+            tup = (key[0], key[1], old_mins[key], res['min'], ratio)
+            print >> stream, "%-32s %8d  %9.4fs  %9.4fs  %6.2fx" % tup
+
+
+def main():
+    """Run the benchmark suite."""
+    options = {
+        'benchmarks': ("Benchmarks to run", 'strlist', 'store', BENCHMARKS),
+        'compare': ("Compare results with those in specified JSON file (obtained via --output)",
+                    None, 'store', None),
+        'fan-in': ("Maximum number of packages that can depend on a single package", 'int', 'store', 10),
+        'fan-out': ("Maximum number of dependencies per package", 'int', 'store', 3),
+        'modules-tool': ("Modules tool to use", None, 'store', 'VirtualModules'),
+        'naming-schemes': ("Module naming schemes to benchmark ActiveMNS with", 'strlist', 'store',
+                           ['EasyBuildMNS', 'HierarchicalMNS']),
+        'output': ("Write results in JSON format to specified file ('-' for stdout)", None, 'store', None, 'o'),
+        'repeat': ("Number of times to repeat each benchmark", 'int', 'store', 3, 'r'),
+        'scales': ("Number of packages in synthetic easyconfig repositories", 'strlist', 'store',
+                   ['100', '300', '1000'], 's'),
+        'seed': ("Seed for generating synthetic easyconfig repositories", 'int', 'store', 42),
+        'toolchain-levels': ("Number of levels in the toolchain hierarchy to spread packages over (1-3)",
+                             'int', 'store', 3),
+    }
+    go = simple_option(options)
+    opts = go.options
+
+    unknown = [name for name in opts.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        go.log.error("Unknown benchmarks %s, known benchmarks are: %s" % (unknown, ', '.join(BENCHMARKS)))
+
+    # disable logging, to avoid that it dominates the timings
+    fancylogger.disableDefaultHandlers()
+    fancylogger.setLogLevelError()
+
+    try:
+        set_tmpdir(raise_error=True)
+    except EasyBuildError, err:
+        sys.stderr.write("No execution rights on temporary files, specify another location via $TMPDIR: %s\n" % err)
+        sys.exit(1)
+
+    workdir = tempfile.mkdtemp(prefix='eb-benchmark-ecs-')
+    results = []
+    for scale in [int(x) for x in opts.scales]:
+        results.extend(run_benchmarks(scale, opts, workdir))
+    shutil.rmtree(workdir)
+
+    data = {
+        'framework_version': str(FRAMEWORK_VERSION),
+        'git_revision': get_git_revision(),
+        'hostname': socket.gethostname(),
+        'python': sys.version.split()[0],
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'parameters': {
+            'fan_in': opts.fan_in,
+            'fan_out': opts.fan_out,
+            'modules_tool': opts.modules_tool,
+            'repeat': opts.repeat,
+            'seed': opts.seed,
+            'toolchain_levels': opts.toolchain_levels,
+        },
+        'results': results,
+    }
+    if opts.output == '-':
+        print json.dumps(data, indent=1, sort_keys=True)
+    elif opts.output:
+        handle = open(opts.output, 'w')
+        handle.write(json.dumps(data, indent=1, sort_keys=True))
+        handle.close()
+        print "Results written to %s" % opts.output
+
+    if opts.compare:
+        handle = open(opts.compare, 'r')
+        old_data = json.load(handle)
+        handle.close()
+        stream = progress_stream(opts)
+        tup = (opts.compare, old_data['framework_version'])
+        print >> stream, "\nComparison with results in %s (framework version: %s)" % tup
+        compare_results(old_data['results'], results, stream=stream)
+
+
+if __name__ == '__main__':
+    main()
@@ -28,7 +28,9 @@ Unit tests for asyncprocess.py.
 @author: Toon Willems (Ghent University)
 """
 
+import errno
 import os
+import select
 import time
 from test.framework.utilities import EnhancedTestCase
 from unittest import TestSuite, main
@@ -60,13 +62,47 @@ class AsyncProcessTest(EnhancedTestCase):
         self.assertEqual("", p.recv_some(self.shell, e=0))
         self.assertRaises(Exception, p.recv_some, self.shell)
 
+    def test_select_eintr(self):
+        """Test whether select calls that are interrupted by a signal are retried."""
+        calls = []
+        orig_select = select.select
+
+        def interrupted_select(*args):
+            """Wrapper for select.select that fails with EINTR on the first call."""
+            calls.append(args)
+            if len(calls) == 1:
+                raise select.error(errno.EINTR, "Interrupted system call")
+            return orig_select(*args)
+
+        select.select = interrupted_select
+        try:
+            p.send_all(self.shell, "echo hello\n")
+            time.sleep(0.1)
+            self.assertEqual(p.recv_some(self.shell), "hello\n")
+        finally:
+            select.select = orig_select
+        self.assertTrue(len(calls) > 1)
+
+        # other errors are still raised
+        def failing_select(*args):
+            """Replacement for select.select that fails with EBADF."""
+            raise select.error(errno.EBADF, "Bad file descriptor")
+
+        select.select = failing_select
+        try:
+            self.assertRaises(select.error, p.recv_some, self.shell)
+        finally:
+            select.select = orig_select
+
+        p.send_all(self.shell, "exit\n")
+
     def tearDown(self):
         """cleanup"""
         super(AsyncProcessTest, self).tearDown()
 
 def suite():
     """ returns all the testcases in this module """
-    return TestSuite([AsyncProcessTest()])
+    return TestSuite([AsyncProcessTest(), AsyncProcessTest('test_select_eintr')])
 
 if __name__ == '__main__':
     main()
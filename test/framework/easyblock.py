@@ -28,6 +28,7 @@ Unit tests for easyblock.py
 @author: Jens Timmerman (Ghent University)
 @author: Kenneth Hoste (Ghent University)
 """
+import json
 import os
 import re
 import shutil
@@ -45,6 +46,7 @@ from easybuild.tools import config
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.filetools import mkdir, read_file, write_file
 from easybuild.tools.modules import modules_tool
+from easybuild.tools.timing import CMD, STEP, SUBSTEP
 
 
 class EasyBlockTest(EnhancedTestCase):
@@ -588,6 +590,52 @@ class EasyBlockTest(EnhancedTestCase):
         eb.extract_step()
         eb.patch_step()
 
+    def test_step_timings(self):
+        """Test keeping track of time spent in (sub)steps."""
+        ec = process_easyconfig(os.path.join(os.path.abspath(os.path.dirname(__file__)), 'easyconfigs', 'toy-0.0.eb'))[0]
+        eb = EasyBlock(ec['ec'])
+        eb.run_step('source', [lambda x: x.fetch_step(), lambda x: x.extract_step()])
+        eb.run_step('patch', [lambda x: x.patch_step()])
+
+        step_totals = eb.timings.totals(STEP)
+        self.assertEqual([name for (name, _, _) in step_totals], ['source', 'patch'])
+        for (_, wall, cpu) in step_totals:
+            self.assertTrue(wall >= 0.0 and cpu >= 0.0)
+        substeps = [name for (name, _, _) in eb.timings.totals(SUBSTEP)]
+        self.assertEqual(substeps, ['fetch_step', 'extract_step', 'patch_step'])
+
+        # time spent is also tracked for a step that fails
+        failing_substep = lambda x: x.log.error("configure failed")
+        self.assertErrorRegex(EasyBuildError, "configure failed", eb.run_step, 'configure', [failing_substep])
+        self.assertEqual(eb.timings.totals(STEP)[-1][0], 'configure')
+
+        # trace in Chrome trace event format, with substeps nested in steps
+        trace_path = os.path.join(self.test_prefix, 'trace.json')
+        eb.timings.write_chrome_trace(trace_path)
+        trace_events = json.loads(read_file(trace_path))['traceEvents']
+        step_events = [(ev['cat'], ev['name']) for ev in trace_events if ev['cat'] != CMD]
+        self.assertEqual(step_events[:3], [(STEP, 'source'), (SUBSTEP, 'fetch_step'), (SUBSTEP, 'extract_step')])
+        for event in trace_events:
+            self.assertEqual(event['ph'], 'X')
+            if event['cat'] != CMD:
+                self.assertTrue('cpu_time' in event['args'])
+
+        # commands run during a step (e.g. to unpack sources) are included, along with their resource usage
+        cmd_events = [event for event in trace_events if event['cat'] == CMD and event['name'].startswith('tar ')]
+        self.assertEqual(len(cmd_events), 1)
+        self.assertEqual(cmd_events[0]['args']['step'], 'source')
+        for key in ['wall', 'utime', 'stime', 'maxrss', 'inblock', 'oublock']:
+            self.assertTrue(key in cmd_events[0]['args'])
+        source_cmds = len([ev for ev in trace_events if ev['cat'] == CMD and ev['args']['step'] == 'source'])
+        self.assertEqual(trace_events[0]['args']['cmds']['cmds'], source_cmds)
+        cmd_usage = eb.timings.cmd_usage_per_step()
+        self.assertEqual(cmd_usage[0][0], 'source')
+        self.assertEqual(cmd_usage[0][1]['cmds'], source_cmds)
+        self.assertTrue(trace_events[0]['ts'] <= trace_events[1]['ts'])
+        # allow for rounding to microseconds
+        step_end = trace_events[0]['ts'] + trace_events[0]['dur']
+        self.assertTrue(trace_events[1]['ts'] + trace_events[1]['dur'] <= step_end + 1)
+
     def tearDown(self):
         """ make sure to remove the temporary file """
         super(EasyBlockTest, self).tearDown()
@@ -30,9 +30,11 @@ Unit tests for easyconfig.py
 @author: Stijn De Weirdt (Ghent University)
 """
 import copy
+import glob
 import os
 import re
 import shutil
+import sys
 import tempfile
 from distutils.version import LooseVersion
 from test.framework.utilities import EnhancedTestCase, init_config
@@ -714,6 +716,75 @@ class EasyConfigTest(EnhancedTestCase):
         eb['description'] = "test easyconfig % %% %s% %%% %(name)s %%(name)s %%%(name)s %%%%(name)s"
         self.assertEqual(eb['description'], "test easyconfig % %% %s% %%% PI %(name)s %PI %%(name)s")
 
+    def test_template_values_incremental(self):
+        """Test (lazy) generation of template values, and updating them when easyconfig parameters are changed."""
+        self.contents = '\n'.join([
+            'easyblock = "ConfigureMake"',
+            'name = "PI"',
+            'version = "3.14"',
+            'homepage = "http://example.com"',
+            'description = "%(namelower)s v%(version_major)s with %(toolchain_name)s"',
+            'toolchain = {"name": "GCC", "version": "4.6.3"}',
+            'sources = [SOURCELOWER_TAR_GZ]',
+        ])
+        self.prep()
+        eb = EasyConfig(self.eb_file, validate=False)
+
+        self.assertEqual(eb['homepage'], 'http://example.com')
+        self.assertEqual(eb['description'], "pi v3 with GCC")
+        self.assertEqual(eb['sources'], ['pi-3.14.tar.gz'])
+
+        # same template values as obtained via template_constant_dict
+        cfg = copy.deepcopy(eb._config)
+        tmpl_values = easyconfig.templates.template_constant_dict(cfg, skip_lower=True)
+        tmpl_values.update(easyconfig.templates.template_constant_dict(cfg, skip_lower=False))
+        self.assertEqual(eb.template_values, dict([(k, v) for (k, v) in tmpl_values.items() if v is not None]))
+
+        # template values set from outside are retained
+        eb.template_values['installdir'] = '/path/to/install'
+        eb['configopts'] = "--prefix=%(installdir)s"
+        self.assertEqual(eb['configopts'], "--prefix=/path/to/install")
+
+        # only template values derived from a changed parameter are updated
+        eb['version'] = '4'
+        self.assertEqual(eb['description'], "pi v4 with GCC")
+        self.assertEqual(eb['sources'], ['pi-4.tar.gz'])
+        self.assertFalse('version_minor' in eb.template_values)
+        self.assertEqual(eb.template_values['toolchain_version'], '4.6.3')
+        self.assertEqual(eb.template_values['installdir'], '/path/to/install')
+
+        eb['name'] = 'Foo'
+        eb['toolchain'] = {'name': 'ictce', 'version': '4.1.13'}
+        self.assertEqual(eb['description'], "foo v4 with ictce")
+        self.assertEqual(eb.template_values['nameletterlower'], 'f')
+
+        # changes made in place (with templating disabled) are picked up too
+        eb.enable_templating = False
+        eb['toolchain']['name'] = 'goolf'
+        eb.enable_templating = True
+        self.assertEqual(eb['description'], "foo v4 with goolf")
+
+        # values with templating enabled are still copies
+        eb['sources'].append('bar.tar.gz')
+        self.assertEqual(eb['sources'], ['foo-4.tar.gz'])
+
+        # reparsing the easyconfig file starts from a clean slate w.r.t. template values
+        eb.parse()
+        self.assertFalse('installdir' in eb.template_values)
+        self.assertEqual(eb['description'], "pi v3 with GCC")
+        self.assertEqual(eb.template_values['toolchain_name'], 'GCC')
+
+        # escaped string values are only cached for the most recently used values
+        escaped_cache = easyconfig.easyconfig._escaped_template_strings_cache
+        orig_maxsize = escaped_cache.maxsize
+        escaped_cache.maxsize = 2
+        try:
+            for idx in range(5):
+                self.assertEqual(easyconfig.easyconfig.resolve_template("%d%%" % idx, {}), "%d%%" % idx)
+            self.assertEqual(escaped_cache.keys(), ['3%', '4%'])
+        finally:
+            escaped_cache.maxsize = orig_maxsize
+
     def test_templating_doc(self):
         """test templating documentation"""
         doc = easyconfig.templates.template_documentation()
@@ -892,6 +963,65 @@ class EasyConfigTest(EnhancedTestCase):
         self.assertErrorRegex(EasyBuildError, "Failed to import EB_TOY", get_easyblock_class, None, name='TOY')
         self.assertEqual(get_easyblock_class(None, name='TOY', error_on_failed_import=False), None)
 
+    def test_get_easyblock_class_cache(self):
+        """Test caching of easyblock classes in get_easyblock_class."""
+        from easybuild.easyblocks.toy import EB_toy
+        import easybuild.easyblocks
+        import easybuild.framework.easyconfig.easyconfig as ecec
+
+        stamp, (generic_mods, mods) = ecec.avail_easyblock_modules()
+        self.assertTrue('configuremake' in generic_mods)
+        self.assertTrue('toy' in mods)
+        self.assertFalse('gzip' in mods)
+        self.assertFalse('__init__' in mods)
+
+        # both positive and negative results are cached
+        self.assertEqual(get_easyblock_class(None, name='toy'), EB_toy)
+        self.assertEqual(get_easyblock_class(None, name='foobar', default_fallback=False), None)
+        self.assertEqual(ecec._easyblock_class_cache[(None, 'toy', True, True, stamp)], EB_toy)
+        self.assertEqual(ecec._easyblock_class_cache[(None, 'foobar', False, True, stamp)], None)
+        self.assertEqual(get_easyblock_class(None, name='foobar', default_fallback=False), None)
+
+        # failures are not cached
+        self.assertErrorRegex(EasyBuildError, "Failed to import EB_TOY", get_easyblock_class, None, name='TOY')
+        self.assertFalse((None, 'TOY', True, True, stamp) in ecec._easyblock_class_cache)
+
+        # easyblocks that are added are picked up
+        easyblocks_dir = easybuild.easyblocks.__path__[0]
+        foobar_easyblock = os.path.join(easyblocks_dir, 'foobar.py')
+        orig_mtime = os.stat(easyblocks_dir).st_mtime
+        try:
+            write_file(foobar_easyblock, "from easybuild.easyblocks.toy import EB_toy\nclass EB_foobar(EB_toy):\n    pass\n")
+            # make sure modification time of easyblocks directory changes
+            os.utime(easyblocks_dir, (orig_mtime + 2, orig_mtime + 2))
+            cls = get_easyblock_class(None, name='foobar', default_fallback=False)
+            self.assertEqual(cls.__name__, 'EB_foobar')
+            self.assertTrue('foobar' in ecec.avail_easyblock_modules()[1][1])
+        finally:
+            for path in glob.glob(foobar_easyblock + '*'):
+                os.remove(path)
+            if 'easybuild.easyblocks.foobar' in sys.modules:
+                del sys.modules['easybuild.easyblocks.foobar']
+
+        # available easyblocks are unknown if a package directory can not be inspected (e.g., a zipped egg),
+        # so importing easyblocks is still attempted
+        zipped_egg = os.path.join(self.test_prefix, 'easybuild_easyblocks.egg', 'easybuild', 'easyblocks')
+        easybuild.easyblocks.__path__.append(zipped_egg)
+        try:
+            self.assertEqual(ecec.avail_easyblock_modules()[1][1], None)
+            self.assertEqual(get_easyblock_class(None, name='toy'), EB_toy)
+
+            # directories that can be stat'ed but not listed are handled too
+            os.makedirs(zipped_egg)
+            os.chmod(zipped_egg, 0)
+            if not os.access(zipped_egg, os.R_OK):
+                self.assertEqual(ecec.avail_easyblock_modules()[1][1], None)
+                self.assertEqual(get_easyblock_class(None, name='toy', default_fallback=False), EB_toy)
+        finally:
+            easybuild.easyblocks.__path__.remove(zipped_egg)
+            if os.path.exists(zipped_egg):
+                os.chmod(zipped_egg, 0755)
+
     def test_easyconfig_paths(self):
         """Test create_paths function."""
         cand_paths = create_paths("/some/path", "Foo", "1.2.3")
@@ -27,12 +27,14 @@ Unit tests for easyconfig/parser.py
 
 @author: Stijn De Weirdt (Ghent University)
 """
+import glob
 import os
-from test.framework.utilities import EnhancedTestCase
+from test.framework.utilities import EnhancedTestCase, init_config
 from unittest import TestLoader, main
 from vsc.utils.fancylogger import setLogLevelDebug, logToScreen
 
 import easybuild.tools.build_log
+import easybuild.framework.easyconfig.format.pyheaderconfigobj as pyheaderconfigobj
 from easybuild.framework.easyconfig.format.format import Dependency
 from easybuild.framework.easyconfig.format.version import EasyVersion
 from easybuild.framework.easyconfig.parser import EasyConfigParser
@@ -170,6 +172,55 @@ class EasyConfigParserTest(EnhancedTestCase):
 
         self.assertErrorRegex(EasyBuildError, "Neither filename nor rawcontent provided", EasyConfigParser)
 
+    def test_pyheader_cache(self):
+        """Test caching of compiled pyheader code objects."""
+        cachedir = os.path.join(self.test_prefix, 'cache')
+        init_config(build_options={'cachedir': cachedir})
+
+        ec_file = os.path.join(TESTDIRBASE, 'v1.0', 'gzip-1.5-goolf-1.4.10.eb')
+        ec = EasyConfigParser(ec_file).get_config_dict()
+        self.assertEqual(ec['name'], 'gzip')
+
+        # compiled pyheader is stored in cache dir as marshalled code object
+        cache_fps = glob.glob(os.path.join(cachedir, 'pyheader', '*', '*.marshal'))
+        self.assertEqual(len(cache_fps), 1)
+
+        # compiled pyheader is picked up from cache dir if it's not cached in memory
+        pyheaderconfigobj._pyheader_code_cache.clear()
+        ec = EasyConfigParser(ec_file).get_config_dict()
+        self.assertEqual(ec['name'], 'gzip')
+        self.assertEqual(ec['toolchain'], {'name': 'goolf', 'version': '1.4.10'})
+        self.assertEqual(len(pyheaderconfigobj._pyheader_code_cache), 1)
+
+        # corrupt cache files are ignored
+        open(cache_fps[0], 'w').write('this is not a marshalled code object')
+        pyheaderconfigobj._pyheader_code_cache.clear()
+        ec = EasyConfigParser(ec_file).get_config_dict()
+        self.assertEqual(ec['version'], '1.5')
+
+        # only the most recently used compiled pyheaders are retained in memory
+        code_cache = pyheaderconfigobj._pyheader_code_cache
+        orig_maxsize = code_cache.maxsize
+        code_cache.maxsize = 2
+        try:
+            code1 = pyheaderconfigobj.compile_pyheader("x = 1")
+            pyheaderconfigobj.compile_pyheader("x = 2")
+            self.assertTrue(pyheaderconfigobj.compile_pyheader("x = 1") is code1)
+            pyheaderconfigobj.compile_pyheader("x = 3")
+            self.assertEqual(len(code_cache), 2)
+            self.assertTrue(pyheaderconfigobj.compile_pyheader("x = 1") is code1)
+        finally:
+            code_cache.maxsize = orig_maxsize
+
+        # global environment to exec pyheaders in is constructed only once, and copied on every use
+        env1 = pyheaderconfigobj.pyheader_globals(allowed_builtins=['len'])
+        env1['foo'] = 'bar'
+        env2 = pyheaderconfigobj.pyheader_globals(allowed_builtins=['len'])
+        self.assertFalse('foo' in env2)
+        self.assertEqual(env2['__builtins__'].keys(), ['len'])
+        self.assertTrue('SHLIB_EXT' in env2)
+
+
 def suite():
     """ returns all the testcases in this module """
     return TestLoader().loadTestsFromTestCase(EasyConfigParserTest)
@@ -0,0 +1,98 @@
+##
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for the stream of structured events on the progress of an EasyBuild session.
+"""
+import json
+import os
+from test.framework.utilities import EnhancedTestCase
+from unittest import TestLoader, main
+
+from easybuild.tools.events import BUILD_START, SESSION_END, SESSION_START
+from easybuild.tools.events import add_event_listener, disable_events_file, emit_event, enable_events_file
+from easybuild.tools.events import remove_event_listener
+from easybuild.tools.filetools import read_file
+
+
+class EventsTest(EnhancedTestCase):
+    """Tests for the stream of structured events on the progress of an EasyBuild session."""
+
+    def tearDown(self):
+        """Stop writing events, also when a test failed."""
+        disable_events_file()
+        super(EventsTest, self).tearDown()
+
+    def test_events_file(self):
+        """Test writing events to an events file."""
+        # no-op if events file is not enabled
+        emit_event(SESSION_START, version='1.0')
+
+        events_file = os.path.join(self.test_prefix, 'events', 'events.jsonl')
+        enable_events_file(events_file)
+        emit_event(SESSION_START, version='1.0', command_line='eb foo.eb')
+        emit_event(BUILD_START, module='foo/1.0', spec='foo-1.0.eb', index=1, total=1)
+        # events that can't be serialized to JSON are skipped
+        emit_event(BUILD_START, module=object())
+        disable_events_file()
+        emit_event(SESSION_END, success=True)
+
+        events = [json.loads(line) for line in read_file(events_file).strip().split('\n')]
+        self.assertEqual([event['event'] for event in events], [SESSION_START, BUILD_START])
+        for event in events:
+            self.assertEqual(event['pid'], os.getpid())
+            self.assertTrue(event['hostname'])
+            self.assertTrue(isinstance(event['time'], float))
+        self.assertEqual(events[0]['command_line'], 'eb foo.eb')
+        self.assertEqual(events[1]['module'], 'foo/1.0')
+
+        # events are appended to an existing events file
+        enable_events_file(events_file)
+        emit_event(SESSION_END, success=True)
+        disable_events_file()
+        events = [json.loads(line) for line in read_file(events_file).strip().split('\n')]
+        self.assertEqual([event['event'] for event in events], [SESSION_START, BUILD_START, SESSION_END])
+
+    def test_event_listeners(self):
+        """Test passing events to event listeners."""
+        events = []
+        add_event_listener(events.append)
+        add_event_listener(events.append)
+        try:
+            emit_event(BUILD_START, module='foo/1.0')
+        finally:
+            remove_event_listener(events.append)
+        emit_event(SESSION_END, success=True)
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['event'], BUILD_START)
+        self.assertEqual(events[0]['module'], 'foo/1.0')
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(EventsTest)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+##
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for deferred imports and reporting of import times.
+"""
+import os
+import re
+import subprocess
+import sys
+from test.framework.utilities import EnhancedTestCase
+from unittest import TestLoader, main
+from vsc.utils.missing import nub
+
+from easybuild.framework.easyblock import EasyBlock
+from easybuild.tools.filetools import write_file
+from easybuild.tools.importtime import disable_import_times, enable_import_times, import_times_report
+from easybuild.tools.importtime import import_times_requested
+from easybuild.tools.options import REPOSITORY_TYPES, STEP_NAMES
+from easybuild.tools.repository.repository import avail_repositories
+
+# budget for startup time of 'eb --version' (in seconds), incl. importing the required modules
+STARTUP_TIME_BUDGET = 3
+
+
+class ImportTimeTest(EnhancedTestCase):
+    """Tests for deferred imports and reporting of import times."""
+
+    def test_deferred_imports(self):
+        """Make sure that modules only required for specific functionality are not imported at startup."""
+        deferred_modules = [
+            'easybuild.framework.easyconfig.tweak',
+            'easybuild.tools.github',
+            'easybuild.tools.parallelbuild',
+            'easybuild.tools.pbs_job',
+        ]
+        cmd = [
+            sys.executable, '-c',
+            "import sys; import easybuild.main; print ','.join([m for m in sys.argv[1:] if m in sys.modules])",
+        ] + deferred_modules
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        (out, err) = proc.communicate()
+        self.assertEqual(proc.returncode, 0, "Importing easybuild.main works: %s" % err)
+        self.assertEqual(out.strip(), '')
+
+        # modules only required when actually running a session are not imported for 'eb --version'
+        deferred_modules.extend([
+            'easybuild.framework.easyblock',
+            'easybuild.tools.metrics',
+            'easybuild.tools.repository.repository',
+            'easybuild.tools.robot',
+            'easybuild.tools.testing',
+        ])
+        cmd = [
+            sys.executable, '-c',
+            '\n'.join([
+                "import sys",
+                "from easybuild.main import main",
+                "try:",
+                "    main(testing_data=(['--version'], None, False))",
+                "except SystemExit:",
+                "    pass",
+                "print 'imported: %s' % ','.join([m for m in sys.argv[1:] if m in sys.modules])",
+            ]),
+        ] + deferred_modules
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        (out, err) = proc.communicate()
+        self.assertEqual(proc.returncode, 0, "Running 'eb --version' works: %s" % err)
+        self.assertTrue(out.startswith('This is EasyBuild'), "Version is printed: %s" % out)
+        self.assertEqual(re.search('^imported: (.*)$', out, re.M).group(1), '')
+
+    def test_static_option_choices(self):
+        """Make sure that hardcoded choices for --stop and --repository are in sync with the actual ones."""
+        self.assertEqual(STEP_NAMES, nub([step[0] for step in EasyBlock.get_steps()]))
+        self.assertEqual(REPOSITORY_TYPES, sorted(avail_repositories(check_useable=False).keys()))
+
+    def test_startup_time_budget(self):
+        """Make sure that startup time of 'eb --version' stays within budget."""
+        cmd = [
+            sys.executable, '-c',
+            '\n'.join([
+                "import time",
+                "start = time.time()",
+                "from easybuild.main import main",
+                "try:",
+                "    main(testing_data=(['--version'], None, False))",
+                "except SystemExit:",
+                "    pass",
+                "print 'startup time: %.3f' % (time.time() - start)",
+            ]),
+        ]
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        (out, err) = proc.communicate()
+        self.assertEqual(proc.returncode, 0, "Running 'eb --version' works: %s" % err)
+        startup_time = float(re.search('^startup time: (.*)$', out, re.M).group(1))
+        msg = "Startup time %.3fs is within budget of %ss" % (startup_time, STARTUP_TIME_BUDGET)
+        self.assertTrue(startup_time < STARTUP_TIME_BUDGET, msg)
+
+    def test_import_times(self):
+        """Test reporting of time spent on importing modules."""
+        self.assertTrue(import_times_requested(['--import-times']))
+        self.assertFalse(import_times_requested(['--debug']))
+        os.environ['EASYBUILD_IMPORT_TIMES'] = '1'
+        self.assertTrue(import_times_requested([]))
+        del os.environ['EASYBUILD_IMPORT_TIMES']
+
+        write_file(os.path.join(self.test_prefix, 'eb_import_times_test.py'), "import eb_import_times_test_dep")
+        write_file(os.path.join(self.test_prefix, 'eb_import_times_test_dep.py'), "import time; time.sleep(0.1)")
+        sys.path.insert(0, self.test_prefix)
+        enable_import_times(report_at_exit=False)
+        try:
+            import eb_import_times_test
+        finally:
+            disable_import_times()
+            sys.path.remove(self.test_prefix)
+
+        report = import_times_report()
+        self.assertTrue(report.startswith("import time: self [us] | cumulative | imported package\n"))
+        regex = re.compile(r"^import time:\s+(?P<self>[0-9]+) \|\s+(?P<cum>[0-9]+) \| (?P<indent> *)(?P<name>\S+)$", re.M)
+        res = dict([(m.group('name'), m.groupdict()) for m in regex.finditer(report)])
+        dep_res = res['eb_import_times_test_dep']
+        self.assertTrue(int(dep_res['self']) >= 100000)
+        self.assertEqual(len(dep_res['indent']), len(res['eb_import_times_test']['indent']) + 2)
+        self.assertTrue(int(res['eb_import_times_test']['cum']) >= int(dep_res['cum']))
+        self.assertTrue(int(res['eb_import_times_test']['self']) < 100000)
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(ImportTimeTest)
+
+if __name__ == '__main__':
+    main()
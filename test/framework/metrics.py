@@ -0,0 +1,123 @@
+##
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for exposing metrics on the progress of an EasyBuild session.
+"""
+import os
+import re
+import urllib2
+from test.framework.utilities import EnhancedTestCase
+from unittest import TestLoader, main
+
+import easybuild.tools.metrics
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.events import BUILD_END, BUILD_START, DOWNLOAD, RESOLUTION_DONE, SESSION_END, STEP_END
+from easybuild.tools.events import STEP_START
+from easybuild.tools.events import emit_event
+from easybuild.tools.filetools import read_file
+from easybuild.tools.metrics import disable_metrics, enable_metrics, parse_http_address
+
+
+class MetricsTest(EnhancedTestCase):
+    """Tests for exposing metrics on the progress of an EasyBuild session."""
+
+    def tearDown(self):
+        """Stop keeping track of metrics, also when a test failed."""
+        disable_metrics()
+        super(MetricsTest, self).tearDown()
+
+    def test_metrics(self):
+        """Test exposing metrics on progress of session."""
+        self.assertEqual(parse_http_address('9090'), ('localhost', 9090))
+        self.assertEqual(parse_http_address('0.0.0.0:9090'), ('0.0.0.0', 9090))
+        self.assertErrorRegex(EasyBuildError, "Invalid address", parse_http_address, 'localhost')
+
+        metrics_file = os.path.join(self.test_prefix, 'metrics', 'easybuild.prom')
+        enable_metrics(path=metrics_file, http_address='127.0.0.1:0')
+        self.assertTrue(os.path.exists(metrics_file))
+
+        emit_event(RESOLUTION_DONE, easyconfigs=2, duration=0.1)
+        emit_event(BUILD_START, module='foo/1.0', spec='foo-1.0.eb', index=1, total=2)
+        emit_event(STEP_START, module='foo/1.0', step='configure')
+        emit_event(STEP_END, module='foo/1.0', step='configure', success=True, wall=1.5, cpu=1.0)
+        emit_event(DOWNLOAD, url='http://example.com/foo.tgz', path='/tmp/foo.tgz', bytes=1024, duration=0.5,
+                   rate=2048.0)
+        emit_event(STEP_START, module='foo/1.0', step='build')
+
+        txt = read_file(metrics_file)
+        for line in [
+            'easybuild_builds_queued 1.0',
+            'easybuild_builds_in_progress 1.0',
+            'easybuild_current_step{module="foo/1.0",step="build"} 1.0',
+            'easybuild_step_duration_seconds_count{step="configure"} 1.0',
+            'easybuild_step_duration_seconds_sum{step="configure"} 1.5',
+            'easybuild_downloaded_bytes_total 1024.0',
+            '# TYPE easybuild_builds_total counter',
+        ]:
+            self.assertTrue(line in txt.split('\n'), "Line '%s' not found in %s" % (line, txt))
+        self.assertFalse('# EOF' in txt)
+
+        emit_event(STEP_END, module='foo/1.0', step='build', success=False, wall=2.0, cpu=2.0)
+        emit_event(BUILD_END, module='foo/1.0', spec='foo-1.0.eb', index=1, total=2, success=False, duration=3.5)
+        self.assertTrue('easybuild_session_end_time_seconds 0.0' in read_file(metrics_file).split('\n'))
+
+        # metrics served via HTTP use the OpenMetrics text format, if requested
+        (host, port) = easybuild.tools.metrics._http_server.server_address
+        req = urllib2.Request('http://%s:%s/metrics' % (host, port))
+        req.add_header('Accept', 'application/openmetrics-text; version=1.0.0')
+        resp = urllib2.urlopen(req)
+        self.assertTrue(resp.info()['Content-Type'].startswith('application/openmetrics-text'))
+        txt = resp.read()
+        for line in [
+            'easybuild_builds_total{result="failure"} 1.0',
+            'easybuild_builds_total{result="success"} 0.0',
+            'easybuild_builds_in_progress 0.0',
+            '# TYPE easybuild_builds counter',
+            '# TYPE easybuild_current_step gauge',
+            '# EOF',
+        ]:
+            self.assertTrue(line in txt.split('\n'), "Line '%s' not found in %s" % (line, txt))
+        self.assertFalse('easybuild_current_step{' in txt)
+        self.assertTrue(re.search(r'^easybuild_operations_total\{kind="\w+"\} [0-9.]+$', txt, re.M), txt)
+
+        # metrics for queued builds are reset at the end of the session
+        emit_event(SESSION_END, success=False)
+        txt = read_file(metrics_file)
+        self.assertTrue('easybuild_builds_queued 0.0' in txt.split('\n'))
+        self.assertFalse('easybuild_session_end_time_seconds 0.0' in txt.split('\n'))
+
+        # metrics are no longer updated once disabled
+        disable_metrics()
+        txt = read_file(metrics_file)
+        emit_event(STEP_START, module='bar/1.0', step='configure')
+        self.assertEqual(read_file(metrics_file), txt)
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(MetricsTest)
+
+if __name__ == '__main__':
+    main()
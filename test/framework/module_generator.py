@@ -41,11 +41,12 @@ from vsc.utils.missing import get_subclasses
 import easybuild.tools.module_generator
 from easybuild.framework.easyconfig.tools import process_easyconfig
 from easybuild.tools import config
-from easybuild.tools.module_generator import ModuleGenerator
+from easybuild.tools.module_generator import ModuleGenerator, ModuleGeneratorLua, module_generator, quote_lua_long_str
 from easybuild.tools.module_naming_scheme.utilities import is_valid_module_name
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig.easyconfig import EasyConfig, ActiveMNS
 from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import write_file
 from test.framework.utilities import find_full_path, init_config
 
 
@@ -160,6 +161,10 @@ class ModuleGeneratorTest(EnhancedTestCase):
         self.assertEqual("setenv\tkey\t\t'va\"lue'\n", self.modgen.set_environment("key", 'va"lue'))
         self.assertEqual('setenv\tkey\t\t"va\'lue"\n', self.modgen.set_environment("key", "va'lue"))
         self.assertEqual('setenv\tkey\t\t"""va"l\'ue"""\n', self.modgen.set_environment("key", """va"l'ue"""))
+
+        # paths relative to installation directory
+        self.assertEqual('setenv\tkey\t\t"$root"\n', self.modgen.set_environment("key", '', relpath=True))
+        self.assertEqual('setenv\tkey\t\t"$root/foo"\n', self.modgen.set_environment("key", 'foo', relpath=True))
     
     def test_alias(self):
         """Test setting of alias in modulefiles."""
@@ -186,6 +191,113 @@ class ModuleGeneratorTest(EnhancedTestCase):
         tcltxt = 'puts stderr "foo"'
         self.assertEqual(tcltxt, self.modgen.add_tcl_footer(tcltxt))
 
+    def test_comment(self):
+        """Test including comments in module files."""
+        self.assertEqual("# foo bar\n", self.modgen.comment("foo bar"))
+
+    def test_lua(self):
+        """Test generating module files in Lua syntax."""
+        modgen = ModuleGeneratorLua(self.eb)
+        installdir = self.modgen.app.installdir
+
+        gzip_txt = "gzip (GNU zip) is a popular data compression program as a replacement for compress "
+        gzip_txt += "- Homepage: http://www.gzip.org/"
+        expected = '\n'.join([
+            "help([[%s]])" % gzip_txt,
+            "",
+            "whatis([[Description: %s]])" % gzip_txt,
+            "",
+            'local root = "%s"' % installdir,
+            "",
+            'conflict("gzip")',
+            "",
+        ])
+        self.assertEqual(modgen.get_description(), expected)
+
+        # long brackets are used that don't clash with the description
+        self.assertEqual(quote_lua_long_str('foo'), '[[foo]]')
+        self.assertEqual(quote_lua_long_str('foo]]bar'), '[=[foo]]bar]=]')
+        self.assertEqual(quote_lua_long_str('foo]]bar]=]'), '[==[foo]]bar]=]]==]')
+        self.assertEqual(quote_lua_long_str('foo]'), '[=[foo]]=]')
+        self.assertEqual(quote_lua_long_str('foo]='), '[[foo]=]]')
+        self.eb.cfg['description'] = "gzip [[compression]]"
+        self.assertTrue(modgen.get_description().startswith("help([=[gzip [[compression]] - Homepage: "))
+
+        expected = '\n'.join([
+            "",
+            'if not isloaded("mod_name") then',
+            '    load("mod_name")',
+            "end",
+            "",
+        ])
+        self.assertEqual(modgen.load_module("mod_name"), expected)
+        expected = '\n'.join([
+            "",
+            'if isloaded("mod_name") then',
+            '    unload("mod_name")',
+            "end",
+            "",
+        ])
+        self.assertEqual(modgen.unload_module("mod_name"), expected)
+
+        expected = ''.join([
+            'prepend_path("key", pathJoin(root, "path1"))\n',
+            'prepend_path("key", pathJoin(root, "path2"))\n',
+        ])
+        self.assertEqual(modgen.prepend_paths("key", ["path1", "path2"]), expected)
+        self.assertEqual(modgen.prepend_paths("key", "/abs/path", allow_abs=True), 'prepend_path("key", "/abs/path")\n')
+        self.assertErrorRegex(EasyBuildError, "Absolute path /foo passed to prepend_paths",
+                              modgen.prepend_paths, "key", ["bar", "/foo"])
+
+        expected = '\n'.join([
+            'prepend_path("MODULEPATH", "/some/path")',
+            'prepend_path("MODULEPATH", "/foo/bar/baz")',
+        ])
+        self.assertEqual(modgen.use(["/some/path", "/foo/bar/baz"]), expected)
+
+        self.assertEqual(modgen.set_environment("key", "value"), 'setenv("key", "value")\n')
+        self.assertEqual(modgen.set_environment("key", """va"l'ue"""), 'setenv("key", "va\\"l\'ue")\n')
+        self.assertEqual(modgen.set_environment("key", '', relpath=True), 'setenv("key", root)\n')
+        self.assertEqual(modgen.set_environment("key", 'foo', relpath=True), 'setenv("key", pathJoin(root, "foo"))\n')
+        self.assertEqual(modgen.set_alias("key", "value"), 'set_alias("key", "value")\n')
+        self.assertEqual(modgen.comment("foo bar"), "-- foo bar\n")
+
+        expected = '\n'.join([
+            "",
+            'if mode() == "load" then',
+            '    io.stderr:write("test $test\\ntest")',
+            "end",
+            "",
+        ])
+        self.assertEqual(modgen.msg_on_load("test $test\ntest"), expected)
+
+        self.assertErrorRegex(EasyBuildError, "Tcl footer is not supported", modgen.add_tcl_footer, 'puts stderr "foo"')
+
+    def test_module_generator(self):
+        """Test obtaining module generator for configured module syntax."""
+        self.assertTrue(isinstance(module_generator(self.eb), ModuleGenerator))
+        self.assertFalse(isinstance(module_generator(self.eb), ModuleGeneratorLua))
+
+        os.environ['EASYBUILD_MODULE_SYNTAX'] = 'Lua'
+        init_config()
+        self.assertErrorRegex(EasyBuildError, "requires Lmod", module_generator, self.eb)
+
+        os.environ['EASYBUILD_MODULES_TOOL'] = 'Lmod'
+        init_config()
+        modgen = module_generator(self.eb, fake=True)
+        self.assertTrue(isinstance(modgen, ModuleGeneratorLua))
+        self.assertTrue(modgen.is_fake())
+
+        # modules footer is in Tcl syntax, so it can't be included in module files in Lua syntax
+        modules_footer = os.path.join(self.test_prefix, 'modules_footer.txt')
+        write_file(modules_footer, 'puts stderr "foo"\n')
+        init_config(build_options={'modules_footer': modules_footer})
+        self.assertErrorRegex(EasyBuildError, "modules footer .* not supported", module_generator, self.eb)
+
+        del os.environ['EASYBUILD_MODULE_SYNTAX']
+        del os.environ['EASYBUILD_MODULES_TOOL']
+        init_config()
+
     def test_module_naming_scheme(self):
         """Test using default module naming scheme."""
         all_stops = [x[0] for x in EasyBlock.get_steps()]
@@ -34,11 +34,18 @@ import os
 import re
 import tempfile
 import shutil
+import subprocess
+import threading
 from test.framework.utilities import EnhancedTestCase, init_config
 from unittest import TestLoader, main
 
+from vsc.utils.missing import nub
+
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.counters import RUN_MODULE, counter_totals, counters_since, get_counters
+from easybuild.tools.environment import restore_env
+from easybuild.tools.filetools import write_file
 from easybuild.tools.modules import get_software_root, get_software_version, get_software_libdir, modules_tool
 
 
@@ -103,6 +110,155 @@ class ModulesTest(EnhancedTestCase):
         ms = self.testmods.available()
         self.assertEqual(len(ms), TEST_MODULES_COUNT)
 
+    def test_available_cache(self):
+        """Test caching of available modules."""
+        test_modpath = os.path.join(self.test_prefix, 'modules')
+        gcc_mod_dir = os.path.join(test_modpath, 'GCC')
+        os.makedirs(gcc_mod_dir)
+        gcc_mod_path = os.path.join(os.path.dirname(__file__), 'modules', 'GCC', '4.6.3')
+        shutil.copy2(gcc_mod_path, gcc_mod_dir)
+        self.init_testmods(test_modules_paths=[test_modpath])
+
+        # keep track of how often $MODULEPATH is scanned, and how often 'module avail' is run
+        scans, avail_cmds = [], []
+        orig_run_module = self.testmods.run_module
+        orig_scan_available = self.testmods.scan_available
+        def run_module(*args, **kwargs):
+            """Wrapper for run_module that keeps track of 'avail' commands."""
+            if 'avail' in args:
+                avail_cmds.append(args)
+            return orig_run_module(*args, **kwargs)
+        def scan_available(*args, **kwargs):
+            """Wrapper for scan_available that keeps track of scans."""
+            scans.append(args)
+            return orig_scan_available(*args, **kwargs)
+        self.testmods.run_module = run_module
+        self.testmods.scan_available = scan_available
+
+        try:
+            self.assertEqual(self.testmods.available(), ['GCC/4.6.3'])
+            self.assertEqual(self.testmods.available(), ['GCC/4.6.3'])
+            self.assertEqual(len(scans), 1)
+
+            # adding a new module file (in an existing module directory) is picked up
+            shutil.copy2(os.path.join(os.path.dirname(gcc_mod_path), '4.7.2'), gcc_mod_dir)
+            os.utime(gcc_mod_dir, (os.stat(gcc_mod_dir).st_mtime + 2,) * 2)
+            self.assertEqual(self.testmods.available(), ['GCC/4.6.3', 'GCC/4.7.2'])
+            self.assertEqual(len(scans), 2)
+
+            # changes in deeper subdirectories are picked up too
+            mpi_mod_dir = os.path.join(test_modpath, 'MPI', 'GCC', '4.7.2', 'OpenMPI')
+            os.makedirs(mpi_mod_dir)
+            shutil.copy2(gcc_mod_path, os.path.join(mpi_mod_dir, '1.6.4'))
+            mpi_mod_name = 'MPI/GCC/4.7.2/OpenMPI/1.6.4'
+            self.assertTrue(mpi_mod_name in self.testmods.available())
+            self.assertEqual(len(scans), 3)
+            self.assertTrue(mpi_mod_name in self.testmods.available())
+            self.assertEqual(len(scans), 3)
+
+            os.remove(os.path.join(mpi_mod_dir, '1.6.4'))
+            os.utime(mpi_mod_dir, (os.stat(mpi_mod_dir).st_mtime + 2,) * 2)
+            self.assertFalse(mpi_mod_name in self.testmods.available())
+            self.assertEqual(len(scans), 4)
+
+            # cache can be invalidated explicitly
+            self.testmods.invalidate_available_cache()
+            self.assertFalse(mpi_mod_name in self.testmods.available())
+            self.assertEqual(len(scans), 5)
+
+            # checking whether modules exist doesn't require scanning $MODULEPATH if module files are found
+            self.assertEqual(self.testmods.exist(['GCC/4.6.3', 'GCC/4.7.2']), [True, True])
+            self.assertEqual(len(scans), 5)
+
+            # cache is specific to $MODULEPATH
+            self.init_testmods()
+            self.assertEqual(len(self.testmods.available()), TEST_MODULES_COUNT)
+            self.assertEqual(len(scans), 6)
+
+            # no need to run 'module avail' at all if $MODULEPATH can be scanned
+            self.assertEqual(avail_cmds, [])
+        finally:
+            self.testmods.run_module = orig_run_module
+            self.testmods.scan_available = orig_scan_available
+
+    def test_scan_available(self):
+        """Test determining available modules by scanning $MODULEPATH."""
+        self.init_testmods()
+
+        def avail_mod_names(mod_name=''):
+            """Determine names of available modules by running 'module avail'."""
+            mods = [mod['mod_name'] for mod in self.testmods.run_module('avail', mod_name)]
+            # Lmod also lists module directories, and modules that contain the specified name
+            return nub(sorted([mod for mod in mods if not mod.endswith('/') and mod.startswith(mod_name)]))
+
+        # same result as 'module avail', without running the modules tool
+        self.assertEqual(self.testmods.scan_available(include_hidden=False), avail_mod_names())
+        self.assertEqual(self.testmods.scan_available('GCC', include_hidden=False), avail_mod_names('GCC'))
+        self.assertEqual(self.testmods.available(), self.testmods.scan_available())
+        self.assertFalse('toy/.0.0-deps' in self.testmods.scan_available(include_hidden=False))
+        self.assertTrue('toy/.0.0-deps' in self.testmods.scan_available(include_hidden=True))
+
+        gcc_mod_path = os.path.join(os.path.dirname(__file__), 'modules', 'GCC', '4.6.3')
+        self.assertEqual(self.testmods.find_modulefile('GCC/4.6.3'), gcc_mod_path)
+        self.assertTrue(self.testmods.find_modulefile('toy/.0.0-deps'))
+        self.assertEqual(self.testmods.find_modulefile('GCC'), None)
+        self.assertEqual(self.testmods.find_modulefile('GCC/.modulerc'), None)
+        self.assertEqual(self.testmods.find_modulefile('foo/1.2.3'), None)
+
+        # files that are not module files, symlinked directories (incl. symlink loops)
+        test_modpath = os.path.join(self.test_prefix, 'modules')
+        os.makedirs(os.path.join(test_modpath, 'all', 'GCC'))
+        shutil.copy2(gcc_mod_path, os.path.join(test_modpath, 'all', 'GCC'))
+        write_file(os.path.join(test_modpath, 'all', 'GCC', '.version'), '#%Module\nset ModulesVersion "4.6.3"\n')
+        write_file(os.path.join(test_modpath, 'all', 'GCC', '4.6.3~'), '#%Module\n')
+        write_file(os.path.join(test_modpath, 'all', 'GCC', 'README'), 'this is not a module file\n')
+        os.symlink(os.path.join(test_modpath, 'all', 'GCC'), os.path.join(test_modpath, 'all', 'GCCcore'))
+        os.symlink(os.path.join(test_modpath, 'all'), os.path.join(test_modpath, 'all', 'GCC', 'loop'))
+        self.reset_modulepath([os.path.join(test_modpath, 'all')])
+        self.assertEqual(self.testmods.scan_available(), ['GCC/4.6.3', 'GCCcore/4.6.3'])
+        os.remove(os.path.join(test_modpath, 'all', 'GCC', 'loop'))
+        os.remove(os.path.join(test_modpath, 'all', 'GCC', '4.6.3~'))
+        self.assertEqual(self.testmods.scan_available(include_hidden=False), avail_mod_names())
+
+        # default versions set in .modulerc files are understood as well
+        modulerc = os.path.join(test_modpath, 'all', 'GCC', '.modulerc')
+        write_file(modulerc, '#%Module\n# default version\nmodule-version GCC/4.6.3 default\n')
+        self.assertEqual(self.testmods.scan_available(), ['GCC/4.6.3', 'GCCcore/4.6.3'])
+        write_file(modulerc, '#%Module\nmodule-version /4.6.3 default\n')
+        self.assertEqual(self.testmods.scan_available(), ['GCC/4.6.3', 'GCCcore/4.6.3'])
+
+        # modules tool is used for constructs that can't be interpreted by scanning $MODULEPATH
+        gcc_avail = ['GCC/4.6.3', 'GCCcore/4.6.3']
+        rc_txts = [
+            # alias
+            '#%Module\nmodule-alias GCC/latest GCC/4.6.3\n',
+            # default version for which there's no module file
+            '#%Module\nmodule-version GCC/4.7.2 default\n',
+            # arbitrary Tcl code
+            '#%Module\nif { [info exists env(FOO)] } { module-version GCC/4.6.3 default }\n',
+        ]
+        for rc_txt in rc_txts:
+            self.testmods.invalidate_available_cache()
+            write_file(modulerc, rc_txt)
+            self.assertEqual(self.testmods.scan_available(), None)
+            self.assertEqual([m for m in self.testmods.available() if m in gcc_avail], gcc_avail)
+
+        os.remove(modulerc)
+        self.assertEqual(self.testmods.scan_available(), gcc_avail)
+        write_file(modulerc + '.lua', 'module_version("GCC/4.6.3", "default")\n')
+        self.assertEqual(self.testmods.scan_available(), None)
+        os.remove(modulerc + '.lua')
+
+        default_symlink = os.path.join(test_modpath, 'all', 'GCC', 'default')
+        os.symlink(os.path.join(test_modpath, 'all', 'GCC', '4.6.3'), default_symlink)
+        self.assertEqual(self.testmods.scan_available(), None)
+        os.remove(default_symlink)
+
+        os.environ['MODULERC'] = os.path.join(self.test_prefix, 'modulerc')
+        self.assertEqual(self.testmods.scan_available(), gcc_avail)
+        write_file(os.environ['MODULERC'], '#%Module\nmodule-alias GCC/latest GCC/4.6.3\n')
+        self.assertEqual(self.testmods.scan_available(), None)
+
     def test_exists(self):
         """Test if testing for module existence works."""
         self.init_testmods()
@@ -122,6 +278,26 @@ class ModulesTest(EnhancedTestCase):
                      'Compiler/GCC/4.7.2/OpenMPI/1.6.4', 'toy/.0.0-deps']
         self.assertEqual(self.testmods.exist(mod_names), [True, False, False, False, True, True, True])
 
+        # hidden modules without a module file in $MODULEPATH are checked all at once, via a single 'show'
+        module_cmds = []
+        orig_run_module = self.testmods.run_module
+
+        def run_module(*args, **kwargs):
+            """Wrapper for run_module that keeps track of module commands."""
+            module_cmds.append(args)
+            return orig_run_module(*args, **kwargs)
+
+        self.testmods.run_module = run_module
+        try:
+            mod_names = ['foo/.1.2.3', 'toy/.0.0-deps', 'bar/.4.5.6', 'foo/.1.2.3']
+            self.assertEqual(self.testmods.exist(mod_names), [False, True, False, False])
+            self.assertEqual(module_cmds, [(['show', 'foo/.1.2.3', 'bar/.4.5.6'],)])
+        finally:
+            self.testmods.run_module = orig_run_module
+
+        self.assertEqual(self.testmods.shown_modules(['foo/1.2.3', 'GCC/4.6.3', 'toy/.0.0-deps']),
+                         ['GCC/4.6.3', 'toy/.0.0-deps'])
+
     def test_load(self):
         """ test if we load one module it is in the loaded_modules """
         self.init_testmods()
@@ -143,6 +319,237 @@ class ModulesTest(EnhancedTestCase):
         for mod in mods:
             self.assertErrorRegex(EasyBuildError, '.*', self.testmods.load, [mod])
 
+    def test_load_batch(self):
+        """Test loading multiple modules with a single module command."""
+        self.init_testmods()
+
+        module_cmds = []
+        orig_run_module = self.testmods.run_module
+
+        def run_module(*args, **kwargs):
+            """Wrapper for run_module that keeps track of 'load' module commands."""
+            if 'load' in args or 'load' in args[0]:
+                module_cmds.append(args)
+            return orig_run_module(*args, **kwargs)
+
+        self.testmods.run_module = run_module
+        try:
+            self.testmods.load(['GCC/4.6.3', 'toy/.0.0-deps'])
+            self.assertEqual(module_cmds, [(['load', 'GCC/4.6.3', 'toy/.0.0-deps'],)])
+            self.assertTrue('GCC/4.6.3' in self.testmods.loaded_modules())
+            self.assertTrue('toy/.0.0-deps' in self.testmods.loaded_modules())
+            self.testmods.purge()
+
+            # if loading in batch fails, modules are loaded one by one (and environment is restored in between);
+            # only the error for loading the failing module is logged, not the one for loading in batch
+            del module_cmds[:]
+            errors = []
+            orig_log_error = self.testmods.log.error
+
+            def log_error(msg, *args, **kwargs):
+                """Wrapper for log.error that keeps track of logged errors."""
+                errors.append(msg)
+                return orig_log_error(msg, *args, **kwargs)
+
+            self.testmods.log.error = log_error
+            env_before = os.environ.copy()
+            mods = ['GCC/4.6.3', 'foo/1.2.3']
+            self.assertErrorRegex(EasyBuildError, '.*', self.testmods.load, mods)
+            self.assertEqual(module_cmds, [(['load'] + mods,), ('load', 'GCC/4.6.3'), ('load', 'foo/1.2.3')])
+            self.assertEqual(len(errors), 1)
+            self.testmods.purge()
+            self.assertEqual(os.environ.get('EBROOTGCC'), env_before.get('EBROOTGCC'))
+        finally:
+            self.testmods.run_module = orig_run_module
+            if 'error' in self.testmods.log.__dict__:
+                del self.testmods.log.error
+
+    def test_load_env_cache(self):
+        """Test caching of changes to the environment made by loading modules."""
+        test_modpath = os.path.join(self.test_prefix, 'modules')
+        os.makedirs(os.path.join(test_modpath, 'GCC'))
+        gcc_mod_path = os.path.join(test_modpath, 'GCC', '4.6.3')
+        shutil.copy2(os.path.join(os.path.dirname(__file__), 'modules', 'GCC', '4.6.3'), gcc_mod_path)
+        self.init_testmods(test_modules_paths=[test_modpath])
+
+        load_cmds = []
+        orig_popen = subprocess.Popen
+
+        def popen(cmd, *args, **kwargs):
+            """Wrapper for subprocess.Popen that keeps track of 'module load' commands."""
+            if 'load' in cmd:
+                load_cmds.append(cmd)
+            return orig_popen(cmd, *args, **kwargs)
+
+        orig_env = os.environ.copy()
+        subprocess.Popen = popen
+        try:
+            self.testmods.load(['GCC/4.6.3'])
+            self.assertEqual(len(load_cmds), 1)
+            env_after_load = os.environ.copy()
+            self.assertTrue(os.environ['LD_LIBRARY_PATH'].startswith(os.path.join(os.environ['EBROOTGCC'], 'lib')))
+
+            # loading the same module again in the same context doesn't require running the module command
+            self.testmods.purge()
+            restore_env(orig_env)
+            start = get_counters()
+            self.testmods.load(['GCC/4.6.3'])
+            self.assertEqual(len(load_cmds), 1)
+            # cached loads are not counted as module commands
+            self.assertFalse(RUN_MODULE in counter_totals(counters_since(start)))
+            self.assertEqual(os.environ, env_after_load)
+            self.assertEqual(self.testmods.loaded_modules(), ['GCC/4.6.3'])
+
+            # module command is run again if the environment that is changed by loading the module is different
+            self.testmods.purge()
+            restore_env(orig_env)
+            os.environ['PATH'] = os.pathsep.join(['/foo/bin', os.environ['PATH']])
+            self.testmods.load(['GCC/4.6.3'])
+            self.assertEqual(len(load_cmds), 2)
+            self.assertTrue(os.environ['PATH'].endswith(os.pathsep.join(['/foo/bin', orig_env['PATH']])))
+
+            # module command is run again if the module file was changed
+            self.testmods.purge()
+            restore_env(orig_env)
+            os.utime(gcc_mod_path, (os.stat(gcc_mod_path).st_mtime + 10,) * 2)
+            self.testmods.load(['GCC/4.6.3'])
+            self.assertEqual(len(load_cmds), 3)
+            self.testmods.purge()
+            restore_env(orig_env)
+            self.testmods.load(['GCC/4.6.3'])
+            self.assertEqual(len(load_cmds), 3)
+
+            # cache can be invalidated
+            self.testmods.purge()
+            restore_env(orig_env)
+            self.testmods.invalidate_load_env_cache()
+            self.testmods.load(['GCC/4.6.3'])
+            self.assertEqual(len(load_cmds), 4)
+        finally:
+            subprocess.Popen = orig_popen
+            self.testmods.purge()
+            restore_env(orig_env)
+
+    def test_dependencies_for(self):
+        """Test determining dependencies of modules via their module files."""
+        self.init_testmods()
+
+        self.assertEqual(self.testmods.dependencies_for('GCC/4.6.4'), [])
+        deps = ['GCC/4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4']
+        self.assertEqual(self.testmods.dependencies_for('gompi/1.3.12', depth=0), deps)
+        deps.append('hwloc/1.6.2-GCC-4.6.4')
+        self.assertEqual(self.testmods.dependencies_for('gompi/1.3.12'), deps)
+
+        # dependency closures of multiple modules can be determined at once
+        closures = self.testmods.dependency_closures(['gompi/1.3.12', 'OpenMPI/1.6.4-GCC-4.6.4', 'GCC/4.6.4'])
+        self.assertEqual(closures, {
+            'gompi/1.3.12': deps,
+            'OpenMPI/1.6.4-GCC-4.6.4': ['GCC/4.6.4', 'hwloc/1.6.2-GCC-4.6.4'],
+            'GCC/4.6.4': [],
+        })
+        closures = self.testmods.dependency_closures(['gompi/1.3.12', 'OpenMPI/1.6.4-GCC-4.6.4'], depth=0)
+        self.assertEqual(closures['gompi/1.3.12'], ['GCC/4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4'])
+
+        # module files are only read once, and are read again when they're changed
+        test_modpath = os.path.join(self.test_prefix, 'modules')
+        os.makedirs(os.path.join(test_modpath, 'foo'))
+        foo_modfile = os.path.join(test_modpath, 'foo', '1.0')
+        write_file(foo_modfile, '#%Module\nmodule load GCC/4.6.4\n')
+        # cyclic dependencies are handled
+        os.makedirs(os.path.join(test_modpath, 'bar'))
+        write_file(os.path.join(test_modpath, 'bar', '1.0'), '#%Module\nmodule load bar/2.0\n')
+        write_file(os.path.join(test_modpath, 'bar', '2.0'), '#%Module\nmodule load bar/1.0\n')
+        self.reset_modulepath([test_modpath] + os.environ['MODULEPATH'].split(os.pathsep))
+        self.assertEqual(self.testmods.dependencies_for('bar/1.0'), ['bar/2.0', 'bar/1.0'])
+        # dependencies of modules in a cycle don't depend on the order in which they're considered
+        bar_closures = {
+            'bar/1.0': ['bar/2.0', 'bar/1.0'],
+            'bar/2.0': ['bar/1.0', 'bar/2.0'],
+        }
+        self.assertEqual(self.testmods.dependency_closures(['bar/1.0', 'bar/2.0']), bar_closures)
+        self.assertEqual(self.testmods.dependency_closures(['bar/2.0', 'bar/1.0']), bar_closures)
+
+        # quoted module names in Tcl module files are recognized too
+        os.makedirs(os.path.join(test_modpath, 'baz'))
+        write_file(os.path.join(test_modpath, 'baz', '1.0'), '#%Module\nmodule load "foo/1.0"\nmodule load bar/1.0\n')
+        self.assertEqual(self.testmods.dependencies_for('baz/1.0', depth=0), ['foo/1.0', 'bar/1.0'])
+
+        # modules tool is only run in the main thread, e.g. for modules for which no module file can be located
+        threads = []
+        orig_run_module = self.testmods.run_module
+
+        def run_module(*args, **kwargs):
+            """Wrapper for run_module that keeps track of the threads in which the modules tool is run."""
+            threads.append(threading.current_thread().name)
+            return orig_run_module(*args, **kwargs)
+
+        self.testmods.run_module = run_module
+        try:
+            try:
+                self.testmods.dependency_closures(['GCC/4.6.4', 'nosuchsoftware/1.0', 'bar/1.0'])
+            except EasyBuildError:
+                pass
+        finally:
+            self.testmods.run_module = orig_run_module
+        self.assertTrue(threads)
+        self.assertEqual(nub(threads), [threading.current_thread().name])
+
+        modfiles = []
+        orig_modulefile_path = self.testmods.modulefile_path
+
+        def modulefile_path(mod_name):
+            """Wrapper for modulefile_path that keeps track of module files being read."""
+            modfiles.append(mod_name)
+            return orig_modulefile_path(mod_name)
+
+        self.testmods.modulefile_path = modulefile_path
+        try:
+            self.assertEqual(self.testmods.dependencies_for('foo/1.0'), ['GCC/4.6.4'])
+            self.assertEqual(self.testmods.dependencies_for('foo/1.0'), ['GCC/4.6.4'])
+            self.assertEqual(modfiles, ['foo/1.0', 'GCC/4.6.4'])
+
+            write_file(foo_modfile, '#%Module\nmodule load gompi/1.3.12\n')
+            os.utime(foo_modfile, (os.stat(foo_modfile).st_mtime + 10,) * 2)
+            self.assertEqual(self.testmods.dependencies_for('foo/1.0'), ['gompi/1.3.12'] + deps)
+        finally:
+            self.testmods.modulefile_path = orig_modulefile_path
+
+    def test_deferred_update(self):
+        """Test deferring updates after new modules were added."""
+        self.init_testmods()
+
+        updates = []
+        orig_update = self.testmods.update
+
+        def update():
+            """Dummy implementation of update that keeps track of updates."""
+            updates.append(True)
+            return len(updates)
+
+        self.testmods.update = update
+        try:
+            self.testmods.request_update()
+            self.assertEqual(len(updates), 1)
+
+            # only a single update is done for all update requests while updates are deferred
+            self.testmods.defer_updates()
+            self.testmods.request_update()
+            self.testmods.request_update()
+            self.assertEqual(len(updates), 1)
+            self.assertEqual(self.testmods.flush_updates(), 2)
+            self.assertEqual(len(updates), 2)
+
+            # no update if none was requested
+            self.testmods.defer_updates()
+            self.assertEqual(self.testmods.flush_updates(), None)
+            self.assertEqual(len(updates), 2)
+
+            # updates are no longer deferred after flushing
+            self.testmods.request_update()
+            self.assertEqual(len(updates), 3)
+        finally:
+            self.testmods.update = orig_update
+
     def test_ld_library_path(self):
         """Make sure LD_LIBRARY_PATH is what it should be when loaded multiple modules."""
         self.init_testmods()
@@ -283,6 +690,50 @@ class ModulesTest(EnhancedTestCase):
         path = modtool.path_to_top_of_module_tree(init_modpaths, 'FFTW/3.3.3', full_mod_subdir, deps)
         self.assertEqual(path, ['OpenMPI/1.6.4', 'GCC/4.7.2'])
 
+        # path to top of module tree is determined by only considering module files, no modules are loaded
+        module_cmds = []
+        orig_run_module = modtool.run_module
+
+        def run_module(*args, **kwargs):
+            """Wrapper for run_module that keeps track of module commands."""
+            module_cmds.append(args)
+            return orig_run_module(*args, **kwargs)
+
+        modtool.run_module = run_module
+        try:
+            deps = ['GCC/4.7.2', 'OpenMPI/1.6.4']
+            exts = modtool.modpath_extensions_for(deps)
+            self.assertEqual(exts, {
+                'GCC/4.7.2': [os.path.join(mod_prefix, 'Compiler', 'GCC', '4.7.2')],
+                'OpenMPI/1.6.4': [os.path.join(mod_prefix, 'MPI', 'GCC', '4.7.2', 'OpenMPI', '1.6.4')],
+            })
+            path = modtool.path_to_top_of_module_tree(init_modpaths, 'FFTW/3.3.3', full_mod_subdir, deps)
+            self.assertEqual(path, ['OpenMPI/1.6.4', 'GCC/4.7.2'])
+            self.assertEqual(module_cmds, [])
+        finally:
+            modtool.run_module = orig_run_module
+
+        # $MODULEPATH extensions in Lua module files are also recognized
+        lua_txt = '\n'.join([
+            'local root = "/tmp/software/GCC/4.7.2"',
+            'prepend_path("MODULEPATH", "/tmp/modules/all/Compiler/GCC/4.7.2")',
+            'prepend_path("PATH", pathJoin(root, "bin"))',
+        ])
+        self.assertEqual(modtool.modpath_extensions_in(lua_txt), ['/tmp/modules/all/Compiler/GCC/4.7.2'])
+
+        # quoted paths in Tcl module files are recognized too
+        tcl_txt = '\n'.join([
+            '#%Module',
+            'module use "/tmp/modules/all/Compiler/GCC/4.7.2"',
+            'module use /tmp/modules/all/Compiler/GCCcore/4.7.2',
+        ])
+        expected = ['/tmp/modules/all/Compiler/GCC/4.7.2', '/tmp/modules/all/Compiler/GCCcore/4.7.2']
+        self.assertEqual(modtool.modpath_extensions_in(tcl_txt), expected)
+
+        # modules tool is used if a module file can not be located directly
+        self.assertEqual(modtool.locate_modulefiles(['OpenMPI/1.6.4']), None)
+        self.assertEqual(modtool.locate_modulefiles(['GCC/4.7.2', 'foo/1.2.3']), None)
+
     def test_path_to_top_of_module_tree_categorized_hmns(self):
         """
         Test function to determine path to top of the module tree for a categorized hierarchical module naming
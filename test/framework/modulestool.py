@@ -30,6 +30,7 @@ Unit tests for ModulesTool class.
 import os
 import re
 import tempfile
+import time
 from vsc.utils import fancylogger
 
 from test.framework.utilities import EnhancedTestCase
@@ -41,8 +42,8 @@ import easybuild.tools.options as eboptions
 from easybuild.tools import config, modules
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option
-from easybuild.tools.filetools import which
-from easybuild.tools.modules import modules_tool, Lmod
+from easybuild.tools.filetools import read_file, which, write_file
+from easybuild.tools.modules import invalidate_modules_tool, modules_tool, Lmod, VirtualModules
 from test.framework.utilities import init_config
 
 
@@ -149,6 +150,125 @@ class ModulesToolTest(EnhancedTestCase):
 
         fancylogger.logToFile(self.logfile, enable=False)
 
+    def test_probe_cache(self):
+        """Test caching of results of probing the modules tool."""
+        os.environ['module'] = "() {  eval `/bin/echo $*`\n}"
+        cachedir = os.path.join(self.test_prefix, 'cache')
+        init_config(build_options={'cachedir': cachedir})
+        invalidate_modules_tool(invalidate_probes=True)
+
+        mmt = MockModulesTool(mod_paths=[], testing=True)
+        self.assertEqual(mmt.version, StrictVersion(MockModulesTool.VERSION_OPTION))
+        self.assertTrue(MockModulesTool(mod_paths=[], testing=True) is mmt)
+
+        # results of probing are stored in cache directory
+        probe_cache_path = os.path.join(cachedir, 'modules_tool', 'MockModulesTool.json')
+        self.assertEqual(mmt.probe_cache_path(), probe_cache_path)
+        self.assertTrue(os.path.exists(probe_cache_path))
+        cached = read_file(probe_cache_path)
+        self.assertTrue(re.search('"version": "1.0', cached))
+
+        # tamper with cached version, to verify that a new instance uses it rather than probing the modules tool again
+        write_file(probe_cache_path, re.sub('"version": "1.0', '"version": "1.2.3', cached))
+        invalidate_modules_tool()
+        modules._probe_cache.clear()
+        mmt = MockModulesTool(mod_paths=[], testing=True)
+        self.assertEqual(mmt.version, StrictVersion('1.2.3'))
+
+        # cached results are ignored when the 'module' function changes
+        os.environ['module'] = "() {  eval `/usr/bin/env echo $*`\n}"
+        invalidate_modules_tool()
+        mmt = MockModulesTool(mod_paths=[], testing=True)
+        self.assertEqual(mmt.version, StrictVersion(MockModulesTool.VERSION_OPTION))
+
+        # explicit invalidation also discards cached results
+        write_file(probe_cache_path, re.sub('"version": "1.0', '"version": "1.2.3', read_file(probe_cache_path)))
+        invalidate_modules_tool()
+        modules._probe_cache.clear()
+        self.assertEqual(MockModulesTool(mod_paths=[], testing=True).version, StrictVersion('1.2.3'))
+        invalidate_modules_tool(invalidate_probes=True)
+        self.assertFalse(os.path.exists(probe_cache_path))
+        mmt = MockModulesTool(mod_paths=[], testing=True)
+        self.assertEqual(mmt.version, StrictVersion(MockModulesTool.VERSION_OPTION))
+
+    def test_virtual_modules(self):
+        """Test in-process modules tool."""
+        test_modules_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'modules'))
+        os.environ['MODULEPATH'] = test_modules_path
+        for var in ['LOADEDMODULES', '_LMFILES_', VirtualModules.LATENCY_ENVIRONMENT]:
+            if var in os.environ:
+                del os.environ[var]
+        invalidate_modules_tool()
+        vmt = VirtualModules(mod_paths=[test_modules_path], testing=True)
+        self.assertEqual(vmt.version, StrictVersion(str(modules.VERSION)))
+
+        avail = vmt.available()
+        self.assertTrue('GCC/4.6.4' in avail)
+        self.assertEqual(vmt.available('gompi/'), ['gompi/1.1.0-no-OFED', 'gompi/1.3.12'])
+        self.assertEqual(vmt.exist(['GCC/4.6.4', 'nosuchsoftware/1.2.3']), [True, False])
+        self.assertTrue(re.search('^%s/GCC/4.6.4:$' % test_modules_path, vmt.show('GCC/4.6.4'), re.M))
+
+        # loading a module also loads its dependencies, and changes the environment as specified in the module file
+        vmt.load(['gompi/1.3.12'])
+        loaded = ['GCC/4.6.4', 'hwloc/1.6.2-GCC-4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4', 'gompi/1.3.12']
+        self.assertEqual(vmt.loaded_modules(), loaded)
+        self.assertEqual(os.environ['EBVERSIONGOMPI'], '1.3.12')
+        self.assertTrue(os.environ['EBDEVELGOMPI'].endswith('/gompi/1.3.12/easybuild/gompi-1.3.12-easybuild-devel'))
+        self.assertTrue(os.environ['LD_LIBRARY_PATH'].endswith('/GCC/4.6.4/lib'))
+        self.assertEqual(os.environ['_LMFILES_'].split(':')[-1], os.path.join(test_modules_path, 'gompi', '1.3.12'))
+
+        vmt.unload(['gompi/1.3.12'])
+        self.assertEqual(vmt.loaded_modules(), loaded[:-1])
+        self.assertFalse('EBROOTGOMPI' in os.environ)
+        vmt.purge()
+        self.assertEqual(vmt.loaded_modules(), [])
+        self.assertFalse('EBROOTGCC' in os.environ)
+
+        self.assertErrorRegex(EasyBuildError, "Unable to locate a modulefile", vmt.load, ['nosuchsoftware/1.2.3'])
+
+        # module tree can be extended with (trivial) module files, also in Lua syntax
+        vmods_path = os.path.join(self.test_prefix, 'vmods')
+        vmt.use(vmods_path)
+        for idx in range(100):
+            vmt.add_module('foo/%d' % idx, mod_path=vmods_path)
+        luatxt = '\n'.join([
+            'local root = "/software/bar/1.0"',
+            'setenv("EBROOTBAR", root)',
+            'prepend_path("PATH", pathJoin(root, "bin"))',
+            'prepend_path("MODULEPATH", "%s")' % os.path.join(vmods_path, 'bar'),
+            'load("foo/42")',
+        ])
+        vmt.add_module('bar/1.0.lua', mod_path=vmods_path, txt=luatxt)
+        self.assertEqual(len(vmt.available('foo/')), 100)
+        self.assertEqual(vmt.available('bar'), ['bar/1.0'])
+
+        # constructs that make scanning $MODULEPATH fall back to 'module avail' are ignored by emulated 'avail'
+        os.environ['MODULERC'] = os.path.join(self.test_prefix, 'modulerc')
+        write_file(os.environ['MODULERC'], '#%Module\nmodule-alias foo/latest foo/42\n')
+        write_file(os.path.join(vmods_path, 'foo', '.modulerc'), '#%Module\nmodule-alias foo/default foo/42\n')
+        vmt.invalidate_available_cache()
+        self.assertEqual(vmt.scan_available('foo/'), None)
+        self.assertEqual(len(vmt.available('foo/')), 100)
+        self.assertEqual(vmt.available('bar'), ['bar/1.0'])
+        del os.environ['MODULERC']
+
+        vmt.load(['bar/1.0'])
+        self.assertEqual(vmt.loaded_modules(), ['foo/42', 'bar/1.0'])
+        self.assertEqual(os.environ['EBROOTBAR'], '/software/bar/1.0')
+        self.assertEqual(os.environ['PATH'].split(':')[0], '/software/bar/1.0/bin')
+        self.assertEqual(os.environ['MODULEPATH'].split(':')[0], os.path.join(vmods_path, 'bar'))
+
+        # configurable latency for every module command
+        os.environ[VirtualModules.LATENCY_ENVIRONMENT] = '0.1'
+        invalidate_modules_tool()
+        vmt = VirtualModules(mod_paths=[test_modules_path], testing=True)
+        self.assertEqual(vmt.latency, 0.1)
+        start = time.time()
+        vmt.list()
+        self.assertTrue(time.time() - start >= 0.1)
+
+        invalidate_modules_tool()
+
     def test_lmod_specific(self):
         """Lmod-specific test (skipped unless Lmod is used as modules tool)."""
         lmod_abspath = which(Lmod.COMMAND)
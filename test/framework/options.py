@@ -28,6 +28,7 @@ Unit tests for eb command line options.
 @author: Kenneth Hoste (Ghent University)
 """
 import glob
+import json
 import os
 import re
 import shutil
@@ -39,6 +40,7 @@ from unittest import main as unittestmain
 from urllib2 import URLError
 
 import easybuild.tools.build_log
+import easybuild.tools.registry
 from easybuild.framework.easyconfig import BUILD, CUSTOM, DEPENDENCIES, EXTENSIONS, FILEMANAGEMENT, LICENSE
 from easybuild.framework.easyconfig import MANDATORY, MODULES, OTHER, TOOLCHAIN
 from easybuild.tools.build_log import EasyBuildError
@@ -564,6 +566,29 @@ class CommandLineOptionsTest(EnhancedTestCase):
 
             self.assertTrue(re.search(pat, outtxt), "Pattern '%s' is found in output of --list-easyblocks: %s" % (pat, outtxt))
 
+        # registry of available easyblocks is stored in cache directory, if one is specified
+        cachedir = os.path.join(self.test_prefix, 'cache')
+        write_file(self.logfile, '')
+        outtxt = self.eb_main(args + ['--cachedir=%s' % cachedir], logfile=dummylogfn)
+        registry_fp = os.path.join(cachedir, 'registry', 'easyblocks.json')
+        registry_txt = read_file(registry_fp)
+        self.assertTrue('"easybuild.easyblocks.foofoo"' in registry_txt)
+
+        # registry is only regenerated when requested, if it's up to date
+        registry = json.loads(registry_txt)
+        registry['registry']['EasyBlock']['children'].append('EB_fake')
+        registry['registry']['EB_fake'] = {'module': 'easybuild.easyblocks.fake', 'children': []}
+        write_file(registry_fp, json.dumps(registry))
+        easybuild.tools.registry._registries.clear()
+        write_file(self.logfile, '')
+        outtxt = self.eb_main(args + ['--cachedir=%s' % cachedir], logfile=dummylogfn)
+        self.assertTrue(re.search(r"\|--\s+EB_fake\s+\(easybuild.easyblocks.fake\)", outtxt), outtxt)
+
+        write_file(self.logfile, '')
+        outtxt = self.eb_main(args + ['--cachedir=%s' % cachedir, '--regenerate-registries'], logfile=dummylogfn)
+        self.assertFalse('EB_fake' in outtxt)
+        self.assertFalse('EB_fake' in read_file(registry_fp))
+
         if os.path.exists(dummylogfn):
             os.remove(dummylogfn)
 
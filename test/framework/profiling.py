@@ -0,0 +1,102 @@
+##
+# Copyright 2015-2015 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for profiling EasyBuild itself.
+"""
+import os
+import pstats
+import re
+from test.framework.utilities import EnhancedTestCase
+from unittest import TestLoader, main
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import read_file
+from easybuild.tools.options import EasyBuildOptions
+from easybuild.tools.profiling import disable_profiling, enable_profiling, profiling_requested
+from easybuild.tools.profiling import start_profile_phase, stop_profile_phase
+
+
+class ProfilingTest(EnhancedTestCase):
+    """Tests for profiling EasyBuild itself."""
+
+    def test_profiling(self):
+        """Test profiling EasyBuild per phase."""
+        self.assertTrue(profiling_requested(['--profile']))
+        self.assertTrue(profiling_requested(['--profile=/tmp/profile']))
+        self.assertFalse(profiling_requested(['--profile', '--profile-sampling=0.1']))
+        self.assertFalse(profiling_requested(['--debug']))
+
+        # sampling interval is only relevant if profiling is enabled
+        error_regex = "problems validating the options"
+        self.assertErrorRegex(EasyBuildError, error_regex, EasyBuildOptions, go_args=['--profile-sampling=0.1'])
+
+        def busy(n):
+            """Keep the CPU busy for a while."""
+            res = 0
+            for i in range(n):
+                res += sum(range(100))
+            return res
+
+        # deterministic profiling, with nested phases
+        outdir = os.path.join(self.test_prefix, 'profile')
+        enable_profiling()
+        start_profile_phase('outer')
+        busy(10)
+        start_profile_phase('inner')
+        busy(20)
+        stop_profile_phase('inner')
+        self.assertErrorRegex(EasyBuildError, "Can't stop profiling phase 'inner'", stop_profile_phase, 'inner')
+        stop_profile_phase('outer')
+        disable_profiling(outdir=outdir, report=False)
+
+        self.assertEqual(sorted(os.listdir(outdir)), ['00-outer.pstats', '01-inner.pstats', 'summary.txt'])
+        summary = read_file(os.path.join(outdir, 'summary.txt'))
+        self.assertTrue(re.search(r"== outer\n\n\s*[0-9]+ function calls", summary, re.M), summary)
+        self.assertTrue(re.search(r"== inner\n\n\s*[0-9]+ function calls", summary, re.M), summary)
+        stats = pstats.Stats(os.path.join(outdir, '01-inner.pstats'))
+        self.assertTrue('busy' in [func[2] for func in stats.stats])
+
+        # statistical profiling
+        outdir = os.path.join(self.test_prefix, 'profile_sampling')
+        enable_profiling(sampling_interval=0.001)
+        start_profile_phase('busy/phase')
+        busy(50000)
+        stop_profile_phase('busy/phase')
+        disable_profiling(outdir=outdir, report=False)
+
+        samples_path = os.path.join(outdir, '00-busy_phase.samples')
+        self.assertTrue(os.path.exists(samples_path))
+        samples = read_file(samples_path)
+        self.assertTrue(re.search(r":test_profiling:\d+;\S+:busy:\d+ [0-9]+$", samples, re.M), samples)
+        summary = read_file(os.path.join(outdir, 'summary.txt'))
+        self.assertTrue(re.search(r"== busy/phase\n\n[0-9]+ samples \(interval: 0.001s\)", summary), summary)
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(ProfilingTest)
+
+if __name__ == '__main__':
+    main()
@@ -71,13 +71,17 @@ class MockModule(modules.ModulesTool):
         """Dummy implementation of available."""
         return self.avail_modules
 
-    def show(self, modname):
+    def show(self, modnames):
         """Dummy implementation of show, which includes full path to (available or hidden) module files."""
-        if modname in self.avail_modules or os.path.basename(modname).startswith('.'):
-            txt =  '  %s:' % os.path.join('/tmp', modname)
-        else:
-            txt = 'Module %s not found' % modname
-        return txt
+        if isinstance(modnames, basestring):
+            modnames = [modnames]
+        lines = []
+        for modname in modnames:
+            if modname in self.avail_modules or os.path.basename(modname).startswith('.'):
+                lines.append('  %s:' % os.path.join('/tmp', modname))
+            else:
+                lines.append('Module %s not found' % modname)
+        return '\n'.join(lines)
 
 def mock_module(mod_paths=None):
     """Get mock module instance."""
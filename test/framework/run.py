@@ -30,12 +30,17 @@ Unit tests for filetools.py
 @author: Stijn De Weirdt (Ghent University)
 """
 import os
+import re
 from test.framework.utilities import EnhancedTestCase
 from unittest import TestLoader, main
 from vsc.utils.fancylogger import setLogLevelDebug, logToScreen
 
+import easybuild.tools.rusage
 from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.counters import ISFILE, RUN_CMD, RUN_CMD_QA
+from easybuild.tools.counters import counter_totals, counters_since, get_counters, isfile, top_call_sites
 from easybuild.tools.run import run_cmd, run_cmd_qa, parse_log_for_error
+from easybuild.tools.rusage import cmd_usage_count, cmd_usages, format_cmd_usage, summarize_cmd_usage
 from easybuild.tools.run import _log as run_log
 
 
@@ -119,6 +124,83 @@ class RunTest(EnhancedTestCase):
         self.assertEqual(ec, 0)
         run_log.setLevel(run_log_level)
 
+        # name and docstring of decorated functions are retained
+        self.assertEqual(run_cmd.__name__, 'run_cmd')
+        self.assertTrue(run_cmd.__doc__.strip().startswith("Executes a command cmd"))
+        self.assertEqual(run_cmd_qa.__name__, 'run_cmd_qa')
+
+
+    def test_hot_path_counters(self):
+        """Test counting of run_cmd/run_cmd_qa calls."""
+        start = get_counters()
+        for _ in range(3):
+            run_cmd("echo hello")
+        run_cmd_qa("echo question", {})
+        isfile(__file__)
+
+        counters = counters_since(start)
+        self.assertEqual(counter_totals(counters).keys(), [ISFILE, RUN_CMD, RUN_CMD_QA])
+        self.assertEqual([cnt for (cnt, _) in counter_totals(counters).values()], [1, 3, 1])
+
+        # calls are attributed to the call site
+        top_sites = top_call_sites(counters)
+        self.assertEqual(len(top_sites), 3)
+        sites = dict([(kind, site) for (kind, site, _, _) in top_sites])
+        self.assertTrue(re.search(r'run.py:test_hot_path_counters:[0-9]+$', sites[RUN_CMD]), sites[RUN_CMD])
+        self.assertTrue(':test_hot_path_counters:' in sites[RUN_CMD_QA])
+        self.assertTrue(top_sites[0][3] >= top_sites[-1][3])
+
+        # no counts are lost when counted operations are performed concurrently
+        from multiprocessing.pool import ThreadPool
+        start = get_counters()
+        pool = ThreadPool(8)
+        try:
+            pool.map(lambda _: [isfile(__file__) for _ in range(500)], range(8))
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(counter_totals(counters_since(start))[ISFILE][0], 8 * 500)
+
+    def test_cmd_usage(self):
+        """Test keeping track of resource usage for commands."""
+        start_idx = cmd_usage_count()
+        (out, ec) = run_cmd("for i in $(seq 1 100000); do :; done; echo done")
+        self.assertEqual(out, "done\n")
+        run_cmd_qa("echo question", {})
+
+        usages = cmd_usages(start_idx)
+        self.assertEqual([cmd for (cmd, _, _) in usages], ["for i in $(seq 1 100000); do :; done; echo done",
+                                                          "echo question"])
+        usage = usages[0][2]
+        self.assertTrue(usage['utime'] + usage['stime'] > 0)
+        self.assertTrue(usage['wall'] > 0)
+
+        summary = summarize_cmd_usage([usage for (_, _, usage) in usages])
+        self.assertEqual(summary['cmds'], 2)
+        self.assertTrue(summary['parallelism'] > 0)
+        self.assertTrue(re.match(r"^[0-9.]+s wall, [0-9.]+s user, [0-9.]+s sys, max RSS \S+ KB", format_cmd_usage(usage)))
+
+        # resource usage is determined exactly per command, so max. RSS is also known after a command that used more
+        start_idx = cmd_usage_count()
+        run_cmd("python -c \"x = ' ' * (100 * 1024 * 1024)\"")
+        run_cmd("true")
+        usages = [usage for (_, _, usage) in cmd_usages(start_idx)]
+        self.assertTrue(usages[0]['maxrss'] >= 100 * 1024)
+        self.assertTrue(0 < usages[1]['maxrss'] < usages[0]['maxrss'])
+
+        # only a limited number of records of resource usage is retained
+        orig_max_cmd_usages = easybuild.tools.rusage.MAX_CMD_USAGES
+        easybuild.tools.rusage.MAX_CMD_USAGES = 3
+        try:
+            start_idx = cmd_usage_count()
+            for idx in range(5):
+                run_cmd("echo %d" % idx)
+            self.assertEqual(cmd_usage_count(), start_idx + 5)
+            self.assertEqual([cmd for (cmd, _, _) in cmd_usages(start_idx)], ["echo 2", "echo 3", "echo 4"])
+            self.assertEqual([cmd for (cmd, _, _) in cmd_usages(start_idx + 4)], ["echo 4"])
+        finally:
+            easybuild.tools.rusage.MAX_CMD_USAGES = orig_max_cmd_usages
+
 
 def suite():
     """ returns all the testcases in this module """
@@ -61,16 +61,20 @@ import test.framework.easyconfigparser as ep
 import test.framework.easyconfigformat as ef
 import test.framework.ebconfigobj as ebco
 import test.framework.easyconfigversion as ev
+import test.framework.events as evt
 import test.framework.filetools as f
 import test.framework.format_convert as f_c
 import test.framework.general as gen
 import test.framework.github as g
+import test.framework.importtime as it
 import test.framework.license as l
+import test.framework.metrics as met
 import test.framework.module_generator as mg
 import test.framework.modules as m
 import test.framework.modulestool as mt
 import test.framework.options as o
 import test.framework.parallelbuild as p
+import test.framework.profiling as pr
 import test.framework.repository as r
 import test.framework.robot as robot
 import test.framework.run as run
@@ -99,7 +103,8 @@ log = fancylogger.getLogger()
 
 # call suite() for each module and then run them all
 # note: make sure the options unit tests run first, to avoid running some of them with a readily initialized config
-tests = [gen, o, r, ef, ev, ebco, ep, e, mg, m, mt, f, run, a, robot, b, v, g, tcv, tc, t, c, s, l, f_c, sc, tw, p]
+tests = [gen, o, r, ef, ev, ebco, ep, e, mg, m, mt, f, run, a, robot, b, v, g, tcv, tc, t, c, s, l, f_c, sc, tw, p,
+         it, pr, met, evt]
 
 SUITE = unittest.TestSuite([x.suite() for x in tests])
 
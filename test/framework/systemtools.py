@@ -27,14 +27,18 @@ Unit tests for systemtools.py
 
 @author: Kenneth hoste (Ghent University)
 """
+import os
 import re
+import subprocess
 from os.path import exists as orig_os_path_exists
 from test.framework.utilities import EnhancedTestCase
 from unittest import TestLoader, main
 
+import easybuild.tools.sampler as sampler_mod
 import easybuild.tools.systemtools as st
-from easybuild.tools.filetools import read_file
+from easybuild.tools.filetools import read_file, write_file
 from easybuild.tools.run import run_cmd
+from easybuild.tools.sampler import SAMPLE_FIELDS, proc_stats, process_tree, start_resource_sampler
 from easybuild.tools.systemtools import CPU_FAMILIES, ARM, DARWIN, IBM, INTEL, LINUX, POWER, UNKNOWN, VENDORS
 from easybuild.tools.systemtools import det_parallelism, get_avail_core_count, get_cpu_family
 from easybuild.tools.systemtools import get_cpu_model, get_cpu_speed, get_cpu_vendor, get_glibc_version
@@ -427,6 +431,64 @@ class SystemToolsTest(EnhancedTestCase):
 
         st.get_avail_core_count = orig_get_avail_core_count
 
+    def test_resource_sampler(self):
+        """Test sampling of resource usage via /proc."""
+        builddir = os.path.join(self.test_prefix, 'build')
+        write_file(os.path.join(builddir, 'test.txt'), 'x' * 1024 * 1024)
+
+        stats = proc_stats()
+        self.assertTrue(os.getpid() in stats)
+        proc = subprocess.Popen(['sleep', '1'])
+        self.assertTrue(proc.pid in process_tree(os.getpid(), proc_stats()))
+
+        # disk usage should only be determined for first sample and last sample (when sampler is stopped)
+        det_size_paths = []
+        orig_det_size = sampler_mod.det_size
+
+        def det_size(path):
+            """Wrapper for det_size that keeps track of the paths it is called for."""
+            det_size_paths.append(path)
+            return orig_det_size(path)
+
+        sampler_mod.det_size = det_size
+        try:
+            sampler = start_resource_sampler(0.1, builddir=builddir, installdir=os.path.join(self.test_prefix, 'nope'))
+            proc.wait()
+            sampler.stop()
+        finally:
+            sampler_mod.det_size = orig_det_size
+        self.assertFalse(sampler.isAlive())
+        self.assertEqual(det_size_paths, [builddir, builddir])
+
+        self.assertTrue(len(sampler.samples) > 2)
+        peaks = sampler.peaks()
+        self.assertEqual(sorted(peaks.keys()), sorted(SAMPLE_FIELDS[1:]))
+        self.assertTrue(peaks['procs'] >= 2)
+        self.assertTrue(peaks['rss_mb'] > 0)
+        self.assertTrue(peaks['open_files'] > 0)
+        self.assertEqual(peaks['builddir_mb'], 1.0)
+        self.assertEqual(peaks['installdir_mb'], 0.0)
+
+        path = os.path.join(self.test_prefix, 'resources.tsv')
+        sampler.write_time_series(path)
+        lines = read_file(path).strip().split('\n')
+        self.assertEqual(lines[0], '\t'.join(SAMPLE_FIELDS))
+        self.assertEqual(len(lines), len(sampler.samples) + 1)
+        self.assertTrue(all([len(line.split('\t')) == len(SAMPLE_FIELDS) for line in lines]))
+
+    def test_resource_sampler_cpu(self):
+        """Test sampling of CPU utilisation, for a single-threaded child process that keeps a core busy."""
+        sampler = start_resource_sampler(0.2)
+        proc = subprocess.Popen(['python', '-c', "import time\nt = time.time()\nwhile time.time() - t < 2: pass"])
+        proc.wait()
+        sampler.stop()
+
+        # CPU time of child should not be counted again once it's waited for
+        # (utilisation may be (a lot) lower than 1 core on a busy system)
+        cpus = [sample[SAMPLE_FIELDS.index('cpu')] for sample in sampler.samples]
+        self.assertTrue(0 < max(cpus) < 1.5, "Peak CPU utilisation at most around 1 core: %s" % cpus)
+
+
 def suite():
     """ returns all the testcases in this module """
     return TestLoader().loadTestsFromTestCase(SystemToolsTest)
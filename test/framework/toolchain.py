@@ -31,6 +31,7 @@ Unit tests for toolchain support.
 import os
 import re
 import shutil
+import sys
 import tempfile
 from test.framework.utilities import EnhancedTestCase, init_config
 from unittest import TestLoader, main
@@ -38,8 +39,9 @@ from unittest import TestLoader, main
 import easybuild.tools.modules as modules
 from easybuild.framework.easyconfig.easyconfig import EasyConfig, ActiveMNS
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.filetools import write_file
-from easybuild.tools.toolchain.utilities import search_toolchain
+from easybuild.tools.filetools import read_file, write_file
+from easybuild.tools.registry import get_registry, registry_stamp
+from easybuild.tools.toolchain.utilities import TOOLCHAINS_REGISTRY_PACKAGES, search_toolchain, toolchains_registry
 from test.framework.utilities import find_full_path
 
 from easybuild.tools import systemtools as st
@@ -69,6 +71,61 @@ class ToolchainTest(EnhancedTestCase):
         self.assertEqual(tc, None)
         self.assertTrue(len(all_tcs) > 0)  # list of available toolchains
 
+    def test_toolchains_registry(self):
+        """Test registry of available toolchains."""
+        cachedir = os.path.join(self.test_prefix, 'cache')
+        registry = toolchains_registry(cachedir=cachedir, regenerate=True)
+        self.assertEqual(registry['toolchains']['goolf'], ['easybuild.toolchains.goolf', 'Goolf'])
+        self.assertEqual(registry['constants']['GCC'], 'GCC')
+        self.assertEqual(registry['constants']['OPENMPI'], 'OpenMPI')
+
+        registry_fp = os.path.join(cachedir, 'registry', 'toolchains.json')
+        self.assertTrue(os.path.exists(registry_fp))
+
+        # registry is loaded from file, no need to regenerate it
+        import easybuild.tools.registry
+        easybuild.tools.registry._registries.clear()
+        def fail():
+            """Registry should not be regenerated."""
+            raise RuntimeError("registry is regenerated")
+        self.assertEqual(get_registry('toolchains', TOOLCHAINS_REGISTRY_PACKAGES, fail, cachedir=cachedir), registry)
+
+        # a broken registry file is ignored, and the registry is regenerated
+        write_file(registry_fp, "this is not JSON")
+        easybuild.tools.registry._registries.clear()
+        self.assertEqual(toolchains_registry(cachedir=cachedir), registry)
+        self.assertTrue('"goolf"' in read_file(registry_fp))
+
+        tc, all_tcs = search_toolchain('goolf', cachedir=cachedir)
+        self.assertEqual(tc.NAME, 'goolf')
+        self.assertTrue(tc in all_tcs)
+
+        _, all_tcs = search_toolchain('', cachedir=cachedir)
+        self.assertEqual(sorted([x.NAME for x in all_tcs]), sorted(registry['toolchains'].keys()))
+
+        # registry is only cached in memory if no cache directory is specified
+        stored = []
+        orig_store_registry = easybuild.tools.registry.store_registry
+        easybuild.tools.registry.store_registry = lambda *args: stored.append(args)
+        try:
+            easybuild.tools.registry._registries.clear()
+            self.assertEqual(toolchains_registry(), registry)
+            self.assertEqual(toolchains_registry(), registry)
+        finally:
+            easybuild.tools.registry.store_registry = orig_store_registry
+        self.assertEqual(stored, [])
+
+        # stamp of registry changes when a module in a covered package is changed
+        pkg_dir = os.path.join(self.test_prefix, 'pkgs', 'eb_registry_test_pkg')
+        write_file(os.path.join(pkg_dir, '__init__.py'), '')
+        write_file(os.path.join(pkg_dir, 'consts.py'), "TC_CONSTANT_FOO = 'foo'\n")
+        sys.path.insert(0, os.path.dirname(pkg_dir))
+        stamp = registry_stamp(['eb_registry_test_pkg'])
+        self.assertEqual(registry_stamp(['eb_registry_test_pkg']), stamp)
+        mtime = os.stat(os.path.join(pkg_dir, 'consts.py')).st_mtime
+        os.utime(os.path.join(pkg_dir, 'consts.py'), (mtime + 2, mtime + 2))
+        self.assertNotEqual(registry_stamp(['eb_registry_test_pkg']), stamp)
+
     def test_goalf_toolchain(self):
         """Test for goalf toolchain."""
         self.get_toolchain("goalf", version="1.1.0-no-OFED")
@@ -28,6 +28,7 @@ Toy build unit test
 @author: Kenneth Hoste (Ghent University)
 """
 import glob
+import json
 import grp
 import os
 import re
@@ -95,6 +96,14 @@ class ToyBuildTest(EnhancedTestCase):
         test_report_path_pattern = os.path.join(software_path, 'easybuild', 'easybuild-toy-%s*test_report.md' % version)
         self.assertTrue(len(glob.glob(test_report_path_pattern)) == 1, "Found 1 file at %s" % test_report_path_pattern)
 
+        # make sure trace of timed steps is available
+        trace_path_pattern = os.path.join(software_path, 'easybuild', 'easybuild-toy-%s*.trace.json' % version)
+        trace_paths = glob.glob(trace_path_pattern)
+        self.assertTrue(len(trace_paths) == 1, "Found 1 file at %s" % trace_path_pattern)
+        trace_events = json.loads(read_file(trace_paths[0]))['traceEvents']
+        steps = [event['name'] for event in trace_events if event['cat'] == 'step']
+        self.assertTrue('build' in steps and 'install' in steps, "Steps found in trace: %s" % steps)
+
         ec_file_path = os.path.join(software_path, 'easybuild', 'toy-%s.eb' % full_version)
         self.assertTrue(os.path.exists(ec_file_path))
 
@@ -154,6 +163,7 @@ class ToyBuildTest(EnhancedTestCase):
                 r"Test result[\S\s]*Build succeeded for %d out of 1" % (not fails),
                 r"Overview of tested easyconfig[\S\s]*%s[\S\s]*%s" % (test_result, os.path.basename(ec_file)),
                 r"Time info[\S\s]*start:[\S\s]*end:",
+                r"Hot path counters[\S\s]*session total:.*run_cmd: [0-9]+ \([0-9.]+s\)",
                 r"EasyBuild info[\S\s]*framework version:[\S\s]*easyblocks ver[\S\s]*command line[\S\s]*configuration",
                 r"System info[\S\s]*cpu model[\S\s]*os name[\S\s]*os version[\S\s]*python version",
                 r"List of loaded modules",
@@ -167,6 +177,105 @@ class ToyBuildTest(EnhancedTestCase):
 
         return outtxt
 
+    def test_toy_profile(self):
+        """Test toy build with profiling enabled."""
+        profile_dir = os.path.join(self.test_prefix, 'profile')
+        self.test_toy_build(extra_args=['--profile=%s' % profile_dir])
+
+        for phase in ['options', 'easyconfigs', 'dependencies', 'build-toy_0.0', 'build-toy_0.0-install']:
+            self.assertEqual(len(glob.glob(os.path.join(profile_dir, '[0-9][0-9]-%s.pstats' % phase))), 1)
+        summary = read_file(os.path.join(profile_dir, 'summary.txt'))
+        self.assertTrue(re.search(r"^== build-toy/0.0-configure$", summary, re.M), summary)
+
+    def test_toy_events_file_failure(self):
+        """Test toy build with events file and metrics file, for a failing build."""
+        broken_toy_ec = os.path.join(self.test_prefix, 'toy-broken.eb')
+        toy_ec_file = os.path.join(os.path.dirname(__file__), 'easyconfigs', 'toy-0.0.eb')
+        write_file(broken_toy_ec, read_file(toy_ec_file) + "checksums = ['clearywrongchecksum']")
+        events_file = os.path.join(self.test_prefix, 'events.jsonl')
+        metrics_file = os.path.join(self.test_prefix, 'easybuild.prom')
+        extra_args = ['--events-file=%s' % events_file, '--metrics-file=%s' % metrics_file]
+        self.assertErrorRegex(EasyBuildError, "Checksum verification .* failed", self.test_toy_build,
+                              ec_file=broken_toy_ec, extra_args=extra_args, verify=False, fails=True, verbose=False,
+                              raise_error=True)
+
+        events = [json.loads(line) for line in read_file(events_file).strip().split('\n')]
+        event_types = [event['event'] for event in events]
+        self.assertEqual(event_types[-3:], ['failure', 'build_end', 'session_end'])
+        self.assertFalse(events[-2]['success'])
+        self.assertFalse(events[-1]['success'])
+        self.assertTrue("Checksum verification" in events[-1]['error'])
+
+        metrics = read_file(metrics_file).split('\n')
+        self.assertTrue('easybuild_builds_total{result="failure"} 1.0' in metrics)
+        self.assertTrue('easybuild_builds_in_progress 0.0' in metrics)
+        self.assertFalse('easybuild_session_end_time_seconds 0.0' in metrics)
+        self.assertTrue([line for line in metrics if line.startswith('easybuild_session_end_time_seconds ')])
+
+        # end of session is also reported when exiting early
+        os.remove(events_file)
+        self.eb_main([toy_ec_file, '--dry-run', '--events-file=%s' % events_file], raise_error=True)
+        events = [json.loads(line) for line in read_file(events_file).strip().split('\n')]
+        last_event = events[-1]
+        self.assertEqual((last_event['event'], last_event['success'], last_event['exit_code']), ('session_end', True, 0))
+
+    def test_toy_profile_memory(self):
+        """Test toy build with profiling of memory usage enabled."""
+        profile_dir = os.path.join(self.test_prefix, 'memory-profile')
+        self.test_toy_build(extra_args=['--profile-memory=%s' % profile_dir])
+
+        memory_profile = read_file(os.path.join(profile_dir, 'memory.txt'))
+        phases = re.findall(r"^== (.*)$", memory_profile, re.M)
+        self.assertEqual(phases, ['options', 'easyconfigs', 'dependencies', 'build-toy/0.0'])
+        regex = re.compile(r"^instances: EasyConfig: [1-9][0-9]* \([+-][0-9]+\), EasyBlock: [0-9]+ \([+-][0-9]+\), "
+                           r"Toolchain: [0-9]+", re.M)
+        self.assertTrue(regex.search(memory_profile), memory_profile)
+        regex = re.compile(r"^RSS: [0-9.]+ MB \(max: [0-9.]+ MB\), [0-9]+ objects tracked", re.M)
+        self.assertTrue(regex.search(memory_profile), memory_profile)
+        self.assertTrue(re.search(r"^\s+[0-9]+\s+[+-][0-9]+  dict$", memory_profile, re.M), memory_profile)
+
+        # snapshots per build step are only taken if requested
+        self.test_toy_build(extra_args=['--profile-memory=%s' % profile_dir, '--profile-memory-steps', '--force'])
+        phases = re.findall(r"^== (.*)$", read_file(os.path.join(profile_dir, 'memory.txt')), re.M)
+        self.assertTrue('build-toy/0.0-install' in phases)
+        self.assertEqual(phases[-1], 'build-toy/0.0')
+
+    def test_toy_sample_resources(self):
+        """Test toy build with sampling of resource usage."""
+        self.test_toy_build(extra_args=['--sample-resources=0.1'])
+
+        easybuild_dir = os.path.join(self.test_installpath, 'software', 'toy', '0.0', 'easybuild')
+        res_paths = glob.glob(os.path.join(easybuild_dir, 'easybuild-toy-0.0*.resources.tsv'))
+        self.assertEqual(len(res_paths), 1)
+        lines = read_file(res_paths[0]).strip().split('\n')
+        self.assertTrue(lines[0].startswith('time\tcpu\trss_mb'))
+        self.assertTrue(len(lines) > 1)
+
+    def test_toy_events_file(self):
+        """Test toy build with events file."""
+        events_file = os.path.join(self.test_prefix, 'events', 'events.jsonl')
+        self.test_toy_build(extra_args=['--events-file=%s' % events_file])
+
+        events = [json.loads(line) for line in read_file(events_file).strip().split('\n')]
+        event_types = [event['event'] for event in events]
+        for event_type in ['session_start', 'parse_done', 'resolution_done', 'build_start', 'build_end']:
+            self.assertEqual(event_types.count(event_type), 1)
+        self.assertEqual((event_types[0], event_types[-1]), ('session_start', 'session_end'))
+        self.assertTrue(event_types.index('build_start') < event_types.index('step_start'))
+        self.assertEqual(event_types.count('step_start'), event_types.count('step_end'))
+        self.assertFalse('failure' in event_types)
+
+        for event in events:
+            self.assertEqual(event['pid'], os.getpid())
+            if event['event'] == 'step_end':
+                self.assertEqual(event['module'], 'toy/0.0')
+                self.assertTrue(event['success'])
+                self.assertTrue(event['wall'] >= 0)
+        build_end = events[event_types.index('build_end')]
+        self.assertTrue(build_end['success'])
+        self.assertEqual((build_end['index'], build_end['total']), (1, 1))
+        self.assertTrue(events[-1]['success'])
+
     def test_toy_broken(self):
         """Test deliberately broken toy build."""
         tmpdir = tempfile.mkdtemp()